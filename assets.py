@@ -0,0 +1,115 @@
+"""
+Asset statici del front-end
+CSS e JavaScript dell'interfaccia vengono pubblicati in static/dist con l'impronta del
+contenuto nel nome (app.3f2a9c1d07b4.js), insieme alle varianti precompresse gzip e
+brotli: il browser li tiene in cache per un anno e a ogni modifica cambia il nome.
+La compressione avviene una sola volta per versione (i file esistenti vengono riusati).
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Nome con impronta = contenuto immutabile
+IMMUTABLE = 'public, max-age=31536000, immutable'
+MIMETYPES = {
+    '.css': 'text/css',
+    '.js': 'text/javascript'
+}
+# Codifiche in ordine di preferenza: (valore di Content-Encoding, suffisso del file)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class AssetBundle:
+    """Bundle con impronta costruiti al primo uso a partire dai sorgenti in source_dir"""
+
+    def __init__(self, source_dir, output_dir, names):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.sources = list(names)
+        self.names = None        # nome logico -> nome con impronta
+        self.files = {}          # nome con impronta -> codifiche disponibili
+        self._lock = threading.Lock()
+
+    def build(self):
+        """Pubblica i bundle (e le varianti compresse) e rimuove quelli di versioni precedenti"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        names = {}
+        files = {}
+        for name in self.sources:
+            with open(os.path.join(self.source_dir, name), 'rb') as f:
+                data = f.read()
+            base, ext = os.path.splitext(name)
+            hashed = f'{base}.{fingerprint(data)}{ext}'
+            self._publish(hashed, lambda: data)
+            encodings = []
+            for encoding, suffix in ENCODINGS:
+                if encoding == 'br' and brotli is None:
+                    continue
+                self._publish(hashed + suffix, lambda: compress(data, encoding))
+                encodings.append(encoding)
+            names[name] = hashed
+            files[hashed] = encodings
+        current = {hashed + suffix for hashed in files for suffix in ('',) + tuple(s for _, s in ENCODINGS)}
+        for filename in os.listdir(self.output_dir):
+            if filename not in current:
+                os.remove(os.path.join(self.output_dir, filename))
+        self.names, self.files = names, files
+        print(f"[ASSETS] 📦 Bundle: {', '.join(names.values())} "
+              f"({'gzip, brotli' if brotli is not None else 'solo gzip'})")
+        return names
+
+    def _publish(self, filename, produce):
+        path = os.path.join(self.output_dir, filename)
+        if os.path.exists(path):
+            return
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(produce())
+        os.replace(temp, path)
+
+    def ensure_built(self):
+        with self._lock:
+            if self.names is None:
+                self.build()
+        return self.names
+
+    def url(self, name):
+        """URL del bundle per i template: {{ asset_url('app.js') }}"""
+        return f'/assets/{self.ensure_built()[name]}'
+
+    def version(self):
+        """Impronta dell'insieme dei bundle (cambia con qualsiasi modifica)"""
+        return tuple(sorted(self.ensure_built().values()))
+
+    def lookup(self, filename, accepted):
+        """
+        File da servire per una richiesta (accepted = request.accept_encodings):
+        (nome su disco, mimetype, Content-Encoding); None se il bundle non esiste
+        (o è di una versione precedente)
+        """
+        self.ensure_built()
+        encodings = self.files.get(filename)
+        if encodings is None:
+            return None
+        mimetype = MIMETYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings and accepted.quality(encoding) > 0:
+                return filename + suffix, mimetype, encoding
+        return filename, mimetype, None
@@ -73,7 +73,7 @@ echo ""
 
 # Step 3
 echo "[3/8] Installazione librerie Python..."
-pip3 install flask psutil --break-system-packages
+pip3 install flask psutil jeepney brotli --break-system-packages
 echo "✓ Librerie Python installate"
 echo ""
 
@@ -122,8 +122,8 @@ echo "[6/8] Configurazione MediaMTX..."
 sudo mkdir -p /etc/mediamtx
 sudo tee /etc/mediamtx/mediamtx.yml > /dev/null <<'EOF'
 logLevel: info
-logDestinations: [stdout]
-logFile: /var/log/mediamtx.log
+logDestinations: [stdout, file]
+logFile: /tmp/mediamtx.log
 
 rtspAddress: :8554
 rtpAddress: :8000
@@ -139,17 +139,41 @@ echo ""
 # Step 7
 echo "[7/8] Creazione applicazione web..."
 mkdir -p ~/videoStreamer/videos
+mkdir -p ~/videoStreamer/recordings
 mkdir -p ~/videoStreamer/templates
 mkdir -p ~/videoStreamer/static
 cd ~/videoStreamer
 
 echo "⚠️  Copia i file necessari in ~/videoStreamer/:"
 echo "   - app.py"
+echo "   - assets.py"
+echo "   - backend.py"
+echo "   - boot.py"
+echo "   - calibrate.py"
+echo "   - fleet.py"
+echo "   - fleetclient.py"
+echo "   - framering.py"
+echo "   - frames.py"
+echo "   - inputplan.py"
+echo "   - jobs.py"
+echo "   - membudget.py"
+echo "   - mjpegout.py"
+echo "   - mjpg_streamer_sim.py"
+echo "   - netops.py"
+echo "   - netstate.py"
+echo "   - nmclient.py"
+echo "   - playlist.py"
+echo "   - proclogs.py"
+echo "   - reconcile.py"
+echo "   - recorder.py"
+echo "   - rollout.py"
+echo "   - watchdog.py"
+echo "   - wifiscan.py"
 echo "   - change_password.py"
 echo "   - change_hostname.sh"
 echo "   - wifi_fallback.sh"
 echo "   - templates/ (cartella con index.html e login.html)"
-echo "   - static/ (cartella con stemma_small.png)"
+echo "   - static/ (cartella con stemma_small.png, app.css e app.js)"
 echo ""
 echo "Premi INVIO quando i file sono stati copiati..."
 read
@@ -303,6 +327,7 @@ $USER ALL=(ALL) NOPASSWD: /bin/netplan apply
 $USER ALL=(ALL) NOPASSWD: /usr/sbin/netplan
 $USER ALL=(ALL) NOPASSWD: /usr/bin/nmcli
 $USER ALL=(ALL) NOPASSWD: /usr/bin/killall
+$USER ALL=(ALL) NOPASSWD: /usr/bin/tee /sys/bus/usb/devices/*/authorized
 $USER ALL=(ALL) NOPASSWD: /bin/rm -f /tmp/hotspot_active
 $USER ALL=(ALL) NOPASSWD: /sbin/shutdown
 $USER ALL=(ALL) NOPASSWD: /sbin/reboot
@@ -311,6 +336,19 @@ sudo chmod 0440 "$SUDOERS_FILE"
 echo "✓ Permessi sudo configurati"
 echo ""
 
+# Permessi NetworkManager via D-Bus (profili WiFi, attivazione, scansione senza nmcli)
+echo "Configurazione permessi NetworkManager..."
+sudo mkdir -p /etc/polkit-1/rules.d
+sudo tee /etc/polkit-1/rules.d/50-stream-manager.rules > /dev/null <<EOF
+polkit.addRule(function(action, subject) {
+    if (action.id.indexOf("org.freedesktop.NetworkManager.") == 0 && subject.user == "$USER") {
+        return polkit.Result.YES;
+    }
+});
+EOF
+echo "✓ Permessi NetworkManager configurati"
+echo ""
+
 # Avvio servizi
 echo "Avvio servizi..."
 sudo systemctl start stream-manager.service || true
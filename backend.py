@@ -0,0 +1,385 @@
+"""
+Backend di sistema
+I comandi verso il sistema (systemctl, sudo, nmcli, ip, mjpg-streamer, catture V4L2)
+e l'accesso alle telecamere passano da qui. Il backend 'system' li esegue così come
+sono sulla scheda. Il backend 'sim' (VIDEOSTREAMER_BACKEND=sim) fa girare API e
+pipeline senza privilegi e senza hardware, ad esempio in un container per i test
+di carico:
+- telecamere sintetiche: le catture V4L2 diventano un testsrc di FFmpeg
+- mjpg-streamer sostituito da mjpg_streamer_sim.py (stesse opzioni)
+- MediaMTX locale avviato come processo figlio al posto del servizio systemd
+- stato finto di systemd e NetworkManager (systemctl, nmcli, ip)
+- i file di sistema (/etc, /sys, ...) scritti sotto la cartella della simulazione
+"""
+
+import ipaddress
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cartelle di sistema che il backend di simulazione riporta sotto la sua radice
+SYSTEM_DIRS = ('/etc/', '/sys/', '/usr/', '/var/', '/boot/', '/lib/')
+# Comandi su file eseguiti con sudo: senza sudo e con i percorsi di sistema riportati
+FILE_COMMANDS = ('cp', 'tee', 'rm', 'mkdir', 'mv')
+
+MEDIAMTX_CONFIG = '/etc/mediamtx/mediamtx.yml'
+
+
+class SystemBackend:
+    """Esecuzione reale sulla scheda"""
+
+    name = 'system'
+
+    def intercept(self, cmd, input=None):
+        """Esito simulato del comando (returncode, stdout, stderr) o None se va eseguito"""
+        return None
+
+    def command(self, cmd):
+        """Comando effettivo da eseguire al posto di cmd"""
+        return cmd
+
+    def device_exists(self, device):
+        return os.path.exists(device)
+
+    def video_devices(self):
+        return [f'/dev/video{i}' for i in range(10) if os.path.exists(f'/dev/video{i}')]
+
+    def open_device(self, device):
+        """Apre e chiude il nodo del dispositivo (carica il driver e verifica i permessi)"""
+        fd = os.open(device, os.O_RDWR | os.O_NONBLOCK)
+        os.close(fd)
+
+
+class SimulatedNetwork:
+    """Stato finto di NetworkManager e delle interfacce, per nmcli e ip"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = {'Wired connection 1': {'type': '802-3-ethernet', 'active': True}}
+        self.addresses = {'eth0': ['192.168.1.50/24'], 'wlan0': []}
+        self.gateway = ('192.168.1.1', 'eth0')
+        self.hostname = 'videostreamer-sim'
+        self.access_points = [
+            ('AA:BB:CC:00:00:01', 'Ufficio', 6, 2437, 82, 'WPA2'),
+            ('AA:BB:CC:00:00:02', 'Magazzino', 36, 5180, 61, 'WPA2'),
+            ('AA:BB:CC:00:00:03', 'Ospiti', 11, 2462, 40, '')
+        ]
+
+    def nmcli(self, args):
+        args = [a for a in args if a not in ('-t', '-e', 'yes')]
+        if '-f' in args:
+            index = args.index('-f')
+            fields = args[index + 1].split(',')
+            args = args[:index] + args[index + 2:]
+        else:
+            fields = []
+        with self.lock:
+            if args[:2] == ['connection', 'show']:
+                active_only = '--active' in args
+                lines = [f"{name.replace(':', chr(92) + ':')}:{conn['type']}"
+                         for name, conn in self.connections.items() if conn['active'] or not active_only]
+                return 0, '\n'.join(lines) + '\n', ''
+            if args[:3] == ['dev', 'wifi', 'list']:
+                return 0, self._scan(fields), ''
+            if args[:2] == ['connection', 'add']:
+                options = dict(zip(args[2::2], args[3::2]))
+                self.connections[options.get('con-name', options.get('ssid', 'wifi'))] = {
+                    'type': '802-11-wireless', 'active': False}
+                return 0, 'Connection successfully added.\n', ''
+            if args[:2] in (['connection', 'up'], ['connection', 'down'], ['connection', 'delete']):
+                name = args[2] if len(args) > 2 else ''
+                conn = self.connections.get(name)
+                if conn is None:
+                    return 10, '', f"Error: unknown connection '{name}'.\n"
+                if args[1] == 'delete':
+                    del self.connections[name]
+                elif args[1] == 'down':
+                    if not conn['active']:
+                        return 10, '', f"Error: '{name}' is not an active connection.\n"
+                    conn['active'] = False
+                else:
+                    for other in self.connections.values():
+                        if other['type'] == conn['type']:
+                            other['active'] = False
+                    conn['active'] = True
+                return 0, '', ''
+        return 0, '', ''
+
+    def _scan(self, fields):
+        lines = []
+        for bssid, ssid, channel, freq, signal, security in self.access_points:
+            in_use = '*' if self.connections.get(ssid, {}).get('active') else ''
+            row = {'IN-USE': in_use, 'BSSID': bssid.replace(':', '\\:'), 'SSID': ssid, 'MODE': 'Infra',
+                   'CHAN': str(channel), 'FREQ': f'{freq} MHz', 'SIGNAL': str(signal), 'SECURITY': security}
+            lines.append(':'.join(row.get(field, '') for field in fields))
+        return '\n'.join(lines) + '\n'
+
+    def ip(self, args):
+        args = [a for a in args if a not in ('-4', '-o')]
+        with self.lock:
+            if args[:2] == ['route', 'show']:
+                via, dev = self.gateway if self.gateway else (None, None)
+                if 'default' in args:
+                    return 0, f'default via {via} dev {dev}\n' if via else '', ''
+                interface = args[args.index('dev') + 1] if 'dev' in args else None
+                lines = [f'{address} proto kernel scope link'
+                         for name, addresses in self.addresses.items() if interface in (None, name)
+                         for address in addresses]
+                return 0, '\n'.join(lines) + ('\n' if lines else ''), ''
+            if args[:2] == ['addr', 'show']:
+                interface = args[-1]
+                lines = [f'2: {interface}    inet {address} scope global {interface}'
+                         for address in self.addresses.get(interface, [])]
+                return 0, '\n'.join(lines) + ('\n' if lines else ''), ''
+            if args[:2] == ['addr', 'flush']:
+                self.addresses[args[-1]] = []
+            elif args[:2] == ['addr', 'add']:
+                self.addresses.setdefault(args[args.index('dev') + 1], []).append(args[2])
+            elif args[:3] == ['route', 'del', 'default']:
+                self.gateway = None
+            elif args[:3] == ['route', 'add', 'default']:
+                self.gateway = (args[args.index('via') + 1], args[args.index('dev') + 1])
+        return 0, '', ''
+
+    # Viste per netstate (al posto di ioctl, /proc/net/route e /sys/class/net)
+
+    def interfaces(self):
+        with self.lock:
+            return ['lo'] + list(self.addresses)
+
+    def ipv4_addresses(self):
+        """Primo indirizzo di ogni interfaccia: {interfaccia: (ip, netmask)}"""
+        with self.lock:
+            addresses = {'lo': ('127.0.0.1', '255.0.0.0')}
+            for interface, cidrs in self.addresses.items():
+                if cidrs:
+                    network = ipaddress.ip_interface(cidrs[0])
+                    addresses[interface] = (str(network.ip), str(network.netmask))
+            return addresses
+
+    def default_gateway(self):
+        """(interfaccia, gateway) della route di default, o (None, None)"""
+        with self.lock:
+            if self.gateway is None:
+                return None, None
+            via, dev = self.gateway
+            return dev, via
+
+    def link_state(self, interface):
+        with self.lock:
+            if interface not in self.addresses:
+                return 'unknown'
+            return 'up' if self.addresses[interface] else 'down'
+
+    def wifi_ssid(self):
+        """Nome della connessione WiFi attiva (in simulazione coincide con l'SSID)"""
+        with self.lock:
+            for name, conn in self.connections.items():
+                if conn['type'] == '802-11-wireless' and conn['active']:
+                    return name
+            return None
+
+
+class SimulatedBackend(SystemBackend):
+    """Simulazione senza hardware e senza privilegi"""
+
+    name = 'sim'
+
+    def __init__(self, root=None, cameras=1):
+        self.root = root or os.environ.get('VIDEOSTREAMER_SIM_DIR', '/tmp/videostreamer-sim')
+        self.cameras = cameras
+        self.network = SimulatedNetwork()
+        # Servizi systemd: MediaMTX è un vero processo figlio, gli altri solo uno stato
+        self.services = {'stream-manager': True, 'nginx': True, 'NetworkManager': True,
+                         'dhcpcd': False, 'systemd-networkd': False, 'wpa_supplicant': True}
+        self.mediamtx = None
+        self.lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, path):
+        """Percorso di sistema riportato sotto la radice della simulazione"""
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def intercept(self, cmd, input=None):
+        if cmd and cmd[0] == 'sudo':
+            cmd = cmd[1:]
+        if not cmd:
+            return None
+        tool = os.path.basename(cmd[0])
+        if tool == 'systemctl':
+            return self.systemctl(cmd[1:])
+        if tool == 'nmcli':
+            return self.network.nmcli(cmd[1:])
+        if tool == 'ip':
+            return self.network.ip(cmd[1:])
+        if tool == 'change_hostname.sh':
+            self.network.hostname = cmd[1]
+            return 0, '', ''
+        if tool in ('shutdown', 'reboot'):
+            print(f"[SIM] 🔁 Riavvio della scheda simulato: {' '.join(cmd)}")
+            return 0, '', ''
+        if tool == 'v4l2-ctl':
+            return 0, '', ''
+        return None
+
+    def command(self, cmd):
+        if cmd and cmd[0] == 'sudo':
+            cmd = cmd[1:]
+            if os.path.basename(cmd[0]) in FILE_COMMANDS:
+                cmd = [cmd[0]] + [self._system_path(arg) for arg in cmd[1:]]
+        if cmd and os.path.basename(cmd[0]) == 'mjpg_streamer':
+            return [sys.executable, os.path.join(APP_DIR, 'mjpg_streamer_sim.py')] + cmd[1:]
+        return self._synthetic_capture(cmd)
+
+    def _system_path(self, arg):
+        if not arg.startswith(SYSTEM_DIRS):
+            return arg
+        path = self.path(arg)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _synthetic_capture(self, cmd):
+        """Ingresso V4L2 di FFmpeg (-f v4l2 ... -i /dev/videoN) sostituito da un testsrc"""
+        if not cmd or os.path.basename(cmd[0]) != 'ffmpeg':
+            return cmd
+        for index in range(len(cmd) - 1):
+            if cmd[index] == '-f' and cmd[index + 1] == 'v4l2' and '-i' in cmd[index:]:
+                end = cmd.index('-i', index)
+                options = dict(zip(cmd[index + 2:end:2], cmd[index + 3:end:2]))
+                size = options.get('-video_size', options.get('-s', '640x480'))
+                rate = options.get('-framerate', options.get('-r', '15'))
+                source = ['-re', '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}']
+                return cmd[:index] + source + cmd[end + 2:]
+        return cmd
+
+    def device_exists(self, device):
+        return device in self.video_devices()
+
+    def video_devices(self):
+        return [f'/dev/video{i}' for i in range(self.cameras)]
+
+    def open_device(self, device):
+        if not self.device_exists(device):
+            raise FileNotFoundError(device)
+
+    # ------------------------------------------------------------------
+    # systemd
+    # ------------------------------------------------------------------
+
+    def systemctl(self, args):
+        action, name = (args + ['', ''])[:2]
+        name = name.removesuffix('.service')
+        with self.lock:
+            if action == 'is-active':
+                active = self._mediamtx_running() if name == 'mediamtx' else self.services.get(name, False)
+                return (0, 'active\n', '') if active else (3, 'inactive\n', '')
+            if action in ('enable', 'disable', 'daemon-reload'):
+                return 0, '', ''
+            if name == 'mediamtx':
+                if action in ('stop', 'restart'):
+                    self._stop_mediamtx()
+                if action in ('start', 'restart'):
+                    return self._start_mediamtx()
+                return 0, '', ''
+            if name == 'stream-manager' and action == 'restart':
+                print("[SIM] 🔁 Riavvio del servizio simulato")
+            if action in ('start', 'restart'):
+                self.services[name] = True
+            elif action == 'stop':
+                self.services[name] = False
+        return 0, '', ''
+
+    def _mediamtx_running(self):
+        return self.mediamtx is not None and self.mediamtx.poll() is None
+
+    def _start_mediamtx(self):
+        binary = shutil.which('mediamtx') or shutil.which('/usr/local/bin/mediamtx')
+        if binary is None:
+            return 1, '', 'MediaMTX non trovato nel PATH: necessario per gli stream RTSP simulati\n'
+        config = self.path(MEDIAMTX_CONFIG)
+        if not os.path.exists(config):
+            return 1, '', f'Configurazione MediaMTX mancante: {config}\n'
+        self.mediamtx = subprocess.Popen([binary, config], stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(f"[SIM] ▶️  MediaMTX locale avviato (PID: {self.mediamtx.pid})")
+        return 0, '', ''
+
+    def _stop_mediamtx(self):
+        if self._mediamtx_running():
+            self.mediamtx.terminate()
+            try:
+                self.mediamtx.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.mediamtx.kill()
+        self.mediamtx = None
+
+
+def create_backend(name):
+    if name == 'sim':
+        return SimulatedBackend(cameras=int(os.environ.get('VIDEOSTREAMER_SIM_CAMERAS', 1)))
+    if name != 'system':
+        raise ValueError(f"Backend sconosciuto: {name} (usa 'system' o 'sim')")
+    return SystemBackend()
+
+
+current = create_backend(os.environ.get('VIDEOSTREAMER_BACKEND', 'system'))
+
+
+def simulated():
+    return current.name == 'sim'
+
+
+def _completed(cmd, result, kwargs):
+    """CompletedProcess con l'output nel formato richiesto dal chiamante (testo o byte)"""
+    returncode, stdout, stderr = result
+    text = kwargs.get('text') or kwargs.get('universal_newlines') or kwargs.get('encoding')
+    captured = kwargs.get('capture_output')
+    out = stdout if text else stdout.encode()
+    err = stderr if text else stderr.encode()
+    completed = subprocess.CompletedProcess(
+        cmd, returncode,
+        out if captured or kwargs.get('stdout') == subprocess.PIPE else None,
+        err if captured or kwargs.get('stderr') == subprocess.PIPE else None
+    )
+    if kwargs.get('check') and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, completed.stdout, completed.stderr)
+    return completed
+
+
+def run(cmd, **kwargs):
+    """Come subprocess.run, attraverso il backend"""
+    result = current.intercept(cmd, kwargs.get('input'))
+    if result is not None:
+        return _completed(cmd, result, kwargs)
+    return subprocess.run(current.command(cmd), **kwargs)
+
+
+def popen(cmd, **kwargs):
+    """Come subprocess.Popen, attraverso il backend"""
+    result = current.intercept(cmd)
+    if result is not None:
+        # Comando già eseguito dalla simulazione: processo vuoto per il chiamante
+        return subprocess.Popen(['true'], **kwargs)
+    return subprocess.Popen(current.command(cmd), **kwargs)
+
+
+def shell_command(cmd):
+    """Riga di comando (per i comandi lanciati da altri programmi, es. runOnDemand di MediaMTX)"""
+    return shlex.join(current.command(cmd))
+
+
+def device_exists(device):
+    return current.device_exists(device)
+
+
+def video_devices():
+    return current.video_devices()
+
+
+def open_device(device):
+    current.open_device(device)
@@ -0,0 +1,161 @@
+"""
+Sequenza di avvio in parallelo
+Ogni attività (avvio di uno stream, registrazione, ...) parte appena le sue
+dipendenze sono pronte: nodo del dispositivo presente, MediaMTX attivo, altre
+attività completate. Le attività indipendenti girano in parallelo mentre il
+server web è già in ascolto. I tempi di ogni fase restano consultabili.
+"""
+
+import threading
+import time
+
+
+class Dependency:
+    """Condizione da attendere prima di un'attività (check() -> bool)"""
+
+    def __init__(self, name, check, timeout=30, interval=0.2):
+        self.name = name
+        self.check = check
+        self.timeout = timeout
+        self.interval = interval
+
+    def wait(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if self.check():
+                    return True
+            except Exception:
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.interval)
+
+
+class BootTask:
+    def __init__(self, name, func, requires, after):
+        self.name = name
+        self.func = func
+        self.requires = requires
+        self.after = after
+        self.status = 'pending'
+        self.error = None
+        self.phases = []
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self, t0):
+        def rel(ts):
+            return round((ts - t0) * 1000) if ts is not None else None
+        return {
+            'status': self.status,
+            'error': self.error,
+            'start_ms': rel(self.started_at),
+            'end_ms': rel(self.finished_at),
+            'phases': self.phases
+        }
+
+
+class BootSequence:
+    """Grafo di attività di avvio eseguite in thread separati"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.markers = {}
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add(self, name, func, requires=(), after=()):
+        """
+        Registra un'attività: func() parte dopo che le Dependency in requires sono
+        soddisfatte e le attività in after sono terminate con successo.
+        """
+        self.tasks[name] = BootTask(name, func, list(requires), list(after))
+
+    def mark(self, name):
+        """Registra un evento di avvio (es. 'web_ready') con il suo istante"""
+        with self._lock:
+            if name not in self.markers and self.started_at is not None:
+                self.markers[name] = round((time.monotonic() - self.started_at) * 1000)
+
+    def watch(self, name, dependency):
+        """Registra quando una condizione diventa vera, senza bloccare nessuna attività (dopo start)"""
+        def run():
+            if dependency.wait():
+                self.mark(name)
+        threading.Thread(target=run, name=f'boot-{name}', daemon=True).start()
+
+    def start(self):
+        self.started_at = time.monotonic()
+        print(f"[BOOT] 🚀 Avvio di {len(self.tasks)} attività in parallelo")
+        threads = []
+        for task in self.tasks.values():
+            thread = threading.Thread(target=self._run, args=(task,), name=f'boot-{task.name}', daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        def join():
+            for thread in threads:
+                thread.join()
+            self.finished_at = time.monotonic()
+            print(f"[BOOT] ✅ Avvio completato in {round((self.finished_at - self.started_at) * 1000)} ms")
+        threading.Thread(target=join, name='boot-join', daemon=True).start()
+
+    def _phase(self, task, label, t0, ok=True):
+        ms = round((time.monotonic() - t0) * 1000)
+        task.phases.append({'phase': label, 'ms': ms, 'ok': ok})
+        print(f"[BOOT] ⏱️  {task.name} / {label}: {ms} ms{'' if ok else ' (fallito)'}")
+
+    def _run(self, task):
+        try:
+            task.status = 'waiting'
+            for name in task.after:
+                t0 = time.monotonic()
+                other = self.tasks.get(name)
+                if other is not None:
+                    other.done.wait()
+                ok = other is None or other.status in ('done', 'skipped')
+                self._phase(task, f'attesa {name}', t0, ok)
+                if not ok:
+                    task.status = 'skipped'
+                    task.error = f'{name} non avviato'
+                    return
+
+            for dependency in task.requires:
+                t0 = time.monotonic()
+                ok = dependency.wait()
+                self._phase(task, f'attesa {dependency.name}', t0, ok)
+                if not ok:
+                    task.status = 'error'
+                    task.error = f'{dependency.name} non pronto dopo {dependency.timeout}s'
+                    print(f"[BOOT] ❌ {task.name}: {task.error}")
+                    return
+
+            task.status = 'starting'
+            task.started_at = time.monotonic()
+            t0 = time.monotonic()
+            try:
+                task.func()
+                task.status = 'done'
+            except Exception as e:
+                task.status = 'error'
+                task.error = str(e)
+                print(f"[BOOT] ❌ {task.name}: {e}")
+            self._phase(task, 'avvio', t0, task.status == 'done')
+        finally:
+            task.finished_at = time.monotonic()
+            task.done.set()
+
+    def status(self):
+        if self.started_at is None:
+            return {'started': False, 'tasks': {}}
+        t0 = self.started_at
+        return {
+            'started': True,
+            'running': self.finished_at is None,
+            'total_ms': round(((self.finished_at or time.monotonic()) - t0) * 1000),
+            'markers': dict(self.markers),
+            'tasks': {name: task.to_dict(t0) for name, task in self.tasks.items()}
+        }
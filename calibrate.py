@@ -0,0 +1,246 @@
+"""
+Calibrazione dei profili di streaming
+Brevi codifiche di prova sulla scheda e sulla telecamera reali (stessa pipeline
+FFmpeg dello stream RTSP, uscita scartata) per ogni profilo candidato di
+risoluzione e framerate: si misurano fps ottenuti, CPU e aumento di temperatura
+e si salva una tabella delle capacità. La tabella serve a segnalare o rifiutare i
+profili che la scheda non regge e a proporre il profilo più alto sostenibile.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+
+import psutil
+
+import backend
+
+DEFAULT_CALIBRATION_CONFIG = {
+    'resolutions': ['320x240', '640x480', '720x576', '800x600', '1280x720'],
+    'framerates': [10, 15, 25, 30],
+    'trial_seconds': 8,        # durata di ogni prova
+    'warmup_seconds': 2,       # secondi iniziali esclusi dalla misura (apertura device, encoder)
+    'min_fps_ratio': 0.9,      # fps ottenuti / richiesti per considerare il profilo sostenibile
+    'max_cpu': 90,             # CPU di sistema massima durante la prova (%)
+    'max_temperature': 75,     # oltre questa temperatura la scheda rischia il throttling
+    'cooldown_seconds': 20     # attesa massima tra due prove per tornare alla temperatura iniziale
+}
+
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+
+
+def read_temperature():
+    try:
+        with open(THERMAL_ZONE, 'r') as f:
+            return float(f.read()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+def board_model():
+    try:
+        with open('/proc/device-tree/model', 'r') as f:
+            return f.read().strip('\x00\n ')
+    except OSError:
+        return None
+
+
+def pixels(resolution):
+    width, _, height = str(resolution).partition('x')
+    try:
+        return int(width) * int(height)
+    except ValueError:
+        return 0
+
+
+def run_trial(cmd, duration, warmup):
+    """
+    Esegue una codifica di prova (cmd deve scrivere il progresso su stdout con
+    -progress pipe:1) e misura fps, CPU del processo e di sistema, temperatura.
+    """
+    temp_start = read_temperature()
+    temp_peak = temp_start
+    samples = []
+    process = backend.popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Telecamera bloccata o FFmpeg che non termina: la prova viene interrotta
+    killer = threading.Timer(duration + warmup + 15, process.kill)
+    killer.start()
+    stderr = []
+    stderr_thread = threading.Thread(target=lambda: stderr.extend(process.stderr.read().decode(errors='replace').splitlines()),
+                                     daemon=True)
+    stderr_thread.start()
+    try:
+        proc = psutil.Process(process.pid)
+        psutil.cpu_percent(None)
+        t_start = time.monotonic()
+        frame = None
+        for raw in iter(process.stdout.readline, b''):
+            key, _, value = raw.decode(errors='replace').strip().partition('=')
+            if key == 'frame':
+                frame = int(value or 0)
+            elif key == 'progress' and frame is not None:
+                # Fine di un blocco di progresso: un campione
+                try:
+                    cpu = sum(proc.cpu_times()[:2])
+                except psutil.Error:
+                    cpu = samples[-1][2] if samples else 0.0
+                samples.append((time.monotonic() - t_start, frame, cpu, psutil.cpu_percent(None)))
+                temperature = read_temperature()
+                if temperature is not None and (temp_peak is None or temperature > temp_peak):
+                    temp_peak = temperature
+        process.wait()
+    finally:
+        killer.cancel()
+        stderr_thread.join(timeout=2)
+
+    measured = [s for s in samples if s[0] >= warmup]
+    if process.returncode != 0 and len(measured) < 2:
+        error = next((line for line in reversed(stderr) if line.strip()), f'codice {process.returncode}')
+        return {'error': error}
+    if len(measured) < 2:
+        return {'error': 'Nessun frame codificato'}
+    first, last = measured[0], measured[-1]
+    elapsed = max(last[0] - first[0], 1e-6)
+    return {
+        'fps': round((last[1] - first[1]) / elapsed, 1),
+        'process_cpu': round((last[2] - first[2]) / elapsed * 100),
+        'system_cpu': round(max(s[3] for s in measured[1:])),
+        'temperature_start': temp_start,
+        'temperature_peak': temp_peak,
+        'temperature_rise': round(temp_peak - temp_start, 1) if temp_start is not None else None
+    }
+
+
+def evaluate(trial, framerate, settings):
+    """(sostenibile, motivo) per l'esito di una prova"""
+    if 'error' in trial:
+        return False, trial['error']
+    if trial['fps'] < framerate * settings['min_fps_ratio']:
+        return False, f"{trial['fps']} fps su {framerate} richiesti"
+    if trial['system_cpu'] > settings['max_cpu']:
+        return False, f"CPU al {trial['system_cpu']}%"
+    peak = trial.get('temperature_peak')
+    if peak is not None and peak > settings['max_temperature']:
+        return False, f"temperatura {peak:.1f}°C"
+    return True, None
+
+
+def cool_down(baseline, limit):
+    """Attende che la temperatura torni vicina a quella iniziale (al massimo limit secondi)"""
+    if baseline is None:
+        return
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        temperature = read_temperature()
+        if temperature is None or temperature <= baseline + 2:
+            return
+        time.sleep(1)
+
+
+def calibrate(device, encoder, trial_command, settings=None, on_progress=None):
+    """
+    Prova i profili dal più leggero al più pesante. trial_command(resolution, framerate,
+    seconds) costruisce il comando di prova. Se un framerate non è sostenibile non si
+    provano quelli più alti per la stessa risoluzione; se non lo è il framerate più basso
+    non si provano le risoluzioni più alte.
+    """
+    settings = dict(DEFAULT_CALIBRATION_CONFIG, **(settings or {}))
+    resolutions = sorted(settings['resolutions'], key=pixels)
+    framerates = sorted(int(f) for f in settings['framerates'])
+    total = len(resolutions) * len(framerates)
+    baseline = read_temperature()
+    results = []
+    done = 0
+    stop_resolutions = False
+    for resolution in resolutions:
+        for index, framerate in enumerate(framerates):
+            done += 1
+            if stop_resolutions:
+                results.append({'resolution': resolution, 'framerate': framerate,
+                                'sustainable': False, 'tested': False, 'reason': 'risoluzione più bassa non sostenibile'})
+                continue
+            if on_progress is not None:
+                on_progress(done * 100 // (total + 1), f'Prova {resolution} a {framerate} fps')
+            cool_down(baseline, settings['cooldown_seconds'])
+            trial = run_trial(trial_command(resolution, framerate, settings['trial_seconds'] + settings['warmup_seconds']),
+                              settings['trial_seconds'], settings['warmup_seconds'])
+            sustainable, reason = evaluate(trial, framerate, settings)
+            results.append(dict(trial, resolution=resolution, framerate=framerate,
+                                sustainable=sustainable, tested=True, reason=reason))
+            print(f"[CALIBRATION] {'✅' if sustainable else '❌'} {resolution}@{framerate}: "
+                  f"{trial.get('fps', '-')} fps, CPU {trial.get('system_cpu', '-')}%"
+                  + (f" ({reason})" if reason else ''))
+            if not sustainable:
+                if index == 0:
+                    stop_resolutions = True
+                for higher in framerates[index + 1:]:
+                    done += 1
+                    results.append({'resolution': resolution, 'framerate': higher,
+                                    'sustainable': False, 'tested': False, 'reason': f'{framerate} fps non sostenibile'})
+                break
+    table = {
+        'device': device,
+        'encoder': encoder,
+        'board': board_model(),
+        'timestamp': time.time(),
+        'settings': settings,
+        'results': results
+    }
+    table['best'] = best_profile(table)
+    return table
+
+
+def best_profile(table):
+    """Profilo sostenibile con più pixel al secondo (a parità, la risoluzione più alta)"""
+    candidates = [r for r in table.get('results', []) if r.get('sustainable')]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda r: (pixels(r['resolution']) * r['framerate'], pixels(r['resolution'])))
+    return {'resolution': best['resolution'], 'framerate': best['framerate']}
+
+
+def check_profile(table, resolution, framerate):
+    """
+    Il profilo è sostenibile? True se un profilo provato con risoluzione e framerate
+    uguali o maggiori lo è, False se non lo è uno uguale o minore, None se non si sa.
+    """
+    framerate = int(framerate)
+    size = pixels(resolution)
+    results = table.get('results', [])
+    sustainable = None
+    reason = None
+    for result in results:
+        if result.get('sustainable') and pixels(result['resolution']) >= size and result['framerate'] >= framerate:
+            sustainable = True
+            break
+    if sustainable is None:
+        failed = [r for r in results
+                  if r.get('tested') and not r.get('sustainable')
+                  and pixels(r['resolution']) <= size and r['framerate'] <= framerate]
+        if failed:
+            # La prova fallita più vicina al profilo richiesto
+            closest = max(failed, key=lambda r: (pixels(r['resolution']), r['framerate']))
+            sustainable = False
+            reason = f"{closest['resolution']} a {closest['framerate']} fps non sostenibile: {closest.get('reason')}"
+    return {
+        'sustainable': sustainable,
+        'reason': reason,
+        'suggestion': table.get('best')
+    }
+
+
+def load_tables(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_table(path, table):
+    """Salva la tabella del dispositivo (una per telecamera)"""
+    tables = load_tables(path)
+    tables[table['device']] = table
+    with open(path, 'w') as f:
+        json.dump(tables, f, indent=2)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Vista di flotta
+Entry point separato: interroga in parallelo lo /api/status di molti videoStreamer
+(una sessione con connessioni keep-alive per dispositivo) e unisce stato degli
+stream e metriche di sistema in un'unica vista. I dispositivi irraggiungibili
+restano in elenco con l'ultimo stato noto e vengono interrogati meno spesso.
+
+Uso:
+    python3 fleet.py                 # tabella aggiornata di continuo
+    python3 fleet.py --once --json   # un solo giro, in JSON
+    python3 fleet.py --serve         # vista JSON su http://127.0.0.1:5100/api/fleet
+    python3 fleet.py --rollout stato.json [--dry-run]   # stato desiderato su tutti i dispositivi
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import rollout
+from fleetclient import HostSession, HttpError
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+FLEET_FILE = os.path.join(APP_DIR, 'fleet.json')
+
+DEFAULT_FLEET_CONFIG = {
+    'interval': 5,          # secondi tra due giri di interrogazione
+    'timeout': 5,           # timeout per dispositivo (login compreso)
+    'max_connections': 2,   # connessioni keep-alive per dispositivo
+    'max_backoff': 60,      # intervallo massimo per i dispositivi irraggiungibili
+    'username': 'admin',    # credenziali web di default (sovrascrivibili per dispositivo)
+    'password': 'admin',
+    'listen': '127.0.0.1',
+    'port': 5100,
+    'devices': [],          # [{"name": "cam-01", "url": "http://192.168.1.101"}, ...]
+    'rollout': {}           # opzioni di default del rollout (vedi rollout.DEFAULT_ROLLOUT_OPTIONS)
+}
+
+
+def load_fleet_config(path=FLEET_FILE):
+    with open(path, 'r') as f:
+        return dict(DEFAULT_FLEET_CONFIG, **json.load(f))
+
+
+def device_session(device, config):
+    """Sessione verso un dispositivo con le credenziali sue o quelle di default"""
+    return HostSession(
+        device['url'],
+        device.get('username', config['username']),
+        device.get('password', config['password']),
+        timeout=device.get('timeout', config['timeout']),
+        max_connections=config['max_connections']
+    )
+
+
+def summarize_status(status):
+    """Parte di /api/status utile nella vista di flotta"""
+    watchdog = status.get('watchdog') or {}
+    output = status.get('mjpeg_output') or {}
+    config = status.get('config') or {}
+    streams = {}
+    for stream_id in ('mjpg', 'rtsp'):
+        stream_config = config.get(stream_id, {})
+        streams[stream_id] = {
+            'running': bool(status.get(f'{stream_id}_running')),
+            'on_demand': stream_id in (status.get('on_demand') or {}),
+            'source': stream_config.get('source_type', 'device'),
+            'resolution': stream_config.get('resolution'),
+            'health': (watchdog.get('streams') or {}).get(stream_id, {}).get('state')
+        }
+    return {
+        'streams': streams,
+        'mjpeg_clients': len(output.get('clients') or []),
+        'system': status.get('system') or {}
+    }
+
+
+class DeviceState:
+    """Ultimo stato noto di un dispositivo e salute dell'interrogazione"""
+
+    def __init__(self, device):
+        self.name = device.get('name') or device['url']
+        self.url = device['url']
+        self.online = None
+        self.summary = None
+        self.last_seen = None
+        self.last_error = None
+        self.failures = 0
+        self.latency_ms = None
+        self.next_poll = 0.0
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'url': self.url,
+            'online': self.online,
+            # Dati dell'ultimo giro riuscito se il dispositivo ora non risponde
+            'stale': bool(self.summary) and not self.online,
+            'last_seen': self.last_seen,
+            'latency_ms': self.latency_ms,
+            'failures': self.failures,
+            'error': self.last_error,
+            **(self.summary or {})
+        }
+
+
+class FleetMonitor:
+    """Interroga tutti i dispositivi in parallelo e mantiene la vista unita"""
+
+    def __init__(self, config):
+        self.config = config
+        self.devices = [DeviceState(d) for d in config['devices']]
+        self.rounds = 0
+        self.round_ms = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, index):
+        session = self._sessions.get(index)
+        if session is None:
+            session = self._sessions[index] = device_session(self.config['devices'][index], self.config)
+        return session
+
+    async def poll_device(self, index):
+        state = self.devices[index]
+        t0 = time.monotonic()
+        try:
+            status = await self._session(index).get_json('/api/status')
+            if not isinstance(status, dict):
+                raise HttpError('Risposta di stato non valida')
+            summary = summarize_status(status)
+        except HttpError as e:
+            with self._lock:
+                if state.online is not False:
+                    print(f"[FLEET] ⚠️  {state.name} non raggiungibile: {e}")
+                state.online = False
+                state.last_error = str(e)
+                state.failures += 1
+                # Dispositivo spento o fuori rete: si riprova sempre meno spesso
+                backoff = min(self.config['interval'] * 2 ** min(state.failures - 1, 6), self.config['max_backoff'])
+                state.next_poll = time.monotonic() + backoff
+            return
+        with self._lock:
+            if state.online is False:
+                print(f"[FLEET] ✅ {state.name} di nuovo raggiungibile")
+            state.online = True
+            state.summary = summary
+            state.last_seen = time.time()
+            state.last_error = None
+            state.failures = 0
+            state.latency_ms = round((time.monotonic() - t0) * 1000)
+            state.next_poll = 0.0
+
+    async def poll_once(self, force=False):
+        """Un giro su tutti i dispositivi dovuti (tutti con force=True)"""
+        t0 = time.monotonic()
+        due = [i for i, state in enumerate(self.devices) if force or state.next_poll <= t0]
+        await asyncio.gather(*(self.poll_device(i) for i in due))
+        self.rounds += 1
+        self.round_ms = round((time.monotonic() - t0) * 1000)
+
+    async def run(self, on_round=None, stop=None):
+        while stop is None or not stop.is_set():
+            t0 = time.monotonic()
+            await self.poll_once()
+            if on_round is not None:
+                on_round(self)
+            await asyncio.sleep(max(0.0, self.config['interval'] - (time.monotonic() - t0)))
+
+    async def close(self):
+        await asyncio.gather(*(session.close() for session in self._sessions.values()))
+
+    def view(self):
+        """Vista unita: un elemento per dispositivo e i totali della flotta"""
+        with self._lock:
+            devices = [state.to_dict() for state in self.devices]
+        online = [d for d in devices if d['online']]
+        temperatures = [d['system'].get('temperature') or 0 for d in online]
+        cpus = [d['system'].get('cpu') or 0 for d in online]
+        return {
+            'timestamp': time.time(),
+            'rounds': self.rounds,
+            'round_ms': self.round_ms,
+            'summary': {
+                'devices': len(devices),
+                'online': len(online),
+                'offline': sum(1 for d in devices if d['online'] is False),
+                'streams_running': sum(s['running'] for d in online for s in d['streams'].values()),
+                'streams_unhealthy': sum(
+                    1 for d in online for s in d['streams'].values()
+                    if s['health'] not in (None, 'ok', 'idle', 'starting', 'stopped')),
+                'mjpeg_clients': sum(d['mjpeg_clients'] for d in online),
+                'cpu_avg': round(sum(cpus) / len(cpus), 1) if cpus else None,
+                'temperature_max': max(temperatures) if temperatures else None
+            },
+            'devices': devices
+        }
+
+
+def format_table(view):
+    """Vista di flotta come tabella di testo"""
+    summary = view['summary']
+    lines = [
+        f"Dispositivi: {summary['online']}/{summary['devices']} online   "
+        f"Stream attivi: {summary['streams_running']}   Con problemi: {summary['streams_unhealthy']}   "
+        f"Client MJPEG: {summary['mjpeg_clients']}   Giro: {view['round_ms']} ms",
+        f"{'NOME':<20} {'STATO':<8} {'MJPG':<10} {'RTSP':<10} {'CPU':>5} {'MEM':>5} {'TEMP':>6} {'MS':>6}"
+    ]
+
+    def stream_cell(stream):
+        if not stream['running']:
+            return '-'
+        return stream['health'] or 'on'
+
+    for device in view['devices']:
+        if device['online'] is None:
+            lines.append(f"{device['name'][:20]:<20} {'...':<8}")
+            continue
+        state = 'online' if device['online'] else ('stale' if device['stale'] else 'offline')
+        if 'streams' not in device:
+            lines.append(f"{device['name'][:20]:<20} {state:<8} {device['error'] or ''}")
+            continue
+        system = device['system']
+        lines.append(
+            f"{device['name'][:20]:<20} {state:<8} "
+            f"{stream_cell(device['streams']['mjpg']):<10} {stream_cell(device['streams']['rtsp']):<10} "
+            f"{system.get('cpu', 0):>4.0f}% {system.get('memory', 0):>4.0f}% {system.get('temperature', 0):>5.1f}° "
+            f"{device['latency_ms'] if device['latency_ms'] is not None else '-':>6}"
+        )
+    return '\n'.join(lines)
+
+
+def serve(monitor, host, port):
+    """Vista JSON via HTTP, aggiornata da un loop asyncio in un thread"""
+    from flask import Flask, jsonify
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(monitor.run(),),
+                     name='fleet-monitor', daemon=True).start()
+
+    fleet_app = Flask(__name__)
+
+    @fleet_app.route('/api/fleet')
+    def api_fleet():
+        return jsonify(monitor.view())
+
+    print(f"[FLEET] 🌐 Vista di flotta su http://{host}:{port}/api/fleet ({len(monitor.devices)} dispositivi)")
+    fleet_app.run(host=host, port=port, debug=False)
+
+
+def run_rollout(config, desired, options, dry_run, as_json):
+    """Rollout dello stato desiderato con avanzamento dispositivo per dispositivo"""
+    job = rollout.FleetRollout(config['devices'], desired, lambda device: device_session(device, config),
+                               options, dry_run=dry_run)
+
+    def progress(result):
+        if as_json:
+            return
+        actions = ', '.join(f"{c['component']}={c['action']}" for c in result.actions)
+        detail = result.error or actions
+        print(f"[ROLLOUT] {result.name:<20} {result.status:<10} {result.ms:>6} ms  {detail}")
+
+    if as_json:
+        # Solo il report su stdout: i messaggi di avanzamento vanno su stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(job.run(on_result=progress))
+    else:
+        report = asyncio.run(job.run(on_result=progress))
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        counts = ', '.join(f'{status}: {count}' for status, count in sorted(report['counts'].items()))
+        print(f"[ROLLOUT] {'✅' if report['success'] else '❌'} Completato in {report['total_ms']} ms ({counts})")
+    return report['success']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stato della flotta di videoStreamer')
+    parser.add_argument('--config', default=FLEET_FILE, help='file JSON con i dispositivi (default fleet.json)')
+    parser.add_argument('--once', action='store_true', help='un solo giro di interrogazione')
+    parser.add_argument('--json', action='store_true', help='stampa la vista in JSON')
+    parser.add_argument('--serve', action='store_true', help='espone la vista su HTTP (/api/fleet)')
+    parser.add_argument('--rollout', metavar='FILE', help='applica lo stato desiderato (JSON come /api/state)')
+    parser.add_argument('--dry-run', action='store_true', help='rollout: mostra solo le azioni previste')
+    parser.add_argument('--canary', type=int, help='rollout: dispositivi del primo gruppo')
+    parser.add_argument('--batch-size', type=int, help='rollout: dispositivi per gruppo')
+    parser.add_argument('--parallel', type=int, help='rollout: richieste contemporanee')
+    parser.add_argument('--max-failures', type=int, help='rollout: errori tollerati per gruppo')
+    args = parser.parse_args()
+
+    config = load_fleet_config(args.config)
+    if not config['devices']:
+        print(f"❌ Nessun dispositivo in {args.config}")
+        return
+
+    if args.rollout:
+        with open(args.rollout, 'r') as f:
+            desired = json.load(f)
+        options = dict(config['rollout'], **{
+            key: value for key, value in (
+                ('canary', args.canary), ('batch_size', args.batch_size),
+                ('parallel', args.parallel), ('max_failures', args.max_failures)
+            ) if value is not None
+        })
+        sys.exit(0 if run_rollout(config, desired, options, args.dry_run, args.json) else 1)
+
+    monitor = FleetMonitor(config)
+
+    if args.serve:
+        serve(monitor, config['listen'], config['port'])
+        return
+
+    def show(monitor):
+        view = monitor.view()
+        if args.json:
+            print(json.dumps(view, indent=2))
+        else:
+            # Aggiornamento continuo: si ridisegna la schermata
+            print(('' if args.once else '\033[2J\033[H') + format_table(view))
+
+    async def run():
+        try:
+            if args.once:
+                await monitor.poll_once(force=True)
+                show(monitor)
+            else:
+                await monitor.run(on_round=show)
+        finally:
+            await monitor.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Client HTTP asincrono per la flotta
+Sessione verso un videoStreamer remoto su asyncio (solo libreria standard): pool di
+connessioni keep-alive per host, cookie di sessione riusato tra le richieste (login
+una sola volta, ripetuto se la sessione scade) e timeout per ogni host.
+"""
+
+import asyncio
+import json
+import ssl
+import urllib.parse
+
+DEFAULT_TIMEOUT = 5
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class HttpError(Exception):
+    """Host irraggiungibile, risposta non valida o timeout"""
+
+
+class AuthError(HttpError):
+    """Login rifiutato dal dispositivo"""
+
+
+class HttpResponse:
+    def __init__(self, status, headers, cookies, body):
+        self.status = status
+        self.headers = headers
+        self.cookies = cookies
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError:
+            raise HttpError(f"Risposta non JSON (HTTP {self.status})")
+
+
+class HostSession:
+    """Sessione autenticata verso un dispositivo, con al massimo max_connections connessioni"""
+
+    def __init__(self, base_url, username='admin', password='admin', timeout=DEFAULT_TIMEOUT, max_connections=2):
+        url = urllib.parse.urlsplit(base_url if '://' in base_url else f'http://{base_url}')
+        self.base_url = base_url
+        self.host = url.hostname
+        self.secure = url.scheme == 'https'
+        self.port = url.port or (443 if self.secure else 80)
+        self.prefix = url.path.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.cookies = {}
+        self.requests = 0
+        self.connections_opened = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self._login_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Connessioni
+    # ------------------------------------------------------------------
+
+    async def _open(self):
+        context = ssl.create_default_context() if self.secure else None
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+        self.connections_opened += 1
+        return reader, writer
+
+    def _discard(self, connection):
+        try:
+            connection[1].close()
+        except Exception:
+            pass
+
+    async def _exchange(self, connection, method, path, body, headers):
+        reader, writer = connection
+        lines = [f'{method} {self.prefix}{path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 'Connection: keep-alive', f'Content-Length: {len(body)}']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        lines += [f'{k}: {v}' for k, v in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connessione chiusa dal server')
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise HttpError(f"Risposta non valida: {status_line[:80]!r}")
+        version, status = parts[0], int(parts[1])
+
+        response_headers = {}
+        cookies = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';', 1)[0].partition('=')
+                cookies[cookie_name.strip()] = cookie_value.strip()
+            else:
+                response_headers[name] = value
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                data += await reader.readexactly(size)
+                await reader.readexactly(2)
+                if len(data) > MAX_BODY_SIZE:
+                    raise HttpError('Risposta troppo grande')
+            response_body = bytes(data)
+            reusable = True
+        elif 'content-length' in response_headers:
+            length = int(response_headers['content-length'])
+            if length > MAX_BODY_SIZE:
+                # Corpo non letto per intero: la connessione non è riutilizzabile (viene scartata)
+                raise HttpError('Risposta troppo grande')
+            response_body = await reader.readexactly(length)
+            reusable = True
+        else:
+            response_body = await reader.read(MAX_BODY_SIZE)
+            reusable = False
+
+        if version == 'HTTP/1.0' or response_headers.get('connection', '').lower() == 'close':
+            reusable = False
+        return HttpResponse(status, response_headers, cookies, response_body), reusable
+
+    async def _send(self, method, path, body=b'', headers=None):
+        """Una richiesta su una connessione del pool (riaperta se quella inattiva era scaduta)"""
+        headers = headers or {}
+        async with self._slots:
+            for attempt in range(2):
+                reused = bool(self._idle)
+                connection = self._idle.pop() if reused else await self._open()
+                try:
+                    response, reusable = await self._exchange(connection, method, path, body, headers)
+                except asyncio.CancelledError:
+                    self._discard(connection)
+                    raise
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    self._discard(connection)
+                    if reused and attempt == 0:
+                        # Il server ha chiuso la connessione keep-alive inattiva: si riprova su una nuova
+                        continue
+                    raise
+                except Exception:
+                    self._discard(connection)
+                    raise
+                if reusable:
+                    self._idle.append(connection)
+                else:
+                    self._discard(connection)
+                self.requests += 1
+                self.cookies.update(response.cookies)
+                return response
+
+    # ------------------------------------------------------------------
+    # Sessione
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _needs_login(response):
+        return response.status == 401 or (
+            response.status in (301, 302, 303) and '/login' in response.headers.get('location', ''))
+
+    async def login(self):
+        """Login sul form web: la sessione Flask arriva nel cookie"""
+        async with self._login_lock:
+            form = urllib.parse.urlencode({'username': self.username, 'password': self.password}).encode()
+            response = await self._send('POST', '/login', form,
+                                        {'Content-Type': 'application/x-www-form-urlencoded'})
+            # Login riuscito = redirect alla dashboard; altrimenti la pagina di login con l'errore
+            if response.status not in (302, 303):
+                raise AuthError(f"Login rifiutato da {self.host}:{self.port}")
+
+    async def request(self, method, path, json_body=None, form=None, timeout=None, data=None, content_type=None):
+        """
+        Richiesta autenticata; il timeout vale per l'intera operazione (login compreso).
+        data e content_type per un corpo già pronto (es. upload multipart)
+        """
+        if data is not None:
+            body, headers = data, {'Content-Type': content_type or 'application/octet-stream'}
+        elif json_body is not None:
+            body, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            body = urllib.parse.urlencode(form).encode()
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        else:
+            body, headers = b'', {}
+
+        async def attempt():
+            response = await self._send(method, path, body, headers)
+            if self._needs_login(response):
+                await self.login()
+                response = await self._send(method, path, body, headers)
+                if self._needs_login(response):
+                    raise AuthError(f"Sessione rifiutata da {self.host}:{self.port}")
+            return response
+
+        try:
+            return await asyncio.wait_for(attempt(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(f"Timeout ({timeout or self.timeout}s) verso {self.host}:{self.port}")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            raise HttpError(f"{self.host}:{self.port} non raggiungibile: {e}")
+
+    async def get_json(self, path, timeout=None):
+        return (await self.request('GET', path, timeout=timeout)).json()
+
+    async def post_json(self, path, payload, timeout=None):
+        return (await self.request('POST', path, json_body=payload, timeout=timeout)).json()
+
+    async def close(self):
+        while self._idle:
+            self._discard(self._idle.pop())
@@ -0,0 +1,287 @@
+"""
+Anello di frame in memoria condivisa
+Con più processi worker per il server web, un solo processo cattura (apre la
+telecamera e legge la pipeline) e pubblica i JPEG in un anello in
+multiprocessing.shared_memory; tutti i worker leggono l'ultimo frame senza copie
+tramite memoryview. Un solo scrittore, lettori senza lock: ogni slot porta il
+numero di sequenza all'inizio e alla fine della scrittura (seqlock), così un
+lettore si accorge se lo slot è stato sovrascritto mentre lo stava usando.
+"""
+
+import fcntl
+import os
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import frames
+
+DEFAULT_RING_CONFIG = {
+    'enabled': False,
+    'slots': 4,
+    'slot_size_kb': 512
+}
+
+MAGIC = b'VSFR'
+# magic, versione, slot, dimensione slot, ultima sequenza scritta, ultima richiesta dei lettori, pid scrittore
+HEADER = struct.Struct('<4sIIIQdI')
+HEADER_SIZE = 64
+# inizio scrittura (seq), fine scrittura (seq), timestamp, lunghezza
+SLOT_HEADER = struct.Struct('<QQdI')
+SLOT_HEADER_SIZE = 32
+
+WRITE_SEQ_OFFSET = 16
+DEMAND_OFFSET = 24
+# Accesso a un anello già chiuso (buf None o memoria rilasciata)
+CLOSED = (TypeError, ValueError)
+LOCK_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp'
+
+
+def ring_name(stream_id):
+    return f'videostreamer-{stream_id}'
+
+
+def _open_shared_memory(name, size):
+    """Crea o apre il segmento; il resource tracker non deve cancellarlo all'uscita del processo"""
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        created = True
+    except FileExistsError:
+        shm = shared_memory.SharedMemory(name=name)
+        created = False
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm, created
+
+
+class FrameRing:
+    """Anello di slot a dimensione fissa con intestazione globale"""
+
+    def __init__(self, stream_id, slots=4, slot_size=512 * 1024):
+        self.name = ring_name(stream_id)
+        self.shm, created = _open_shared_memory(
+            self.name, HEADER_SIZE + slots * (SLOT_HEADER_SIZE + slot_size)
+        )
+        self.buf = self.shm.buf
+        if created or bytes(self.buf[0:4]) != MAGIC:
+            HEADER.pack_into(self.buf, 0, MAGIC, 1, slots, slot_size, 0, 0.0, 0)
+        # Geometria dall'intestazione: vale quella di chi ha creato il segmento
+        _, _, self.slots, self.slot_size, _, _, _ = HEADER.unpack_from(self.buf, 0)
+        self.dropped = 0
+
+    def _slot_offset(self, seq):
+        return HEADER_SIZE + (seq % self.slots) * (SLOT_HEADER_SIZE + self.slot_size)
+
+    # ------------------------------------------------------------------
+    # Scrittore (un solo processo)
+    # ------------------------------------------------------------------
+
+    def write(self, jpeg, timestamp=None):
+        """Pubblica un frame nello slot successivo"""
+        length = len(jpeg)
+        if length > self.slot_size:
+            self.dropped += 1
+            return False
+        seq = self.write_seq() + 1
+        offset = self._slot_offset(seq)
+        # Inizio scrittura: begin != end finché lo slot non è completo
+        struct.pack_into('<Q', self.buf, offset, seq)
+        data = offset + SLOT_HEADER_SIZE
+        self.buf[data:data + length] = jpeg
+        struct.pack_into('<dI', self.buf, offset + 16, timestamp or time.time(), length)
+        struct.pack_into('<Q', self.buf, offset + 8, seq)
+        struct.pack_into('<Q', self.buf, WRITE_SEQ_OFFSET, seq)
+        return True
+
+    def set_writer(self, pid):
+        struct.pack_into('<I', self.buf, 32, pid)
+
+    # ------------------------------------------------------------------
+    # Lettori (qualsiasi processo, senza lock)
+    # ------------------------------------------------------------------
+
+    # Dopo close() buf è None (TypeError) e la memoria condivisa è rilasciata (ValueError):
+    # un lettore ancora in corso in un altro thread vede "nessun frame"
+
+    def write_seq(self):
+        try:
+            return struct.unpack_from('<Q', self.buf, WRITE_SEQ_OFFSET)[0]
+        except CLOSED:
+            return 0
+
+    def touch(self):
+        """Segnala allo scrittore che qualcuno sta leggendo"""
+        try:
+            struct.pack_into('<d', self.buf, DEMAND_OFFSET, time.time())
+        except CLOSED:
+            pass
+
+    def demand(self):
+        try:
+            return struct.unpack_from('<d', self.buf, DEMAND_OFFSET)[0]
+        except CLOSED:
+            return 0.0
+
+    def last_timestamp(self):
+        seq = self.write_seq()
+        if seq == 0:
+            return 0.0
+        try:
+            return struct.unpack_from('<d', self.buf, self._slot_offset(seq) + 16)[0]
+        except CLOSED:
+            return 0.0
+
+    def latest_view(self):
+        """
+        Ultimo frame senza copie: (memoryview, seq, timestamp) oppure (None, 0, 0.0).
+        La vista resta valida finché valid(seq) è True; va rilasciata con release().
+        """
+        try:
+            for _ in range(3):
+                seq = self.write_seq()
+                if seq == 0:
+                    return None, 0, 0.0
+                offset = self._slot_offset(seq)
+                begin, end, timestamp, length = SLOT_HEADER.unpack_from(self.buf, offset)
+                if begin == end == seq:
+                    data = offset + SLOT_HEADER_SIZE
+                    return self.buf[data:data + length], seq, timestamp
+        except CLOSED:
+            pass
+        return None, 0, 0.0
+
+    def valid(self, seq):
+        """True se lo slot del frame seq non è stato (neanche in parte) riscritto"""
+        try:
+            begin, end = struct.unpack_from('<QQ', self.buf, self._slot_offset(seq))
+        except CLOSED:
+            return False
+        return begin == end == seq
+
+    def latest(self):
+        """Ultimo frame copiato in bytes (per l'invio HTTP): (jpeg, seq, timestamp)"""
+        for _ in range(3):
+            view, seq, timestamp = self.latest_view()
+            if view is None:
+                return None, 0, 0.0
+            try:
+                data = bytes(view)
+            finally:
+                view.release()
+            if self.valid(seq):
+                return data, seq, timestamp
+        return None, 0, 0.0
+
+    def close(self):
+        self.buf = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Viste zero-copy ancora aperte: il segmento verrà chiuso all'uscita
+            pass
+
+    def status(self):
+        return {
+            'name': self.name,
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+            'seq': self.write_seq(),
+            'dropped': self.dropped
+        }
+
+
+class RingBuffer:
+    """Vista di un FrameRing con la stessa interfaccia di frames.FrameBuffer"""
+
+    def __init__(self, ring, poll_interval=0.01):
+        self.ring = ring
+        self.poll_interval = poll_interval
+
+    def latest(self):
+        return self.ring.latest()
+
+    def wait_next(self, last_seq, timeout):
+        """Attende (in polling: i processi non condividono una Condition) un frame più recente"""
+        deadline = time.monotonic() + timeout
+        while self.ring.write_seq() <= last_seq and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+        return self.ring.latest()
+
+
+class SharedFrameSource(frames.FrameSource):
+    """
+    Sorgente di frame condivisa tra processi.
+
+    Il primo processo che ottiene il lock del file di cattura diventa lo scrittore:
+    avvia la sorgente reale (capture_factory()) e ne copia ogni frame nell'anello
+    finché qualche processo lo richiede. Tutti, scrittore compreso, leggono dall'anello.
+    Se lo scrittore termina, il lock si libera e il prossimo lettore ne prende il posto.
+    """
+
+    def __init__(self, stream_id, fps, capture_factory, slots=4, slot_size=512 * 1024, idle_timeout=60):
+        super().__init__(stream_id, fps, idle_timeout)
+        self.capture_factory = capture_factory
+        self.ring = FrameRing(stream_id, slots, slot_size)
+        self.buffer = RingBuffer(self.ring, poll_interval=min(0.01, self.frame_interval / 4))
+        self.capture = None
+        self._lock_file = None
+        self._keeper = None
+
+    def touch(self):
+        self.last_access = time.time()
+        self.ring.touch()
+
+    def is_owner(self):
+        return self._lock_file is not None
+
+    def is_running(self):
+        if self.capture is not None:
+            return self.capture.is_running()
+        # Lettore: la cattura è attiva in un altro processo se arrivano frame
+        return time.time() - self.ring.last_timestamp() < 5
+
+    def ensure_running(self):
+        self.touch()
+        with self._lock:
+            if self.capture is None and not self._stop.is_set():
+                self._try_become_writer()
+
+    def _try_become_writer(self):
+        path = os.path.join(LOCK_DIR, f'{self.ring.name}.lock')
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Un altro processo sta già catturando
+            lock_file.close()
+            return
+        self._lock_file = lock_file
+        self.ring.set_writer(os.getpid())
+        self.capture = self.capture_factory()
+        self.capture.buffer.mirror = self.ring
+        print(f"[RING] ✍️  Processo {os.getpid()} scrive i frame di {self.stream_id} in memoria condivisa")
+        self._keeper = threading.Thread(target=self._keep_alive, name=f'ring-{self.stream_id}', daemon=True)
+        self._keeper.start()
+
+    def _keep_alive(self):
+        """Tiene attiva la cattura finché un qualsiasi processo legge dall'anello"""
+        while not self._stop.is_set():
+            if time.time() - self.ring.demand() < self.idle_timeout:
+                self.capture.touch()
+                self.capture.ensure_running()
+            self._stop.wait(1)
+
+    def stop(self):
+        self._stop.set()
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def status(self):
+        return dict(self.ring.status(), writer=self.is_owner(), pid=os.getpid())
@@ -0,0 +1,394 @@
+"""
+Buffer dei frame live degli stream
+Mantiene in memoria l'ultimo frame JPEG di ogni pipeline, letto una sola volta
+e condiviso da snapshot e client HTTP
+"""
+
+import base64
+import subprocess
+import threading
+import time
+import urllib.request
+
+import proclogs
+
+
+class FrameBuffer:
+    """Ultimo frame JPEG di uno stream con numero di sequenza e timestamp"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.data = None
+        self.seq = 0
+        self.timestamp = 0.0
+        # Copia opzionale di ogni frame per altri processi (framering.FrameRing)
+        self.mirror = None
+
+    def publish(self, jpeg):
+        """Pubblica un nuovo frame e sveglia chi è in attesa"""
+        with self._cond:
+            self.data = jpeg
+            self.seq += 1
+            self.timestamp = time.time()
+            self._cond.notify_all()
+        if self.mirror is not None:
+            self.mirror.write(jpeg, self.timestamp)
+
+    def latest(self):
+        """Restituisce (jpeg, seq, timestamp) dell'ultimo frame"""
+        with self._cond:
+            return self.data, self.seq, self.timestamp
+
+    def wait_next(self, last_seq, timeout):
+        """Attende un frame con sequenza maggiore di last_seq"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > last_seq, timeout)
+            return self.data, self.seq, self.timestamp
+
+
+def read_multipart_jpegs(stream):
+    """Estrae i JPEG da uno stream multipart/x-mixed-replace (mjpg-streamer, ffmpeg mpjpeg)"""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        if not line.startswith(b'--'):
+            continue
+
+        # Header della parte fino alla riga vuota
+        length = None
+        while True:
+            header = stream.readline()
+            if not header:
+                return
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.partition(b':')
+            if name.strip().lower() == b'content-length':
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    length = None
+
+        if length is not None:
+            data = stream.read(length)
+            if len(data) < length:
+                return
+        else:
+            # Senza Content-Length: leggi fino al marker di fine JPEG
+            chunks = []
+            while True:
+                chunk = stream.readline()
+                if not chunk:
+                    return
+                chunks.append(chunk)
+                if b'\xff\xd9' in chunk:
+                    break
+            data = b''.join(chunks)
+            data = data[:data.rfind(b'\xff\xd9') + 2]
+
+        if data.startswith(b'\xff\xd8'):
+            yield data
+
+
+class FrameSource:
+    """
+    Sorgente di frame avviata su richiesta.
+    Il thread di lettura si ferma da solo dopo idle_timeout secondi senza consumatori.
+    """
+
+    tag = 'FRAME'
+    # True se la sorgente pubblica solo i keyframe (frame_interval = intervallo tra keyframe)
+    keyframes_only = False
+
+    def __init__(self, stream_id, fps, idle_timeout=60):
+        self.stream_id = stream_id
+        self.fps = max(1, int(fps or 1))
+        self.idle_timeout = idle_timeout
+        self.buffer = FrameBuffer()
+        self.last_access = time.time()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.fps
+
+    def touch(self):
+        """Segnala che qualcuno sta usando i frame (rinvia lo stop per inattività)"""
+        self.last_access = time.time()
+
+    def is_idle(self):
+        return time.time() - self.last_access > self.idle_timeout
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def ensure_running(self):
+        """Avvia il thread di lettura se non è attivo"""
+        self.touch()
+        with self._lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f'frames-{self.stream_id}', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_frame(self, max_age=None, timeout=5):
+        """
+        Restituisce l'ultimo frame (jpeg, seq, timestamp).
+        Se il frame è più vecchio di max_age (default: un intervallo di frame)
+        attende il successivo fino a timeout secondi.
+        """
+        self.ensure_running()
+        if max_age is None:
+            max_age = self.frame_interval
+        data, seq, ts = self.buffer.latest()
+        if data is None or time.time() - ts > max_age + self.frame_interval:
+            data, seq, ts = self.buffer.wait_next(seq, timeout)
+        return data, seq, ts
+
+    def _run(self):
+        print(f"[{self.tag}] ▶️  Lettura frame avviata per {self.stream_id}")
+        # Riconnessione rapida all'inizio (pipeline on-demand appena lanciata), poi backoff
+        retry = 0.1
+        while not self._stop.is_set() and not self.is_idle():
+            try:
+                for jpeg in self._frames():
+                    self.buffer.publish(jpeg)
+                    retry = 0.1
+                    if self._stop.is_set() or self.is_idle():
+                        break
+            except Exception as e:
+                if retry >= 1:
+                    print(f"[{self.tag}] ⚠️  Errore lettura frame {self.stream_id}: {e}")
+            finally:
+                self._close()
+            self._stop.wait(retry)
+            retry = min(retry * 2, 2)
+        print(f"[{self.tag}] ⏹️  Lettura frame fermata per {self.stream_id}")
+
+    def _frames(self):
+        """
+        Iteratore dei JPEG letti dalla pipeline, ridefinito dalle sorgenti che leggono
+        un processo o una connessione. Di default nessun frame: le sorgenti che non usano
+        il thread di lettura (es. framering.SharedFrameSource) non lo chiamano.
+        """
+        return iter(())
+
+    def _close(self):
+        pass
+
+
+class MjpegHttpSource(FrameSource):
+    """Legge i JPEG già codificati dall'output HTTP di mjpg-streamer (nessuna decodifica)"""
+
+    def __init__(self, stream_id, url, fps, username=None, password=None, idle_timeout=60):
+        super().__init__(stream_id, fps, idle_timeout)
+        self.url = url
+        self.username = username
+        self.password = password
+        self._response = None
+
+    def _frames(self):
+        req = urllib.request.Request(self.url)
+        if self.username:
+            token = base64.b64encode(f'{self.username}:{self.password}'.encode()).decode()
+            req.add_header('Authorization', f'Basic {token}')
+        self._response = urllib.request.urlopen(req, timeout=10)
+        return read_multipart_jpegs(self._response)
+
+    def _close(self):
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+            self._response = None
+
+
+class FfmpegJpegSource(FrameSource):
+    """
+    Decodifica una sorgente non MJPEG (es. RTSP H.264) con FFmpeg e ricodifica
+    in JPEG al massimo una volta per intervallo di frame
+    """
+
+    def __init__(self, stream_id, input_args, fps, quality=5, idle_timeout=60):
+        super().__init__(stream_id, fps, idle_timeout)
+        self.input_args = list(input_args)
+        self.quality = quality
+        # Thread di decodifica e codifica di FFmpeg (None = automatico, uno per core)
+        self.threads = None
+        # Anello di log (proclogs.LogRing) per lo stderr di FFmpeg, opzionale
+        self.log = None
+        self._process = None
+
+    def command(self):
+        threads = ['-threads', str(self.threads)] if self.threads else []
+        return [
+            'ffmpeg', '-loglevel', 'error', '-nostdin', *threads
+        ] + self.input_args + [
+            '-an',
+            '-vf', f'fps={self.fps}',
+            '-c:v', 'mjpeg',
+            '-q:v', str(self.quality),
+            *threads,
+            '-f', 'mpjpeg',
+            '-'
+        ]
+
+    def _frames(self):
+        self._process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if self.log is not None else subprocess.DEVNULL
+        )
+        if self.log is not None:
+            proclogs.attach(self._process, self.log, 'ffmpeg-jpeg', pipes=('stderr',))
+        return read_multipart_jpegs(self._process.stdout)
+
+    def _close(self):
+        if self._process is not None:
+            try:
+                self._process.terminate()
+                self._process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            except Exception:
+                pass
+            self._process = None
+
+
+class ScaledJpegSource(FrameSource):
+    """
+    Variante ridotta di un'altra sorgente: un solo FFmpeg ridimensiona ogni frame
+    della sorgente principale e il risultato è condiviso da tutti i client che la chiedono
+    """
+
+    def __init__(self, stream_id, parent, width, quality=5, idle_timeout=60):
+        super().__init__(stream_id, parent.fps, idle_timeout)
+        self.parent = parent
+        self.width = width
+        self.quality = quality
+        self.threads = None
+        self.log = None
+        self._process = None
+
+    def command(self):
+        threads = ['-threads', str(self.threads)] if self.threads else []
+        return [
+            'ffmpeg', '-loglevel', 'error', *threads,
+            '-probesize', '32', '-analyzeduration', '0', '-fflags', 'nobuffer',
+            '-f', 'mjpeg', '-i', 'pipe:0',
+            '-an',
+            '-vf', f'scale={self.width}:-2',
+            '-c:v', 'mjpeg',
+            '-q:v', str(self.quality),
+            *threads,
+            '-flush_packets', '1',
+            '-f', 'mpjpeg',
+            '-'
+        ]
+
+    def _frames(self):
+        self._process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if self.log is not None else subprocess.DEVNULL
+        )
+        if self.log is not None:
+            proclogs.attach(self._process, self.log, f'ffmpeg-{self.width}px', pipes=('stderr',))
+        threading.Thread(target=self._feed, args=(self._process,),
+                         name=f'frames-{self.stream_id}-feed', daemon=True).start()
+        return read_multipart_jpegs(self._process.stdout)
+
+    def _feed(self, process):
+        """Passa a FFmpeg ogni nuovo frame della sorgente principale (una volta sola)"""
+        last_seq = 0
+        try:
+            while process.poll() is None and not self._stop.is_set() and not self.is_idle():
+                self.parent.ensure_running()
+                jpeg, seq, _ = self.parent.buffer.wait_next(last_seq, 5)
+                if seq == last_seq or jpeg is None:
+                    continue
+                last_seq = seq
+                process.stdin.write(jpeg)
+                process.stdin.flush()
+        except (BrokenPipeError, ValueError, OSError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+
+    def _close(self):
+        if self._process is not None:
+            try:
+                self._process.terminate()
+                self._process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            except Exception:
+                pass
+            self._process = None
+
+
+class KeyframeProbeSource(FfmpegJpegSource):
+    """
+    Sonda economica per il watchdog: FFmpeg decodifica solo i keyframe dello stream
+    e ne produce un JPEG piccolo, invece di decodificare e ricodificare ogni frame
+    """
+
+    # Un frame ogni keyframe: il watchdog misura gli stalli in keyframe
+    keyframes_only = True
+    # Intervallo massimo tra keyframe considerato (oltre è uno stallo, non un GOP lungo)
+    MAX_KEYFRAME_INTERVAL = 10
+
+    def __init__(self, stream_id, input_args, width=160, idle_timeout=60):
+        super().__init__(stream_id, input_args, 1, quality=10, idle_timeout=idle_timeout)
+        self.width = width
+        # Stimato dagli arrivi (dipende dal GOP della sorgente)
+        self.keyframe_interval = 2.0
+
+    @property
+    def frame_interval(self):
+        return self.keyframe_interval
+
+    def command(self):
+        threads = ['-threads', str(self.threads)] if self.threads else []
+        return [
+            'ffmpeg', '-loglevel', 'error', '-nostdin', *threads,
+            '-skip_frame', 'nokey'
+        ] + self.input_args + [
+            '-an',
+            '-vf', f'scale={self.width}:-2',
+            '-fps_mode', 'passthrough',
+            '-c:v', 'mjpeg',
+            '-q:v', str(self.quality),
+            *threads,
+            '-f', 'mpjpeg',
+            '-'
+        ]
+
+    def _frames(self):
+        last = None
+        for jpeg in super()._frames():
+            now = time.monotonic()
+            if last is not None:
+                # Il più lungo tra quelli recenti (i GOP possono variare)
+                gap = min(now - last, self.MAX_KEYFRAME_INTERVAL)
+                self.keyframe_interval = max(gap, self.keyframe_interval * 0.9)
+            last = now
+            yield jpeg
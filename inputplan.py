@@ -0,0 +1,139 @@
+"""
+Piano di ingresso dei file video
+Dal risultato di ffprobe si decide per ogni stream elementare del file se copiarlo,
+ricodificarlo o scartarlo: il video H.264 già alla risoluzione e al framerate
+richiesti e l'audio AAC passano senza ricodifica, risparmiando la CPU della scheda.
+"""
+
+VIDEO_CODEC = 'h264'
+AUDIO_COPY_CODECS = ('aac',)
+# Formati pixel che i lettori RTSP decodificano senza problemi
+COPY_PIX_FMTS = ('yuv420p', 'yuvj420p')
+# Differenza relativa di framerate ancora considerata uguale (es. 29.97 e 30)
+FPS_TOLERANCE = 0.01
+
+
+def parse_rate(value):
+    """'30000/1001' -> 29.97 (None se non valido)"""
+    num, _, den = str(value or '').partition('/')
+    try:
+        rate = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+def stream_fps(video):
+    return parse_rate(video.get('avg_frame_rate')) or parse_rate(video.get('r_frame_rate'))
+
+
+def parse_resolution(resolution):
+    width, _, height = str(resolution).partition('x')
+    return int(width), int(height)
+
+
+def plan_video(video, resolution, framerate):
+    """Copia se codec, dimensioni, framerate e formato pixel sono già quelli voluti"""
+    if not video:
+        return {'action': 'transcode', 'reason': 'stream video non letto da ffprobe'}
+    fps = stream_fps(video)
+    source = {
+        'codec': video.get('codec_name'),
+        'resolution': f"{video.get('width')}x{video.get('height')}",
+        'fps': round(fps, 2) if fps else None
+    }
+    width, height = parse_resolution(resolution)
+    if video.get('codec_name') != VIDEO_CODEC:
+        reason = f"codec {video.get('codec_name')}"
+    elif (video.get('width'), video.get('height')) != (width, height):
+        reason = f"dimensioni {source['resolution']} invece di {resolution}"
+    elif fps is None or abs(fps - framerate) > framerate * FPS_TOLERANCE:
+        reason = f"{source['fps']} fps invece di {framerate}"
+    elif video.get('pix_fmt') not in COPY_PIX_FMTS:
+        reason = f"formato pixel {video.get('pix_fmt')}"
+    else:
+        return {'action': 'copy', 'reason': None, 'source': source}
+    return {'action': 'transcode', 'reason': reason, 'source': source}
+
+
+def plan_audio(audio):
+    """AAC copiato, altri codec ricodificati in AAC, nessuna traccia: niente audio"""
+    if not audio:
+        return {'action': 'drop', 'reason': 'nessuna traccia audio'}
+    if audio.get('codec_name') in AUDIO_COPY_CODECS:
+        return {'action': 'copy', 'reason': None, 'source': {'codec': audio.get('codec_name')}}
+    return {'action': 'transcode', 'reason': f"codec {audio.get('codec_name')}",
+            'source': {'codec': audio.get('codec_name')}}
+
+
+def estimate_cost(media, video_plan, audio_plan, resolution, framerate):
+    """
+    Stima del lavoro per la CPU: megapixel al secondo da decodificare e da codificare.
+    La copia richiede solo il demux del file.
+    """
+    decode = encode = 0.0
+    if video_plan['action'] == 'transcode':
+        video = media.get('video') or {}
+        width, height = parse_resolution(resolution)
+        fps = stream_fps(video) or framerate
+        decode = (video.get('width') or width) * (video.get('height') or height) * fps / 1e6
+        encode = width * height * framerate / 1e6
+        level = 'alto'
+    elif audio_plan['action'] == 'transcode':
+        level = 'basso'
+    else:
+        level = 'minimo'
+    return {'level': level, 'decode_mpx_s': round(decode, 1), 'encode_mpx_s': round(encode, 1)}
+
+
+def plan_input(media, resolution, framerate):
+    """Piano completo per il file: azione per video e audio e costo stimato"""
+    media = media or {}
+    framerate = int(framerate)
+    if media.get('error'):
+        # File non letto da ffprobe: ricodifica completa come prima del piano, audio compreso
+        reason = f"ffprobe non riuscito: {media['error']}"
+        video_plan = {'action': 'transcode', 'reason': reason}
+        audio_plan = {'action': 'transcode', 'reason': 'traccia audio non verificata'}
+    else:
+        video_plan = plan_video(media.get('video'), resolution, framerate)
+        audio_plan = plan_audio(media.get('audio'))
+    return {
+        'video': video_plan,
+        'audio': audio_plan,
+        'duration': media.get('duration'),
+        'cost': estimate_cost(media, video_plan, audio_plan, resolution, framerate)
+    }
+
+
+def codec_args(plan, encoder, config):
+    """Parametri FFmpeg di codifica per il piano (dopo l'ingresso, prima dell'uscita)"""
+    if plan['video']['action'] == 'copy':
+        args = ['-c:v', 'copy']
+    else:
+        args = [
+            '-c:v', encoder,
+            '-preset', 'veryfast',
+            '-tune', 'zerolatency',
+            '-b:v', config['bitrate'],
+            '-maxrate', config['bitrate'],
+            '-bufsize', '2000k',
+            '-s', config['resolution'],
+            '-r', str(config['framerate'])
+        ]
+    if plan['audio']['action'] == 'copy':
+        args += ['-c:a', 'copy']
+    elif plan['audio']['action'] == 'transcode':
+        args += ['-c:a', 'aac', '-b:a', '64k']
+    else:
+        args += ['-an']
+    return args
+
+
+def describe(plan):
+    """Riassunto di una riga per il log"""
+    parts = []
+    for kind in ('video', 'audio'):
+        step = plan[kind]
+        parts.append(f"{kind}={step['action']}" + (f" ({step['reason']})" if step.get('reason') else ''))
+    return ', '.join(parts) + f", costo {plan['cost']['level']}"
@@ -0,0 +1,148 @@
+"""
+Job in background per le operazioni amministrative lunghe
+Le operazioni (scansione WiFi, connessione, riconfigurazione rete) restituiscono
+subito un ID, girano in un pool di worker limitato e riportano l'avanzamento.
+Richieste identiche mentre un job è attivo si uniscono al job esistente;
+richieste diverse sulla stessa risorsa (stesso gruppo) vengono rifiutate.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ACTIVE_STATES = ('queued', 'running')
+
+
+class JobConflict(Exception):
+    """Un job diverso sulla stessa risorsa è già attivo"""
+
+    def __init__(self, job):
+        super().__init__(f"Job {job.kind} {job.id} già in corso")
+        self.job = job
+
+
+class Job:
+    """Stato di un'operazione in background"""
+
+    def __init__(self, kind, key, group=None):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.key = key
+        self.group = group
+        self.status = 'queued'
+        self.progress = 0
+        self.message = 'In coda'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.joined = 0
+        self._done = threading.Event()
+
+    def update(self, progress=None, message=None):
+        """Aggiorna avanzamento (0-100) e messaggio, chiamato dalla funzione del job"""
+        if progress is not None:
+            self.progress = max(0, min(100, int(progress)))
+        if message is not None:
+            self.message = message
+
+    def is_active(self):
+        return self.status in ACTIVE_STATES
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'joined': self.joined
+        }
+
+
+class JobManager:
+    """Pool di worker limitato con coalescenza dei job identici"""
+
+    def __init__(self, max_workers=2, keep=50):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._keep = keep
+
+    def submit(self, kind, func, *args, key=None, group=None, **kwargs):
+        """
+        Accoda func(job, *args, **kwargs). Se un job con la stessa key è ancora attivo
+        viene restituito quello; se è attivo un job dello stesso group con key diversa
+        solleva JobConflict. Ritorna (job, joined).
+        """
+        key = key or kind
+        with self._lock:
+            for job in self._jobs.values():
+                if not job.is_active():
+                    continue
+                if job.key == key:
+                    job.joined += 1
+                    print(f"[JOBS] 🔗 Richiesta unita al job {job.kind} {job.id}")
+                    return job, True
+                if group is not None and job.group == group:
+                    raise JobConflict(job)
+            job = Job(kind, key, group)
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        print(f"[JOBS] ➕ Job {job.kind} {job.id} accodato")
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        job.started = time.time()
+        job.update(message='In esecuzione')
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'done'
+            job.update(100, 'Completato')
+        except Exception as e:
+            job.status = 'error'
+            job.error = str(e)
+            job.update(message='Errore')
+            print(f"[JOBS] ❌ Job {job.kind} {job.id} fallito: {e}")
+        finally:
+            job.finished = time.time()
+            job._done.set()
+            print(f"[JOBS] ✅ Job {job.kind} {job.id} terminato ({job.status}) "
+                  f"in {job.finished - job.started:.1f}s")
+
+    def discard_finished(self, max_age):
+        """Scarta i job terminati da più di max_age secondi (con i loro risultati); ritorna quanti"""
+        now = time.time()
+        with self._lock:
+            old = [job_id for job_id, job in self._jobs.items()
+                   if not job.is_active() and job.finished and now - job.finished > max_age]
+            for job_id in old:
+                del self._jobs[job_id]
+        return len(old)
+
+    def _prune(self):
+        """Scarta i job terminati più vecchi oltre il limite di storico"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active()]
+        while len(self._jobs) > self._keep and finished:
+            self._jobs.pop(finished.pop(0), None)
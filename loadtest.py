@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+Test di carico dell'API
+Entry point separato: avvia il server in simulazione (backend 'sim', copia pulita in una
+cartella temporanea) e lo sottopone a carichi misti realistici: dashboard che interrogano
+lo stato, upload di video, avvio e arresto degli stream, lettori di snapshot. Per ogni
+route registra latenza p50/p99 e tasso di errore.
+
+Con --profile il server gira in un cgroup con quota di CPU e limite di memoria che
+emulano una scheda. Scenario, durata e seed fissi rendono i risultati (JSON)
+confrontabili tra esecuzioni con --compare.
+
+Uso:
+    python3 loadtest.py                                        # scenario 'mixed', nessun limite
+    python3 loadtest.py --profile pi-zero-2 --output zero.json
+    python3 loadtest.py --url http://192.168.1.50 --scenario dashboards   # dispositivo reale
+    python3 loadtest.py --compare prima.json dopo.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+from fleetclient import HostSession, HttpError
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Quota di CPU in percento di un core dell'host (come CPUQuota di systemd) e memoria
+# massima. Sono un'approssimazione: un core di un PC moderno vale circa 2-3 core A53.
+BOARD_PROFILES = {
+    'pi-zero-2': {'cpu_quota': 40, 'memory': '512M', 'description': 'Raspberry Pi Zero 2 W (4x A53 1 GHz, 512 MB)'},
+    'pi-3': {'cpu_quota': 60, 'memory': '1G', 'description': 'Raspberry Pi 3 B+ (4x A53 1.4 GHz, 1 GB)'},
+    'pi-4': {'cpu_quota': 150, 'memory': '2G', 'description': 'Raspberry Pi 4 (4x A72 1.5 GHz, 2 GB)'}
+}
+
+# Attori di ogni scenario: tipo e numero di istanze contemporanee
+SCENARIOS = {
+    'dashboards': {'dashboard': 10},
+    'mixed': {'dashboard': 10, 'uploader': 1, 'operator': 1, 'viewer': 2},
+    'streams': {'dashboard': 2, 'operator': 2, 'viewer': 6}
+}
+
+DEFAULT_LOADTEST_CONFIG = {
+    'scenario': 'mixed',
+    'duration': 60,          # secondi di misura
+    'warmup': 5,             # secondi iniziali esclusi dalle statistiche
+    'seed': 1,               # stesso seed = stessa sequenza di richieste
+    'timeout': 30,           # timeout per richiesta (gli upload ne hanno uno proprio)
+    'upload_mb': 20,         # dimensione di ogni upload
+    'upload_timeout': 120,
+    'username': 'admin',
+    'password': 'admin'
+}
+
+# Intervalli degli attori (secondi), come l'interfaccia web
+DASHBOARD_INTERVAL = 2
+DASHBOARD_SLOW_EVERY = 5     # ogni N giri anche registrazione, job e watchdog
+OPERATOR_HOLD = (5, 15)      # stream acceso per un tempo casuale in questo intervallo
+VIEWER_INTERVAL = 1
+UPLOAD_PAUSE = (2, 5)
+
+
+# ----------------------------------------------------------------------
+# Misure
+# ----------------------------------------------------------------------
+
+def percentile(values, fraction):
+    """Percentile nearest-rank di una lista ordinata"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Recorder:
+    """Latenze ed errori per route, solo per le richieste partite dopo il warmup"""
+
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.routes = {}
+
+    def add(self, route, started, ms, error=None):
+        if started < self.measure_from:
+            return
+        stats = self.routes.setdefault(route, {'latencies': [], 'errors': {}})
+        stats['latencies'].append(ms)
+        if error is not None:
+            stats['errors'][error] = stats['errors'].get(error, 0) + 1
+
+    def summary(self, seconds):
+        result = {}
+        for route, stats in sorted(self.routes.items()):
+            latencies = sorted(stats['latencies'])
+            errors = sum(stats['errors'].values())
+            result[route] = {
+                'requests': len(latencies),
+                'rps': round(len(latencies) / seconds, 2),
+                'p50_ms': round(percentile(latencies, 0.5), 1),
+                'p99_ms': round(percentile(latencies, 0.99), 1),
+                'max_ms': round(latencies[-1], 1),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4),
+                # I motivi più frequenti
+                'error_reasons': dict(sorted(stats['errors'].items(), key=lambda item: -item[1])[:5])
+            }
+        return result
+
+
+async def timed(recorder, route, call):
+    """Esegue una richiesta e la registra; errore = eccezione, HTTP >= 400 o success false"""
+    started = time.monotonic()
+    error = None
+    response = None
+    try:
+        response = await call()
+        if response.status >= 400:
+            error = f'HTTP {response.status}'
+        elif response.headers.get('content-type', '').startswith('application/json'):
+            body = response.json()
+            if isinstance(body, dict) and body.get('success') is False:
+                error = str(body.get('error') or 'success false')[:80]
+    except HttpError as e:
+        error = str(e)[:80]
+    recorder.add(route, started, (time.monotonic() - started) * 1000, error)
+    return response if error is None else None
+
+
+# ----------------------------------------------------------------------
+# Attori
+# ----------------------------------------------------------------------
+
+async def dashboard(ctx):
+    """Una scheda del browser aperta sull'interfaccia: stato ogni 2 secondi"""
+    session, recorder = ctx['session'], ctx['recorder']
+    await asyncio.sleep(ctx['rng'].uniform(0, DASHBOARD_INTERVAL))
+    round_index = 0
+    while time.monotonic() < ctx['deadline']:
+        t0 = time.monotonic()
+        await timed(recorder, 'GET /api/status', lambda: session.request('GET', '/api/status'))
+        if round_index % DASHBOARD_SLOW_EVERY == 0:
+            for path in ('/api/recording/status', '/api/jobs', '/api/watchdog'):
+                await timed(recorder, f'GET {path}', lambda: session.request('GET', path))
+        round_index += 1
+        await asyncio.sleep(max(0, DASHBOARD_INTERVAL - (time.monotonic() - t0)))
+
+
+async def uploader(ctx):
+    """Upload di un video seguito dalla cancellazione, di continuo"""
+    session, recorder, rng = ctx['session'], ctx['recorder'], ctx['rng']
+    boundary = f'loadtest{rng.getrandbits(64):016x}'
+    payload = bytes(ctx['config']['upload_mb'] * 1024 * 1024)
+    count = 0
+    while time.monotonic() < ctx['deadline']:
+        name = f"loadtest_{ctx['index']}_{count}.mp4"
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="video"; filename="{name}"\r\n'
+                'Content-Type: video/mp4\r\n\r\n').encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+        uploaded = await timed(recorder, 'POST /api/videos/upload', lambda: session.request(
+            'POST', '/api/videos/upload', data=body, content_type=f'multipart/form-data; boundary={boundary}',
+            timeout=ctx['config']['upload_timeout']))
+        if uploaded is not None:
+            await timed(recorder, 'POST /api/videos/delete',
+                        lambda: session.request('POST', '/api/videos/delete', json_body={'filename': name}))
+        count += 1
+        await asyncio.sleep(rng.uniform(*UPLOAD_PAUSE))
+
+
+async def operator(ctx):
+    """Qualcuno che avvia lo stream MJPEG, guarda uno snapshot e lo ferma"""
+    session, recorder, rng = ctx['session'], ctx['recorder'], ctx['rng']
+    form = {'source_type': 'device', 'device': '/dev/video0', 'resolution': '640x480',
+            'framerate': 15, 'quality': 80, 'port': ctx['mjpg_port']}
+    await asyncio.sleep(rng.uniform(0, 3))
+    while time.monotonic() < ctx['deadline']:
+        await timed(recorder, 'POST /api/mjpg/start', lambda: session.request('POST', '/api/mjpg/start', form=form))
+        await timed(recorder, 'GET /api/streams/mjpg/snapshot.jpg',
+                    lambda: session.request('GET', '/api/streams/mjpg/snapshot.jpg'))
+        await asyncio.sleep(rng.uniform(*OPERATOR_HOLD))
+        await timed(recorder, 'POST /api/mjpg/stop', lambda: session.request('POST', '/api/mjpg/stop'))
+        await asyncio.sleep(rng.uniform(1, 3))
+
+
+async def viewer(ctx):
+    """NVR o domotica che legge lo snapshot ogni secondo"""
+    session, recorder = ctx['session'], ctx['recorder']
+    await asyncio.sleep(ctx['rng'].uniform(0, VIEWER_INTERVAL))
+    while time.monotonic() < ctx['deadline']:
+        t0 = time.monotonic()
+        await timed(recorder, 'GET /api/streams/mjpg/snapshot.jpg',
+                    lambda: session.request('GET', '/api/streams/mjpg/snapshot.jpg'))
+        await asyncio.sleep(max(0, VIEWER_INTERVAL - (time.monotonic() - t0)))
+
+
+ACTORS = {'dashboard': dashboard, 'uploader': uploader, 'operator': operator, 'viewer': viewer}
+
+
+async def run_load(url, config, mjpg_port):
+    """Esegue lo scenario: ogni attore ha la sua sessione (cookie e connessione propri)"""
+    t_start = time.monotonic()
+    recorder = Recorder(t_start + config['warmup'])
+    deadline = t_start + config['warmup'] + config['duration']
+    sessions = []
+    tasks = []
+    for kind, count in SCENARIOS[config['scenario']].items():
+        for index in range(count):
+            session = HostSession(url, config['username'], config['password'],
+                                  timeout=config['timeout'], max_connections=1)
+            sessions.append(session)
+            ctx = {
+                'session': session, 'recorder': recorder, 'deadline': deadline, 'index': index,
+                'rng': random.Random(f"{config['seed']}-{kind}-{index}"),
+                'config': config, 'mjpg_port': mjpg_port
+            }
+            tasks.append(asyncio.create_task(ACTORS[kind](ctx)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for session in sessions:
+            await session.close()
+    return recorder.summary(config['duration'])
+
+
+# ----------------------------------------------------------------------
+# Server in simulazione
+# ----------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def parse_size(value):
+    """'512M' -> byte"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = str(value).strip().upper()
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def limit_command(cmd, profile):
+    """
+    Comando e preparazione del processo per limitare CPU e memoria: systemd-run (scope
+    transitorio) se disponibile, altrimenti un cgroup v2 creato direttamente (serve root)
+    """
+    if profile is None:
+        return cmd, None
+    if shutil.which('systemd-run'):
+        prefix = ['systemd-run', '--scope', '--quiet', '--collect',
+                  '-p', f"CPUQuota={profile['cpu_quota']}%",
+                  '-p', f"MemoryMax={profile['memory']}", '-p', 'MemorySwapMax=0']
+        if os.geteuid() != 0:
+            prefix.insert(1, '--user')
+        return prefix + ['--'] + cmd, None
+    if not os.path.exists('/sys/fs/cgroup/cgroup.controllers'):
+        raise RuntimeError("Né systemd-run né cgroup v2 disponibili: impossibile applicare il profilo")
+    group = f'/sys/fs/cgroup/videostreamer-loadtest-{os.getpid()}'
+    os.makedirs(group, exist_ok=True)
+    with open(os.path.join(group, 'cpu.max'), 'w') as f:
+        f.write(f"{profile['cpu_quota'] * 1000} 100000")
+    with open(os.path.join(group, 'memory.max'), 'w') as f:
+        f.write(str(parse_size(profile['memory'])))
+
+    def enter_group():
+        with open(os.path.join(group, 'cgroup.procs'), 'w') as f:
+            f.write(str(os.getpid()))
+    return cmd, enter_group
+
+
+class SimulatedServer:
+    """Copia pulita dell'applicazione avviata con il backend di simulazione"""
+
+    def __init__(self, profile=None, cameras=1):
+        self.profile = profile
+        self.cameras = cameras
+        self.port = free_port()
+        self.workdir = None
+        self.process = None
+        self.log = None
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self._sampling = False
+
+    def start(self, timeout=30):
+        self.workdir = tempfile.mkdtemp(prefix='videostreamer-loadtest-')
+        for name in os.listdir(APP_DIR):
+            if name.endswith('.py') and name != 'loadtest.py':
+                shutil.copy2(os.path.join(APP_DIR, name), self.workdir)
+        for folder in ('templates', 'static'):
+            shutil.copytree(os.path.join(APP_DIR, folder), os.path.join(self.workdir, folder))
+        env = dict(os.environ,
+                   VIDEOSTREAMER_BACKEND='sim',
+                   VIDEOSTREAMER_SIM_CAMERAS=str(self.cameras),
+                   VIDEOSTREAMER_SIM_DIR=os.path.join(self.workdir, 'sim'),
+                   VIDEOSTREAMER_PORT=str(self.port),
+                   PYTHONUNBUFFERED='1')
+        cmd, preexec = limit_command([sys.executable, 'app.py'], self.profile)
+        self.log = open(os.path.join(self.workdir, 'server.log'), 'w')
+        self.process = subprocess.Popen(cmd, cwd=self.workdir, env=env, stdin=subprocess.DEVNULL,
+                                        stdout=self.log, stderr=subprocess.STDOUT, preexec_fn=preexec)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.log.flush()
+                with open(os.path.join(self.workdir, 'server.log'), 'r') as f:
+                    tail = ''.join(f.readlines()[-5:]).strip()
+                raise RuntimeError(f"Server terminato all'avvio: {tail or f'codice {self.process.returncode}'}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError(f"Server non raggiungibile sulla porta {self.port}")
+        self._sampling = True
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    def _tree(self):
+        root = psutil.Process(self.process.pid)
+        return [root] + root.children(recursive=True)
+
+    def _sample(self):
+        """Picco di memoria del server e dei suoi figli (mjpg-streamer, FFmpeg, MediaMTX)"""
+        while self._sampling:
+            total = 0
+            cpu = 0.0
+            try:
+                for proc in self._tree():
+                    try:
+                        total += proc.memory_info().rss
+                        cpu += sum(proc.cpu_times()[:2])
+                    except psutil.Error:
+                        pass
+            except psutil.Error:
+                return
+            self.peak_rss = max(self.peak_rss, total)
+            self.cpu_seconds = max(self.cpu_seconds, cpu)
+            time.sleep(0.5)
+
+    def stop(self):
+        self._sampling = False
+        if self.process is not None and self.process.poll() is None:
+            try:
+                children = psutil.Process(self.process.pid).children(recursive=True)
+            except psutil.Error:
+                children = []
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            for child in children:
+                try:
+                    child.kill()
+                except psutil.Error:
+                    pass
+        if self.log is not None:
+            self.log.close()
+        if self.profile is not None and not shutil.which('systemd-run'):
+            try:
+                os.rmdir(f'/sys/fs/cgroup/videostreamer-loadtest-{os.getpid()}')
+            except OSError:
+                pass
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------
+# Risultati
+# ----------------------------------------------------------------------
+
+def host_info():
+    """Dati dell'host e un riferimento di velocità della CPU per confrontare esecuzioni diverse"""
+    t0 = time.perf_counter()
+    total = 0
+    for i in range(2_000_000):
+        total += i * i
+    benchmark_ms = round((time.perf_counter() - t0) * 1000)
+    commit = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return {
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'benchmark_ms': benchmark_ms,
+        'commit': commit
+    }
+
+
+def format_results(results):
+    lines = [f"Scenario {results['scenario']}, profilo {results['profile'] or 'nessuno'}, "
+             f"{results['duration']} s (seed {results['seed']})"]
+    lines.append(f"{'ROUTE':42} {'RICH.':>6} {'RPS':>7} {'P50 ms':>9} {'P99 ms':>9} {'ERRORI':>7}")
+    for route, stats in results['routes'].items():
+        lines.append(f"{route:42} {stats['requests']:>6} {stats['rps']:>7} {stats['p50_ms']:>9} "
+                     f"{stats['p99_ms']:>9} {stats['error_rate'] * 100:>6.1f}%")
+        for reason, count in stats['error_reasons'].items():
+            lines.append(f"    {count} x {reason}")
+    server = results.get('server')
+    if server:
+        lines.append(f"Server: picco memoria {server['peak_rss_mb']} MB, CPU {server['cpu_seconds']} s")
+    return '\n'.join(lines)
+
+
+def compare(before, after):
+    """Differenze di p50, p99 ed errori per route tra due esecuzioni"""
+    lines = []
+    for key in ('scenario', 'profile', 'duration', 'seed'):
+        if before.get(key) != after.get(key):
+            lines.append(f"⚠️  {key} diverso: {before.get(key)} / {after.get(key)}")
+    ratio = after['host']['benchmark_ms'] / max(before['host']['benchmark_ms'], 1)
+    if abs(ratio - 1) > 0.1:
+        lines.append(f"⚠️  Host con velocità diversa (riferimento CPU x{ratio:.2f})")
+    lines.append(f"{'ROUTE':42} {'P50 ms':>17} {'P99 ms':>17} {'ERRORI':>15}")
+    for route in sorted(set(before['routes']) | set(after['routes'])):
+        a = before['routes'].get(route)
+        b = after['routes'].get(route)
+        if a is None or b is None:
+            lines.append(f"{route:42} {'solo prima' if b is None else 'solo dopo'}")
+            continue
+        lines.append(f"{route:42} {a['p50_ms']:>7} → {b['p50_ms']:<7} {a['p99_ms']:>7} → {b['p99_ms']:<7} "
+                     f"{a['error_rate'] * 100:>5.1f}% → {b['error_rate'] * 100:.1f}%")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test di carico dell'API di videoStreamer")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default=DEFAULT_LOADTEST_CONFIG['scenario'])
+    parser.add_argument('--profile', choices=sorted(BOARD_PROFILES), help='limiti di CPU e memoria di una scheda')
+    parser.add_argument('--duration', type=int, default=DEFAULT_LOADTEST_CONFIG['duration'], help='secondi di misura')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_LOADTEST_CONFIG['warmup'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_LOADTEST_CONFIG['seed'])
+    parser.add_argument('--upload-mb', type=int, default=DEFAULT_LOADTEST_CONFIG['upload_mb'])
+    parser.add_argument('--cameras', type=int, default=1, help='telecamere sintetiche del server simulato')
+    parser.add_argument('--url', help='server già in esecuzione (es. un dispositivo reale) invece della simulazione')
+    parser.add_argument('--username', default=DEFAULT_LOADTEST_CONFIG['username'])
+    parser.add_argument('--password', default=DEFAULT_LOADTEST_CONFIG['password'])
+    parser.add_argument('--output', metavar='FILE', help='salva i risultati in JSON')
+    parser.add_argument('--json', action='store_true', help='stampa i risultati in JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('PRIMA', 'DOPO'), help='confronta due risultati salvati')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], 'r') as f:
+            before = json.load(f)
+        with open(args.compare[1], 'r') as f:
+            after = json.load(f)
+        print(compare(before, after))
+        return
+
+    if args.url and args.profile:
+        parser.error('--profile vale solo per il server simulato')
+
+    config = dict(DEFAULT_LOADTEST_CONFIG, scenario=args.scenario, duration=args.duration, warmup=args.warmup,
+                  seed=args.seed, upload_mb=args.upload_mb, username=args.username, password=args.password)
+    profile = BOARD_PROFILES.get(args.profile)
+    server = None
+    url = args.url
+    mjpg_port = 8080
+    if url is None:
+        server = SimulatedServer(profile, args.cameras)
+        print(f"🧪 Avvio del server simulato{' (' + profile['description'] + ')' if profile else ''}...")
+        try:
+            server.start()
+        except RuntimeError as e:
+            server.stop()
+            print(f"❌ {e}")
+            sys.exit(1)
+        url = f'http://127.0.0.1:{server.port}'
+        mjpg_port = free_port()
+
+    try:
+        print(f"▶️  Scenario {args.scenario} per {args.warmup + args.duration} s contro {url}")
+        routes = asyncio.run(run_load(url, config, mjpg_port))
+    except KeyboardInterrupt:
+        return
+    finally:
+        if server is not None:
+            server.stop()
+
+    results = {
+        'scenario': args.scenario,
+        'actors': SCENARIOS[args.scenario],
+        'profile': args.profile,
+        'limits': profile,
+        'duration': args.duration,
+        'seed': args.seed,
+        'target': 'sim' if server is not None else url,
+        'timestamp': time.time(),
+        'host': host_info(),
+        'routes': routes,
+        'server': {
+            'peak_rss_mb': round(server.peak_rss / 1024 / 1024, 1),
+            'cpu_seconds': round(server.cpu_seconds, 1)
+        } if server is not None else None
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+
+
+if __name__ == '__main__':
+    main()
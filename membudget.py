@@ -0,0 +1,210 @@
+"""
+Budget di memoria
+Sulle schede da 512 MB manager, MediaMTX, FFmpeg e upload si contendono la RAM e
+l'OOM killer termina FFmpeg. In modalità a basso consumo si contabilizza l'RSS del
+manager e di ogni processo figlio (riconosciuti dalla riga di comando), si usano
+buffer più piccoli (anelli di frame e di log, thread e buffer di FFmpeg), si
+scaricano i sottosistemi inattivi e si rifiuta il lavoro nuovo che supererebbe il
+budget, spiegando il motivo.
+"""
+
+import collections
+import ctypes
+import gc
+import os
+import re
+import threading
+import time
+
+import psutil
+
+MB = 1024 * 1024
+
+DEFAULT_MEMORY_CONFIG = {
+    'low_memory': False,
+    'budget_mb': 0,              # memoria per manager e processi figli, 0 = RAM totale meno la riserva
+    'reserve_mb': 96,            # lasciati a kernel, cache dei file e servizi di sistema
+    'idle_unload_seconds': 30    # sottosistemi inattivi da più di tanto vengono scaricati
+}
+
+# Limiti della modalità a basso consumo (a modalità spenta valgono i default dei moduli)
+LOW_MEMORY_LIMITS = {
+    'log_lines': 100,            # righe per anello di log (normale 500)
+    'frame_ring_slots': 2,
+    'frame_ring_slot_kb': 256,
+    'frame_idle_timeout': 10,    # secondi prima di fermare una sorgente di frame senza client
+    'max_variants': 1,           # varianti MJPEG ridotte contemporanee
+    'ffmpeg_threads': 1,         # ogni thread dell'encoder ha i suoi frame di lavoro
+    'ffmpeg_bufsize_seconds': 0.5,
+    'wifi_idle_timeout': 60,
+    'job_history_seconds': 300   # job terminati (e risultati) conservati
+}
+
+# Stima della memoria del lavoro nuovo (MB) a 640x480; cresce con i pixel dove c'è codifica
+WORK_ESTIMATES_MB = {
+    'mjpg': 15,
+    'rtsp': 45,
+    'recording': 20,
+    'frame_source': 20,
+    'calibration': 45
+}
+SCALED_WORK = ('mjpg', 'rtsp', 'frame_source', 'calibration')
+REFERENCE_PIXELS = 640 * 480
+
+
+class MemoryBudgetError(Exception):
+    """Lavoro rifiutato: supererebbe il budget di memoria"""
+
+
+def estimate_mb(kind, resolution=None):
+    """Stima della memoria per un lavoro alla risoluzione indicata ('1280x720')"""
+    estimate = WORK_ESTIMATES_MB.get(kind, 10)
+    if resolution and kind in SCALED_WORK:
+        width, _, height = str(resolution).partition('x')
+        try:
+            estimate *= max(1.0, int(width) * int(height) / REFERENCE_PIXELS)
+        except ValueError:
+            pass
+    return round(estimate)
+
+
+def parse_kbits(value):
+    """'2000k' -> 2000, '2M' -> 2000 (None se non valido)"""
+    value = str(value).strip().lower()
+    scale = 1000 if value.endswith('m') else 1
+    try:
+        return float(value.rstrip('km')) * scale
+    except ValueError:
+        return None
+
+
+def shrink_ffmpeg_cmd(cmd, threads, bufsize_seconds):
+    """
+    Comando FFmpeg con thread dell'encoder limitati e buffer del rate control pari a
+    bufsize_seconds secondi di bitrate
+    """
+    cmd = list(cmd)
+    if '-bufsize' in cmd and '-b:v' in cmd:
+        bitrate = parse_kbits(cmd[cmd.index('-b:v') + 1])
+        index = cmd.index('-bufsize') + 1
+        current = parse_kbits(cmd[index])
+        if bitrate and current:
+            cmd[index] = f'{max(1, min(int(current), int(bitrate * bufsize_seconds)))}k'
+    # Opzione di uscita: prima dell'ultimo argomento (o di "-f formato uscita")
+    output = len(cmd) - 3 if len(cmd) >= 3 and cmd[-3] == '-f' else len(cmd) - 1
+    return cmd[:output] + ['-threads', str(threads)] + cmd[output:]
+
+
+def trim():
+    """Raccoglie gli oggetti liberati e restituisce al sistema l'heap libero (glibc)"""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryBudget:
+    """Contabilità dell'RSS per ruolo e ammissione del lavoro nuovo"""
+
+    def __init__(self, config=None, roles=None):
+        # Ruolo -> regex sulla riga di comando (vince il primo che corrisponde)
+        self.roles = [(name, re.compile(pattern)) for name, pattern in (roles or {}).items()]
+        self.configure(config)
+        self.refused = collections.deque(maxlen=10)
+        self._usage = None
+        self._usage_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.config = dict(DEFAULT_MEMORY_CONFIG, **(config or {}))
+
+    @property
+    def enabled(self):
+        return bool(self.config.get('low_memory'))
+
+    def limit(self, name, default):
+        """Limite della modalità a basso consumo, default se la modalità è spenta"""
+        return LOW_MEMORY_LIMITS[name] if self.enabled else default
+
+    def budget_mb(self):
+        budget = int(self.config.get('budget_mb') or 0)
+        if budget > 0:
+            return budget
+        return max(64, psutil.virtual_memory().total // MB - int(self.config['reserve_mb']))
+
+    def usage(self, max_age=2):
+        """RSS del manager e dei processi per ruolo (in cache per max_age secondi)"""
+        with self._lock:
+            if self._usage is not None and time.monotonic() - self._usage_at < max_age:
+                return self._usage
+        own = os.getpid()
+        manager = 0
+        processes = {}
+        for proc in psutil.process_iter(['pid', 'cmdline', 'memory_info']):
+            memory = proc.info.get('memory_info')
+            if memory is None:
+                continue
+            if proc.info['pid'] == own:
+                manager = memory.rss
+                continue
+            cmd = ' '.join(proc.info.get('cmdline') or [])
+            for role, pattern in self.roles:
+                if pattern.search(cmd):
+                    entry = processes.setdefault(role, {'rss': 0, 'pids': []})
+                    entry['rss'] += memory.rss
+                    entry['pids'].append(proc.info['pid'])
+                    break
+        total = manager + sum(entry['rss'] for entry in processes.values())
+        usage = {
+            'manager_mb': round(manager / MB, 1),
+            'processes': {role: {'rss_mb': round(entry['rss'] / MB, 1), 'pids': entry['pids']}
+                          for role, entry in sorted(processes.items())},
+            'total_mb': round(total / MB, 1),
+            'budget_mb': self.budget_mb(),
+            'available_mb': psutil.virtual_memory().available // MB
+        }
+        with self._lock:
+            self._usage = usage
+            self._usage_at = time.monotonic()
+        return usage
+
+    def admit(self, kind, label=None, resolution=None):
+        """
+        Controlla che il lavoro nuovo stia nel budget (solo in modalità a basso consumo);
+        altrimenti solleva MemoryBudgetError con il motivo
+        """
+        if not self.enabled:
+            return
+        estimate = estimate_mb(kind, resolution)
+        usage = self.usage(max_age=0)
+        reason = None
+        if usage['total_mb'] + estimate > usage['budget_mb']:
+            reason = (f"in uso {usage['total_mb']:.0f} MB su {usage['budget_mb']} MB di budget, "
+                      f"ne servono circa {estimate}")
+            if usage['processes']:
+                role, entry = max(usage['processes'].items(), key=lambda item: item[1]['rss_mb'])
+                reason += f" (il processo più pesante è {role}: {entry['rss_mb']:.0f} MB)"
+        elif usage['available_mb'] - estimate < int(self.config['reserve_mb']) // 2:
+            reason = f"RAM libera {usage['available_mb']} MB, ne servono circa {estimate} più la riserva di sistema"
+        if reason is None:
+            return
+        message = f"Memoria insufficiente per {label or kind}: {reason}"
+        self.refused.append({'timestamp': time.time(), 'kind': kind, 'reason': message})
+        print(f"[MEMORY] 🚫 {message}")
+        raise MemoryBudgetError(message)
+
+    def ffmpeg_cmd(self, cmd):
+        """Comando FFmpeg con meno thread e buffer più piccoli in modalità a basso consumo"""
+        if not self.enabled:
+            return cmd
+        return shrink_ffmpeg_cmd(cmd, LOW_MEMORY_LIMITS['ffmpeg_threads'], LOW_MEMORY_LIMITS['ffmpeg_bufsize_seconds'])
+
+    def status(self):
+        return {
+            'low_memory': self.enabled,
+            'config': dict(self.config),
+            'limits': dict(LOW_MEMORY_LIMITS) if self.enabled else None,
+            'usage': self.usage(),
+            'refused': list(self.refused)
+        }
@@ -0,0 +1,111 @@
+"""
+Limiti dell'uscita MJPEG
+Numero massimo di client e budget di banda globale, diviso in parti uguali tra i
+client connessi: chi ha un collegamento lento o chiede troppo riceve meno frame
+(sempre l'ultimo disponibile) invece di saturare l'uplink del Pi per tutti.
+"""
+
+import itertools
+import threading
+import time
+
+DEFAULT_OUTPUT_CONFIG = {
+    'max_clients': 8,            # client MJPEG contemporanei (tutti gli stream)
+    'max_bandwidth_kbps': 0,     # budget di banda totale, 0 = senza limite
+    'max_variants': 3,           # varianti ridotte codificate contemporaneamente
+    'min_width': 160
+}
+
+
+class VariantLimitError(Exception):
+    """Raggiunto il numero massimo di varianti ridotte e nessuna riutilizzabile"""
+
+
+class ClientSlot:
+    """Un client MJPEG connesso: variante richiesta, ritmo e contatori"""
+
+    def __init__(self, client_id, stream_id, variant, fps, address):
+        self.id = client_id
+        self.stream_id = stream_id
+        self.variant = variant
+        self.fps = fps
+        self.address = address
+        self.connected_at = time.time()
+        self.next_send = 0.0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def to_dict(self):
+        elapsed = max(time.time() - self.connected_at, 1e-6)
+        return {
+            'stream': self.stream_id,
+            'variant': self.variant,
+            'fps': self.fps,
+            'address': self.address,
+            'connected_for': round(elapsed),
+            'frames_sent': self.frames_sent,
+            'frames_skipped': self.frames_skipped,
+            'kbps': round(self.bytes_sent * 8 / elapsed / 1000, 1)
+        }
+
+
+class OutputLimiter:
+    """Ammissione dei client e ritmo di invio dei frame"""
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_OUTPUT_CONFIG, **(config or {}))
+        self.clients = {}
+        self.rejected = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.config = dict(DEFAULT_OUTPUT_CONFIG, **(config or {}))
+
+    def acquire(self, stream_id, variant, fps, address=None):
+        """Registra un client; None se il numero massimo di client è raggiunto"""
+        with self._lock:
+            if len(self.clients) >= int(self.config['max_clients']):
+                self.rejected += 1
+                return None
+            slot = ClientSlot(next(self._ids), stream_id, variant, fps, address)
+            self.clients[slot.id] = slot
+        return slot
+
+    def release(self, slot):
+        with self._lock:
+            self.clients.pop(slot.id, None)
+
+    def share_bps(self):
+        """Quota di banda di ogni client (bit/s), None se senza limite"""
+        budget = int(self.config.get('max_bandwidth_kbps') or 0) * 1000
+        if budget <= 0:
+            return None
+        return budget / max(len(self.clients), 1)
+
+    def delay(self, slot):
+        """Secondi da attendere prima di inviare il prossimo frame al client"""
+        return max(0.0, slot.next_send - time.monotonic())
+
+    def sent(self, slot, size, skipped=0):
+        """Registra un frame inviato e calcola quando il client potrà riceverne un altro"""
+        now = time.monotonic()
+        slot.bytes_sent += size
+        slot.frames_sent += 1
+        slot.frames_skipped += skipped
+        interval = 1.0 / slot.fps if slot.fps else 0.0
+        share = self.share_bps()
+        if share:
+            interval = max(interval, size * 8 / share)
+        slot.next_send = now + interval
+
+    def status(self):
+        with self._lock:
+            clients = [slot.to_dict() for slot in self.clients.values()]
+        return {
+            'max_clients': int(self.config['max_clients']),
+            'max_bandwidth_kbps': int(self.config.get('max_bandwidth_kbps') or 0),
+            'rejected': self.rejected,
+            'clients': clients
+        }
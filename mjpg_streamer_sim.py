@@ -0,0 +1,191 @@
+"""
+Sostituto di mjpg-streamer per il backend di simulazione
+Accetta le stesse opzioni usate dall'applicazione e serve ?action=stream e
+?action=snapshot sulla stessa porta, con autenticazione Basic:
+- input_uvc.so: telecamera sintetica (testsrc di FFmpeg codificato in JPEG)
+- input_file.so: JPEG letti da una cartella (e cancellati con -r), come l'originale
+Il nome del file contiene "mjpg_streamer": pkill e il controllo dei processi lo trovano.
+"""
+
+import base64
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import frames
+
+BOUNDARY = 'boundarydonotcross'
+# Intervallo di controllo della cartella dei frame (secondi)
+FOLDER_POLL = 0.01
+
+
+def log(message):
+    print(f" i: {message}", file=sys.stderr, flush=True)
+
+
+def parse_plugin(spec):
+    """'input_uvc.so -d /dev/video0 -r 640x480' -> ('input_uvc.so', {'-d': '/dev/video0', '-r': '640x480'})"""
+    tokens = shlex.split(spec)
+    options = {}
+    index = 1
+    while index < len(tokens):
+        name = tokens[index]
+        if index + 1 < len(tokens) and not tokens[index + 1].startswith('-'):
+            options[name] = tokens[index + 1]
+            index += 2
+        else:
+            options[name] = True
+            index += 1
+    return tokens[0], options
+
+
+def parse_args(argv):
+    plugins = {}
+    for flag, spec in zip(argv[::2], argv[1::2]):
+        plugins[flag] = parse_plugin(spec)
+    if '-i' not in plugins or '-o' not in plugins:
+        raise ValueError('uso: mjpg_streamer_sim.py -i "input_*.so ..." -o "output_http.so ..."')
+    return plugins['-i'], plugins['-o']
+
+
+def synthetic_camera(buffer, options, processes):
+    """input_uvc.so: testsrc alla risoluzione e al framerate richiesti"""
+    quality = int(options.get('-q', 80))
+    cmd = [
+        'ffmpeg', '-loglevel', 'error', '-nostdin',
+        '-re', '-f', 'lavfi', '-i', f"testsrc2=size={options.get('-r', '640x480')}:rate={options.get('-f', 15)}",
+        '-c:v', 'mjpeg', '-q:v', str(round(2 + (100 - quality) * 29 / 100)),
+        '-f', 'mpjpeg', '-'
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+    processes.append(process)
+    for jpeg in frames.read_multipart_jpegs(process.stdout):
+        buffer.publish(jpeg)
+    log(f"telecamera sintetica terminata (codice {process.wait()})")
+    os._exit(1)
+
+
+def folder_input(buffer, options):
+    """input_file.so: ogni nuovo JPEG della cartella è un frame"""
+    folder = options['-folder']
+    remove = '-r' in options
+    seen = set()
+    while True:
+        try:
+            names = sorted(n for n in os.listdir(folder) if n.lower().endswith(('.jpg', '.jpeg')))
+        except OSError:
+            names = []
+        # L'ultimo file può essere ancora in scrittura
+        for name in names[:-1]:
+            if name in seen:
+                continue
+            path = os.path.join(folder, name)
+            try:
+                with open(path, 'rb') as f:
+                    buffer.publish(f.read())
+                if remove:
+                    os.remove(path)
+                else:
+                    seen.add(name)
+            except OSError:
+                pass
+        time.sleep(FOLDER_POLL)
+
+
+def make_handler(buffer, credentials):
+    expected = base64.b64encode(credentials.encode()).decode() if credentials else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.0'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if expected and self.headers.get('Authorization', '') != f'Basic {expected}':
+                self.send_response(401)
+                self.send_header('WWW-Authenticate', 'Basic realm="MJPG-Streamer"')
+                self.end_headers()
+                return
+            action = parse_qs(urlparse(self.path).query).get('action', ['stream'])[0]
+            if action == 'snapshot':
+                jpeg, seq, _ = buffer.latest()
+                if jpeg is None:
+                    jpeg, seq, _ = buffer.wait_next(seq, 5)
+                if jpeg is None:
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+                return
+            if action != 'stream':
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
+            self.send_header('Content-Type', f'multipart/x-mixed-replace;boundary={BOUNDARY}')
+            self.end_headers()
+            seq = 0
+            try:
+                while True:
+                    jpeg, new_seq, timestamp = buffer.wait_next(seq, 5)
+                    if new_seq == seq:
+                        continue
+                    seq = new_seq
+                    self.wfile.write(
+                        f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n'
+                        f'X-Timestamp: {timestamp:.6f}\r\n\r\n'.encode() + jpeg + b'\r\n'
+                    )
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def main(argv):
+    (input_plugin, input_options), (_, output_options) = parse_args(argv)
+    buffer = frames.FrameBuffer()
+    processes = []
+
+    def stop(signum, frame):
+        for process in processes:
+            process.kill()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    port = int(output_options.get('-p', 8080))
+    try:
+        server = ThreadingHTTPServer(('', port), make_handler(buffer, output_options.get('-c')))
+    except OSError as e:
+        log(f"porta {port} non disponibile: {e}")
+        return 1
+    server.daemon_threads = True
+
+    if input_plugin == 'input_uvc.so':
+        target = lambda: synthetic_camera(buffer, input_options, processes)
+        log(f"telecamera sintetica {input_options.get('-d')} {input_options.get('-r')} a {input_options.get('-f')} fps")
+    elif input_plugin == 'input_file.so':
+        target = lambda: folder_input(buffer, input_options)
+        log(f"cartella dei frame {input_options.get('-folder')}")
+    else:
+        log(f"plugin di ingresso non supportato: {input_plugin}")
+        return 1
+    threading.Thread(target=target, daemon=True).start()
+    log(f"HTTP sulla porta {port}")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,401 @@
+"""
+Operazioni di rete asincrone
+Esegue i comandi di configurazione (systemctl, ip, cp) su asyncio con timeout per
+ogni passo, lancia in parallelo i passi indipendenti e attende le condizioni reali
+(link attivo, indirizzo assegnato, route presente) invece di pause fisse
+"""
+
+import asyncio
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+
+import backend
+
+# Timeout di default per singolo comando (secondi)
+COMMAND_TIMEOUT = 5
+SERVICE_TIMEOUT = 10
+
+
+class CommandError(Exception):
+    """Comando fallito o scaduto"""
+
+
+class CommandResult:
+    def __init__(self, cmd, returncode, stdout, stderr):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+async def run(cmd, timeout=COMMAND_TIMEOUT, check=False):
+    """Esegue un comando con timeout; con check=True solleva CommandError se fallisce"""
+    simulated = backend.current.intercept(cmd)
+    if simulated is not None:
+        result = CommandResult(cmd, *simulated)
+        if check and result.returncode != 0:
+            raise CommandError(f"{' '.join(cmd)}: {result.stderr.strip() or f'codice {result.returncode}'}")
+        return result
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *backend.current.command(cmd),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        if check:
+            raise CommandError(f"Comando non trovato: {cmd[0]}")
+        return CommandResult(cmd, 127, '', f'{cmd[0]}: comando non trovato')
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise CommandError(f"Timeout ({timeout}s): {' '.join(cmd)}")
+
+    result = CommandResult(cmd, proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace'))
+    if check and result.returncode != 0:
+        raise CommandError(f"{' '.join(cmd)}: {result.stderr.strip() or f'codice {result.returncode}'}")
+    return result
+
+
+class StepTimer:
+    """Misura e logga la durata di ogni passo di una riconfigurazione"""
+
+    def __init__(self, name, on_step=None, plan=None):
+        self.name = name
+        self.steps = []
+        self.on_step = on_step
+        # Passi previsti (es. STATIC_IP_STEPS): un passo non elencato falserebbe l'avanzamento
+        self.plan = plan
+        self._start = time.monotonic()
+
+    @asynccontextmanager
+    async def step(self, label):
+        if self.plan is not None and label not in self.plan:
+            print(f"[NETWORK] ⚠️  Passo '{label}' non elencato nei passi di {self.name}")
+        if self.on_step is not None:
+            self.on_step(label)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            ms = round((time.monotonic() - t0) * 1000)
+            self.steps.append({'step': label, 'ms': ms})
+            print(f"[NETWORK] ⏱️  {label}: {ms} ms")
+
+    def summary(self):
+        total = round((time.monotonic() - self._start) * 1000)
+        print(f"[NETWORK] ⏱️  {self.name} completato in {total} ms")
+        return {'total_ms': total, 'steps': self.steps}
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CONDIZIONI
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _read_sys(interface, attr):
+    try:
+        with open(f'/sys/class/net/{interface}/{attr}', 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def link_admin_up(interface):
+    """Interfaccia amministrativamente attiva (flag IFF_UP)"""
+    flags = _read_sys(interface, 'flags')
+    return bool(flags) and int(flags, 16) & 0x1 == 1
+
+
+def link_admin_down(interface):
+    return not link_admin_up(interface)
+
+
+def link_operational(interface):
+    """Portante presente (cavo collegato o WiFi associato)"""
+    return _read_sys(interface, 'operstate') in ('up', 'unknown')
+
+
+async def has_address(interface, ip_address):
+    result = await run(['ip', '-4', '-o', 'addr', 'show', 'dev', interface])
+    return f' {ip_address}/' in result.stdout
+
+
+async def has_default_route(gateway):
+    result = await run(['ip', 'route', 'show', 'default'])
+    return f'via {gateway} ' in result.stdout + ' '
+
+
+async def wait_until(check, timeout, interval=0.1):
+    """Attende che check() (funzione o coroutine) diventi vera; False allo scadere"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if asyncio.iscoroutine(value):
+            value = await value
+        if value:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# HELPER
+# ═══════════════════════════════════════════════════════════════════════════
+
+async def is_service_active(name):
+    result = await run(['sudo', 'systemctl', 'is-active', name], timeout=3)
+    return result.returncode == 0
+
+
+async def detect_backends():
+    """Stato di NetworkManager, dhcpcd e systemd-networkd (verificati in parallelo)"""
+    nm, dhcpcd, networkd = await asyncio.gather(
+        is_service_active('NetworkManager'),
+        is_service_active('dhcpcd'),
+        is_service_active('systemd-networkd')
+    )
+    return nm, dhcpcd, networkd
+
+
+async def install_file(content, tmp_path, target_path):
+    """Scrive il contenuto in /tmp e lo copia nella destinazione con sudo"""
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    await run(['sudo', 'cp', tmp_path, target_path], check=True)
+
+
+def _dhcpcd_without_interface(interface):
+    """Contenuto di /etc/dhcpcd.conf senza la sezione dell'interfaccia"""
+    dhcpcd_conf = '/etc/dhcpcd.conf'
+    content = ''
+    if os.path.exists(dhcpcd_conf):
+        with open(dhcpcd_conf, 'r') as f:
+            content = f.read()
+    return re.sub(
+        f'interface {interface}\n(?:.*\n)*?(?=\ninterface |$)',
+        '',
+        content
+    )
+
+
+async def enable_and_restart(service, restart=True):
+    """Abilita il servizio e lo riavvia (o avvia)"""
+    await run(['sudo', 'systemctl', 'enable', service], timeout=COMMAND_TIMEOUT)
+    action = 'restart' if restart else 'start'
+    await run(['sudo', 'systemctl', action, service], timeout=SERVICE_TIMEOUT, check=restart)
+
+
+async def reset_link(interface, timer):
+    """Down/up dell'interfaccia attendendo lo stato reale invece di pause fisse"""
+    async with timer.step('link down'):
+        await run(['sudo', 'ip', 'link', 'set', interface, 'down'])
+        await wait_until(lambda: link_admin_down(interface), timeout=3)
+    async with timer.step('link up'):
+        await run(['sudo', 'ip', 'link', 'set', interface, 'up'])
+        if not await wait_until(lambda: link_admin_up(interface), timeout=5):
+            print(f"[NETWORK] ⚠️  {interface} non risulta attiva dopo 'ip link set up'")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# FLUSSI
+# ═══════════════════════════════════════════════════════════════════════════
+
+# Passi di ogni flusso nell'ordine in cui vengono eseguiti (avanzamento dei job)
+STATIC_IP_STEPS = (
+    'rilevamento backend', 'esclusione da NetworkManager', 'configurazione persistente',
+    'stop servizi di rete', 'pulizia interfaccia', 'link down', 'link up',
+    'indirizzo e DNS', 'gateway', 'riavvio servizi di rete', 'verifica'
+)
+DHCP_STEPS = ('rilevamento backend', 'configurazione persistente', 'link down', 'link up')
+
+async def set_static_ip(interface, ip_address, netmask, gateway, dns, on_step=None):
+    """Configura IP statico su dhcpcd o systemd-networkd e lo applica subito all'interfaccia"""
+    timer = StepTimer(f'IP statico {ip_address}/{netmask} su {interface}', on_step, STATIC_IP_STEPS)
+
+    async with timer.step('rilevamento backend'):
+        nm_active, dhcpcd_active, networkd_active = await detect_backends()
+    print(f"[NETWORK] ℹ️  dhcpcd attivo: {dhcpcd_active}, systemd-networkd attivo: {networkd_active}")
+
+    if nm_active:
+        async with timer.step('esclusione da NetworkManager'):
+            print(f"[NETWORK] ⚠️  NetworkManager attivo - lo disabilito per {interface}...")
+            try:
+                await run(['sudo', 'mkdir', '-p', '/etc/NetworkManager/conf.d'])
+                await install_file(
+                    f"[keyfile]\nunmanaged-devices=interface-name:{interface}",
+                    '/tmp/NetworkManager.conf',
+                    f'/etc/NetworkManager/conf.d/99-unmanage-{interface}.conf'
+                )
+                await run(['sudo', 'systemctl', 'restart', 'NetworkManager'], timeout=SERVICE_TIMEOUT)
+                print(f"[NETWORK] ✅ NetworkManager configurato per ignorare {interface}")
+            except CommandError as e:
+                print(f"[NETWORK] ⚠️  {e}")
+
+    # ===== Configurazione persistente =====
+    async with timer.step('configurazione persistente'):
+        if networkd_active and not dhcpcd_active:
+            systemd_config = f"""[Match]
+Name={interface}
+
+[Network]
+Address={ip_address}/{netmask}
+Gateway={gateway}
+DNS={dns}
+IPv6AcceptRA=no
+
+[Route]
+Destination=0.0.0.0/0
+Gateway={gateway}
+"""
+            await run(['sudo', 'mkdir', '-p', '/etc/systemd/network'])
+            await asyncio.gather(
+                install_file(systemd_config, f'/tmp/99-{interface}-static.network',
+                             f'/etc/systemd/network/99-{interface}-static.network'),
+                run(['sudo', 'rm', '-f', f'/etc/systemd/network/99-{interface}-dhcp.network'])
+            )
+            print(f"[NETWORK] ✅ /etc/systemd/network aggiornato")
+            await enable_and_restart('systemd-networkd')
+            print(f"[NETWORK] ✅ systemd-networkd abilitato e riavviato")
+        else:
+            if not dhcpcd_active and not networkd_active:
+                print(f"[NETWORK] ⚠️  Nessun servizio di rete attivo, utilizzo dhcpcd...")
+            dhcpcd_content = _dhcpcd_without_interface(interface)
+            dhcpcd_content += f"\n# Configurazione IP statico per {interface}\ninterface {interface}\n"
+            dhcpcd_content += f"    static ip_address={ip_address}/{netmask}\n"
+            dhcpcd_content += f"    static routers={gateway}\n"
+            dhcpcd_content += f"    static domain_name_servers={dns}\n"
+            await install_file(dhcpcd_content, '/tmp/dhcpcd.conf.new', '/etc/dhcpcd.conf')
+            print(f"[NETWORK] ✅ /etc/dhcpcd.conf aggiornato")
+            await enable_and_restart('dhcpcd', restart=dhcpcd_active)
+            print(f"[NETWORK] ✅ dhcpcd abilitato e avviato")
+
+    # ===== Applicazione immediata =====
+    print(f"[NETWORK] 🔄 Applicazione configurazione IP statico su {interface}...")
+    is_wifi = interface.startswith('wl')
+
+    async with timer.step('stop servizi di rete'):
+        stops = []
+        if dhcpcd_active:
+            stops.append(run(['sudo', 'systemctl', 'stop', 'dhcpcd']))
+        if networkd_active:
+            stops.append(run(['sudo', 'systemctl', 'stop', 'systemd-networkd']))
+        if is_wifi:
+            stops.append(run(['sudo', 'systemctl', 'stop', 'wpa_supplicant']))
+        await asyncio.gather(*stops)
+
+    async with timer.step('pulizia interfaccia'):
+        routes = await run(['ip', 'route', 'show', 'dev', interface])
+        route_deletes = [
+            run(['sudo', 'ip', 'route', 'del', line.split()[0], 'dev', interface])
+            for line in routes.stdout.strip().split('\n') if line
+        ]
+        flush, *_ = await asyncio.gather(
+            run(['sudo', 'ip', 'addr', 'flush', 'dev', interface]),
+            run(['sudo', 'ip', 'route', 'del', 'default']),
+            *route_deletes
+        )
+        print(f"[NETWORK]    IP flush: {flush.returncode == 0}")
+
+    await reset_link(interface, timer)
+
+    async with timer.step('indirizzo e DNS'):
+        dns_content = ''.join(f"nameserver {d.strip()}\n" for d in dns.split(','))
+        result, _ = await asyncio.gather(
+            run(['sudo', 'ip', 'addr', 'add', f'{ip_address}/{netmask}', 'dev', interface]),
+            install_file(dns_content, '/tmp/resolv.conf.new', '/etc/resolv.conf')
+        )
+        if result.returncode == 0:
+            await wait_until(lambda: has_address(interface, ip_address), timeout=3)
+            print(f"[NETWORK]    ✅ IP assegnato")
+        else:
+            print(f"[NETWORK]    ⚠️  Errore assegnazione IP: {result.stderr}")
+        print(f"[NETWORK]    ✅ DNS configurato: {dns}")
+
+    async with timer.step('gateway'):
+        result = await run(['sudo', 'ip', 'route', 'add', 'default', 'via', gateway, 'dev', interface])
+        if result.returncode == 0 and await wait_until(lambda: has_default_route(gateway), timeout=3):
+            print(f"[NETWORK]    ✅ Gateway configurato")
+        else:
+            print(f"[NETWORK]    ⚠️  Errore gateway: {result.stderr}")
+
+    async with timer.step('riavvio servizi di rete'):
+        starts = []
+        if is_wifi:
+            starts.append(run(['sudo', 'systemctl', 'start', 'wpa_supplicant'], timeout=SERVICE_TIMEOUT))
+        if dhcpcd_active:
+            starts.append(run(['sudo', 'systemctl', 'start', 'dhcpcd'], timeout=SERVICE_TIMEOUT))
+        if networkd_active:
+            starts.append(run(['sudo', 'systemctl', 'start', 'systemd-networkd'], timeout=SERVICE_TIMEOUT))
+        await asyncio.gather(*starts)
+        if is_wifi and not await wait_until(lambda: link_operational(interface), timeout=15, interval=0.25):
+            print(f"[NETWORK] ⚠️  {interface} non ancora associata alla rete WiFi")
+
+    async with timer.step('verifica'):
+        if await wait_until(lambda: has_address(interface, ip_address), timeout=5, interval=0.25):
+            print(f"[NETWORK] ✅ SUCCESSO: IP statico {ip_address} applicato e attivo!")
+        else:
+            result = await run(['ip', 'addr', 'show', interface])
+            print(f"[NETWORK] ⚠️  ATTENZIONE: IP potrebbe non essere applicato correttamente")
+            print(f"[NETWORK]    Output ip addr: {result.stdout}")
+
+    print(f"[NETWORK] ℹ️  Configurazione completata: {ip_address}/{netmask}, Gateway: {gateway}")
+    return timer.summary()
+
+
+async def set_dhcp(interface, on_step=None):
+    """Configura DHCP su dhcpcd o systemd-networkd e riavvia l'interfaccia"""
+    timer = StepTimer(f'DHCP su {interface}', on_step, DHCP_STEPS)
+
+    async with timer.step('rilevamento backend'):
+        _, dhcpcd_active, networkd_active = await detect_backends()
+    print(f"[NETWORK] ℹ️  dhcpcd attivo: {dhcpcd_active}, systemd-networkd attivo: {networkd_active}")
+
+    async with timer.step('configurazione persistente'):
+        if networkd_active and not dhcpcd_active:
+            systemd_config = f"""[Match]
+Name={interface}
+
+[Network]
+DHCP=yes
+IPv6AcceptRA=yes
+"""
+            await run(['sudo', 'mkdir', '-p', '/etc/systemd/network'])
+            await asyncio.gather(
+                install_file(systemd_config, f'/tmp/99-{interface}-dhcp.network',
+                             f'/etc/systemd/network/99-{interface}-dhcp.network'),
+                run(['sudo', 'rm', '-f', f'/etc/systemd/network/99-{interface}-static.network'])
+            )
+            print(f"[NETWORK] ✅ /etc/systemd/network aggiornato")
+            await enable_and_restart('systemd-networkd')
+            print(f"[NETWORK] ✅ systemd-networkd abilitato e riavviato")
+        else:
+            if not dhcpcd_active and not networkd_active:
+                print(f"[NETWORK] ⚠️  Nessun servizio di rete attivo, utilizzo dhcpcd...")
+            try:
+                if os.path.exists('/etc/dhcpcd.conf'):
+                    await install_file(_dhcpcd_without_interface(interface),
+                                       '/tmp/dhcpcd.conf.new', '/etc/dhcpcd.conf')
+                    print(f"[NETWORK] ✅ /etc/dhcpcd.conf: configurazione statica rimossa")
+                await enable_and_restart('dhcpcd')
+                print(f"[NETWORK] ✅ dhcpcd abilitato e riavviato")
+            except CommandError as e:
+                if dhcpcd_active:
+                    raise
+                print(f"[NETWORK] ⚠️  Errore configurazione dhcpcd: {e}")
+
+    print(f"[NETWORK] 🔄 Riavvio interfaccia {interface}...")
+    try:
+        await reset_link(interface, timer)
+        print(f"[NETWORK] ✅ Interfaccia {interface} riavviata")
+    except CommandError as e:
+        print(f"[NETWORK] ⚠️  Errore riavvio interfaccia: {e}")
+
+    print(f"[NETWORK] ℹ️  DHCP abilitato su {interface}")
+    return timer.summary()
@@ -0,0 +1,392 @@
+"""
+Stato di rete senza processi esterni
+Indirizzi, route e link letti da ioctl, /proc/net e /sys/class/net; i file di
+configurazione vengono riletti solo quando cambia il loro mtime. Lo stato runtime
+resta in cache per pochi secondi e viene invalidato dagli eventi netlink del kernel
+(cambio link, indirizzo o route) o esplicitamente dopo una riconfigurazione.
+Con il backend di simulazione lo stato viene dalla rete finta del backend e i file
+di configurazione dalla cartella della simulazione.
+"""
+
+import array
+import fcntl
+import os
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+import backend
+
+# Durata massima della cache dello stato runtime (secondi)
+STATE_TTL = 5
+
+SYSTEMD_NETWORK_DIR = '/etc/systemd/network/'
+DHCPCD_CONF = '/etc/dhcpcd.conf'
+INTERFACES_DIR = '/etc/network/interfaces.d/'
+
+# ioctl Linux (linux/sockios.h, linux/wireless.h)
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+SIOCGIWESSID = 0x8B1B
+IW_ESSID_MAX_SIZE = 32
+
+# Gruppi netlink: link, indirizzi IPv4, route IPv4
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+_lock = threading.Lock()
+_state = None
+_state_time = 0
+_file_cache = {}
+_netlink = None
+_netlink_failed = False
+_wifi_source = None
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CACHE E INVALIDAZIONE
+# ═══════════════════════════════════════════════════════════════════════════
+
+def invalidate():
+    """Scarta lo stato in cache (da chiamare dopo ogni modifica alla rete)"""
+    global _state
+    with _lock:
+        _state = None
+
+
+def set_wifi_source(func):
+    """Usa func(interfaccia) -> SSID (es. client D-Bus di NetworkManager) per la rete WiFi connessa"""
+    global _wifi_source
+    _wifi_source = func
+
+
+def _open_netlink():
+    """Socket netlink non bloccante iscritto ai cambi di link, indirizzi e route"""
+    global _netlink, _netlink_failed
+    if _netlink is not None or _netlink_failed:
+        return _netlink
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        sock.setblocking(False)
+        _netlink = sock
+    except (AttributeError, OSError) as e:
+        # Netlink non disponibile: resta solo la scadenza a tempo
+        _netlink_failed = True
+        print(f"[NETWORK] ⚠️  Eventi netlink non disponibili: {e}")
+    return _netlink
+
+
+def _netlink_changed():
+    """True se il kernel ha notificato cambi dall'ultima lettura (svuota la coda)"""
+    sock = _open_netlink()
+    if sock is None:
+        return False
+    changed = False
+    while True:
+        try:
+            if not sock.recv(65536):
+                break
+            changed = True
+        except BlockingIOError:
+            break
+        except OSError:
+            # Coda piena (ENOBUFS): eventi persi, quindi stato da rileggere
+            changed = True
+            break
+    return changed
+
+
+def _cached_file(path, parser):
+    """Risultato di parser(path) riutilizzato finché mtime e dimensione non cambiano"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        _file_cache.pop(path, None)
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, 'r') as f:
+            parsed = parser(f.read())
+    except OSError as e:
+        print(f"[NETWORK] ⚠️  Errore lettura {path}: {e}")
+        parsed = None
+    _file_cache[path] = (key, parsed)
+    return parsed
+
+
+def _list_dir(path):
+    """Contenuto di una cartella di configurazione, vuoto se non esiste"""
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return []
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# STATO RUNTIME
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _simulated_network():
+    """Rete finta del backend di simulazione, None sulla scheda"""
+    return backend.current.network if backend.simulated() else None
+
+
+def _system_path(path):
+    """File di configurazione di sistema (sotto la radice della simulazione se attiva)"""
+    return backend.current.path(path) if backend.simulated() else path
+
+
+def hostname():
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.hostname
+    return socket.gethostname()
+
+
+def interfaces():
+    """Nomi delle interfacce in ordine di indice (come 'ip addr')"""
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.interfaces()
+    try:
+        return [name for _, name in socket.if_nameindex()]
+    except OSError:
+        return _list_dir('/sys/class/net')
+
+
+def _ioctl_ipv4(sock, interface, request):
+    ifreq = struct.pack('256s', interface.encode()[:15])
+    try:
+        data = fcntl.ioctl(sock.fileno(), request, ifreq)
+    except OSError:
+        return None
+    return socket.inet_ntoa(data[20:24])
+
+
+def ipv4_addresses():
+    """Indirizzo IPv4 principale di ogni interfaccia: {interfaccia: (ip, netmask)}"""
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.ipv4_addresses()
+    addresses = {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for interface in interfaces():
+            ip = _ioctl_ipv4(sock, interface, SIOCGIFADDR)
+            if ip:
+                addresses[interface] = (ip, _ioctl_ipv4(sock, interface, SIOCGIFNETMASK))
+    return addresses
+
+
+def default_gateway():
+    """Gateway della route di default da /proc/net/route (interfaccia, gateway)"""
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.default_gateway()
+    try:
+        with open('/proc/net/route', 'r') as f:
+            lines = f.readlines()[1:]
+    except OSError:
+        return None, None
+    for line in lines:
+        fields = line.split()
+        # Destinazione 0.0.0.0 con flag RTF_GATEWAY
+        if len(fields) >= 4 and fields[1] == '00000000' and int(fields[3], 16) & 0x2:
+            return fields[0], socket.inet_ntoa(struct.pack('<L', int(fields[2], 16)))
+    return None, None
+
+
+def link_state(interface):
+    """Stato operativo dell'interfaccia da /sys/class/net"""
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.link_state(interface)
+    try:
+        with open(f'/sys/class/net/{interface}/operstate', 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return 'unknown'
+
+
+def wifi_ssid(interface='wlan0'):
+    """SSID della rete WiFi associata tramite ioctl wireless, senza iwconfig/iw"""
+    sim = _simulated_network()
+    if sim is not None:
+        return sim.wifi_ssid()
+    if not os.path.isdir(f'/sys/class/net/{interface}/wireless'):
+        return None
+    # struct iwreq: nome interfaccia + struct iw_point (puntatore, lunghezza, flag)
+    essid = array.array('B', bytes(IW_ESSID_MAX_SIZE + 1))
+    address, length = essid.buffer_info()
+    request = struct.pack('16sPHH', interface.encode()[:15], address, length, 0).ljust(32, b'\0')
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            result = fcntl.ioctl(sock.fileno(), SIOCGIWESSID, request)
+        except OSError:
+            return None
+    length = struct.unpack('16sPHH', result[:struct.calcsize('16sPHH')])[2]
+    return essid.tobytes()[:length].decode(errors='replace') or None
+
+
+def _nmcli_connection_name():
+    """Ultima risorsa se le wireless extensions non sono disponibili (solo alla scadenza della cache)"""
+    try:
+        result = backend.run(
+            ['nmcli', '-t', '-f', 'NAME,TYPE', 'connection', 'show', '--active'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=3
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    for line in result.stdout.splitlines():
+        name, _, kind = line.rpartition(':')
+        if kind.endswith('wireless') and name:
+            return name.replace('\\:', ':')
+    return None
+
+
+def _read_state():
+    addresses = ipv4_addresses()
+    gateway_if, gateway = default_gateway()
+    current_ips = [ip for interface, (ip, _) in addresses.items() if ip != '127.0.0.1']
+    if _wifi_source is not None:
+        ssid = _wifi_source('wlan0')
+    else:
+        ssid = wifi_ssid('wlan0')
+        if ssid is None and os.path.isdir('/sys/class/net/wlan0/wireless') and link_state('wlan0') == 'up':
+            ssid = _nmcli_connection_name()
+    return {
+        'hostname': hostname(),
+        'addresses': {interface: {'ip': ip, 'netmask': mask, 'state': link_state(interface)}
+                      for interface, (ip, mask) in addresses.items()},
+        'current_ip': current_ips[0] if current_ips else 'N/A',
+        'gateway': gateway or '--',
+        'gateway_interface': gateway_if,
+        'network_name': ssid or '--'
+    }
+
+
+def runtime_state():
+    """Stato runtime in cache; riletto alla scadenza o a un evento netlink"""
+    global _state, _state_time
+    with _lock:
+        if _netlink_changed():
+            _state = None
+        if _state is None or time.monotonic() - _state_time > STATE_TTL:
+            _state = _read_state()
+            _state_time = time.monotonic()
+        return _state
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CONFIGURAZIONE PERSISTENTE (cache per mtime)
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _parse_networkd(content):
+    values = {}
+    for line in content.split('\n'):
+        line = line.strip()
+        for key in ('Name', 'Address', 'Gateway', 'DNS'):
+            if line.startswith(f'{key}='):
+                values[key] = line.split('=')[1]
+    return values
+
+
+def _parse_dhcpcd(content):
+    """Sezioni 'interface X' di dhcpcd.conf: {interfaccia: {chiave: valore}}"""
+    sections = {}
+    current = None
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('interface '):
+            current = sections.setdefault(line.split()[1], {})
+        elif current is not None and line.startswith('static ') and '=' in line:
+            key, _, value = line[len('static '):].partition('=')
+            current[key] = value
+    return sections
+
+
+def _parse_interfaces(content):
+    values = {'static': 'static' in content}
+    for line in content.split('\n'):
+        if line.strip().startswith('address '):
+            values['address'] = line.split()[1]
+        elif line.strip().startswith('gateway '):
+            values['gateway'] = line.split()[1]
+    return values
+
+
+def configured_mode(config):
+    """Completa config con modalità, interfaccia, IP statico e DNS configurati"""
+    config['mode'] = 'DHCP'
+    config['interface'] = 'wlan0'
+    config['dns'] = '--'
+    networkd_dir = _system_path(SYSTEMD_NETWORK_DIR)
+    interfaces_dir = _system_path(INTERFACES_DIR)
+
+    # systemd-networkd
+    networkd_exists = os.path.exists(networkd_dir)
+    for name in _list_dir(networkd_dir):
+        if not name.endswith('.network'):
+            continue
+        values = _cached_file(os.path.join(networkd_dir, name), _parse_networkd)
+        if values is None:
+            continue
+        if 'static' in name:
+            config['mode'] = 'STATIC'
+            if 'Name' in values:
+                config['interface'] = values['Name']
+            if 'Address' in values:
+                config['static_ip'] = values['Address']
+            if 'Gateway' in values:
+                config['gateway'] = values['Gateway']
+            if 'DNS' in values:
+                config['dns'] = values['DNS']
+        elif 'dhcp' in name:
+            config['mode'] = 'DHCP'
+            if 'Name' in values:
+                config['interface'] = values['Name']
+
+    # /etc/dhcpcd.conf (metodo tradizionale Raspberry Pi)
+    if config['mode'] == 'DHCP':
+        sections = _cached_file(_system_path(DHCPCD_CONF), _parse_dhcpcd) or {}
+        section = sections.get(config['interface'])
+        if section is not None:
+            config['mode'] = 'STATIC'
+            if 'ip_address' in section:
+                config['static_ip'] = section['ip_address']
+            if 'routers' in section:
+                config['gateway'] = section['routers']
+            if 'domain_name_servers' in section:
+                config['dns'] = section['domain_name_servers']
+
+    # /etc/network/interfaces.d/
+    if config['mode'] == 'DHCP' and not networkd_exists:
+        for name in _list_dir(interfaces_dir):
+            if not (name.endswith('.conf') or '99-' in name):
+                continue
+            values = _cached_file(os.path.join(interfaces_dir, name), _parse_interfaces)
+            if values and values['static']:
+                config['mode'] = 'STATIC'
+                if 'address' in values:
+                    config['static_ip'] = values['address']
+                if 'gateway' in values:
+                    config['gateway'] = values['gateway']
+    return config
+
+
+def network_info():
+    """Informazioni di rete per /api/network/info (stesso formato della versione con ip/iwconfig)"""
+    state = runtime_state()
+    config = {
+        'current_ip': state['current_ip'],
+        'gateway': state['gateway']
+    }
+    configured_mode(config)
+    config['network_name'] = state['network_name']
+    return config
@@ -0,0 +1,391 @@
+"""
+Client D-Bus persistente per NetworkManager
+Una sola connessione al bus di sistema per tutta la vita dell'applicazione: le
+operazioni (attivazione, disattivazione, creazione e rimozione profili, scansione)
+sono chiamate in-process invece di processi nmcli, e l'esito di connessioni e
+disconnessioni arriva dai segnali di NetworkManager invece che da polling.
+Se jeepney o NetworkManager non sono disponibili si ripiega su nmcli.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from queue import Queue
+
+import backend
+
+try:
+    from jeepney import DBusAddress, MatchRule, Properties, message_bus, new_method_call
+    from jeepney.io.threading import DBusRouter, Proxy, open_dbus_connection
+    from jeepney.wrappers import DBusErrorResponse, unwrap_msg
+except ImportError:
+    DBusRouter = None
+
+    class DBusErrorResponse(Exception):
+        pass
+
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+NM_IFACE = 'org.freedesktop.NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+SETTINGS_IFACE = 'org.freedesktop.NetworkManager.Settings'
+CONNECTION_IFACE = 'org.freedesktop.NetworkManager.Settings.Connection'
+ACTIVE_IFACE = 'org.freedesktop.NetworkManager.Connection.Active'
+WIRELESS_IFACE = 'org.freedesktop.NetworkManager.Device.Wireless'
+AP_IFACE = 'org.freedesktop.NetworkManager.AccessPoint'
+
+# NMActiveConnectionState
+ACTIVE_ACTIVATED = 2
+ACTIVE_DEACTIVATED = 4
+
+# Flag di sicurezza degli access point (NM80211ApFlags / NM80211ApSecurityFlags)
+AP_FLAGS_PRIVACY = 0x1
+AP_SEC_KEY_MGMT_802_1X = 0x200
+
+DBUS_TIMEOUT = 10
+
+
+def channel_from_frequency(frequency):
+    if frequency == 2484:
+        return 14
+    if 2412 <= frequency <= 2472:
+        return (frequency - 2407) // 5
+    if frequency >= 5000:
+        return (frequency - 5000) // 5
+    return None
+
+
+def _security_label(flags, wpa_flags, rsn_flags):
+    if rsn_flags or wpa_flags:
+        label = 'WPA2' if rsn_flags else 'WPA'
+        if (rsn_flags | wpa_flags) & AP_SEC_KEY_MGMT_802_1X:
+            label += ' 802.1X'
+        return label
+    if flags & AP_FLAGS_PRIVACY:
+        return 'WEP'
+    return ''
+
+
+class NetworkManagerClient:
+    """Connessione D-Bus a NetworkManager con stato aggiornato dai segnali"""
+
+    def __init__(self):
+        self._router = None
+        self._signals = Queue(maxsize=512)
+        self._cond = threading.Condition()
+        self._active_states = {}     # percorso connessione attiva -> stato
+        self._listeners = []
+        self._thread = None
+        self.events = 0
+        self.last_event = None
+
+    def start(self):
+        """Apre la connessione al bus e si iscrive ai segnali; False se non disponibile"""
+        if DBusRouter is None:
+            print("[NM] ⚠️  jeepney non installato - uso nmcli")
+            return False
+        try:
+            router = DBusRouter(open_dbus_connection(bus='SYSTEM'))
+            self._router = router
+            version = self._get(NM_PATH, NM_IFACE, 'Version')
+            Proxy(message_bus, router).AddMatch(
+                MatchRule(type='signal', sender=NM_BUS, path_namespace=NM_PATH)
+            )
+            # Il filtro locale confronta il mittente con il nome unico, non con NM_BUS
+            router.filter(MatchRule(type='signal', path_namespace=NM_PATH), queue=self._signals)
+        except Exception as e:
+            print(f"[NM] ⚠️  NetworkManager non raggiungibile via D-Bus ({e}) - uso nmcli")
+            if self._router is not None:
+                self._router.close()
+                self._router.conn.close()
+            self._router = None
+            return False
+        self._thread = threading.Thread(target=self._signal_loop, name='nm-signals', daemon=True)
+        self._thread.start()
+        print(f"[NM] ✅ Connesso a NetworkManager {version} via D-Bus")
+        return True
+
+    def available(self):
+        return self._router is not None
+
+    def add_listener(self, callback):
+        """callback() viene chiamata a ogni cambio di stato di rete notificato"""
+        self._listeners.append(callback)
+
+    # ------------------------------------------------------------------
+    # D-Bus
+    # ------------------------------------------------------------------
+
+    def _call(self, path, interface, method, signature=None, body=(), timeout=DBUS_TIMEOUT):
+        address = DBusAddress(path, bus_name=NM_BUS, interface=interface)
+        reply = self._router.send_and_get_reply(
+            new_method_call(address, method, signature, body), timeout=timeout
+        )
+        return unwrap_msg(reply)
+
+    def _get(self, path, interface, prop):
+        address = DBusAddress(path, bus_name=NM_BUS, interface=interface)
+        reply = self._router.send_and_get_reply(Properties(address).get(prop), timeout=DBUS_TIMEOUT)
+        return unwrap_msg(reply)[0][1]
+
+    def _get_all(self, path, interface):
+        address = DBusAddress(path, bus_name=NM_BUS, interface=interface)
+        reply = self._router.send_and_get_reply(Properties(address).get_all(), timeout=DBUS_TIMEOUT)
+        return {name: value for name, (_, value) in unwrap_msg(reply)[0].items()}
+
+    def _signal_loop(self):
+        while True:
+            msg = self._signals.get()
+            path = msg.header.fields.get(1)
+            interface = msg.header.fields.get(2)
+            member = msg.header.fields.get(3)
+            if interface == ACTIVE_IFACE and member == 'StateChanged':
+                state = msg.body[0]
+                with self._cond:
+                    if len(self._active_states) > 100:
+                        self._active_states.clear()
+                    self._active_states[path] = state
+            if member not in ('StateChanged', 'PropertiesChanged'):
+                continue
+            with self._cond:
+                self.events += 1
+                self.last_event = time.time()
+                self._cond.notify_all()
+            for callback in self._listeners:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[NM] ⚠️  Errore listener: {e}")
+
+    def _wait_for(self, check, timeout):
+        """Attende (sui segnali, non con polling) che check() diventi vera"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                result = check()
+                if result:
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return result
+                self._cond.wait(remaining)
+
+    # ------------------------------------------------------------------
+    # Profili
+    # ------------------------------------------------------------------
+
+    def connections(self):
+        """Profili salvati: [{'path', 'id', 'type', 'uuid'}]"""
+        if not self.available():
+            return [{'path': None, 'id': name, 'type': kind, 'uuid': None}
+                    for name, kind in self._nmcli_connections()]
+        result = []
+        for path in self._call(SETTINGS_PATH, SETTINGS_IFACE, 'ListConnections')[0]:
+            try:
+                settings = self._call(path, CONNECTION_IFACE, 'GetSettings')[0]
+            except DBusErrorResponse:
+                continue
+            conn = settings.get('connection', {})
+            result.append({
+                'path': path,
+                'id': conn.get('id', ('s', ''))[1],
+                'type': conn.get('type', ('s', ''))[1],
+                'uuid': conn.get('uuid', ('s', ''))[1]
+            })
+        return result
+
+    def delete_connection(self, name):
+        """Rimuove tutti i profili con questo nome; ritorna quanti ne ha rimossi"""
+        if not self.available():
+            result = _nmcli(['connection', 'delete', name])
+            return 1 if result.returncode == 0 else 0
+        deleted = 0
+        for conn in self.connections():
+            if conn['id'] == name:
+                try:
+                    self._call(conn['path'], CONNECTION_IFACE, 'Delete')
+                    deleted += 1
+                except DBusErrorResponse as e:
+                    print(f"[NM] ⚠️  Errore eliminazione {name}: {e}")
+        return deleted
+
+    def add_wifi(self, ssid, password, interface):
+        """Crea un profilo WiFi persistente con autoconnessione"""
+        if not self.available():
+            cmd = ['connection', 'add', 'type', 'wifi', 'ifname', interface,
+                   'con-name', ssid, 'autoconnect', 'yes', 'ssid', ssid]
+            if password:
+                cmd += ['wifi-sec.key-mgmt', 'wpa-psk', 'wifi-sec.psk', password]
+            result = _nmcli(cmd, timeout=30)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr or result.stdout or "Errore sconosciuto")
+            return None
+        settings = {
+            'connection': {
+                'id': ('s', ssid),
+                'type': ('s', '802-11-wireless'),
+                'interface-name': ('s', interface),
+                'autoconnect': ('b', True)
+            },
+            '802-11-wireless': {
+                'ssid': ('ay', ssid.encode()),
+                'mode': ('s', 'infrastructure')
+            },
+            'ipv4': {'method': ('s', 'auto')},
+            'ipv6': {'method': ('s', 'auto')}
+        }
+        if password:
+            settings['802-11-wireless-security'] = {
+                'key-mgmt': ('s', 'wpa-psk'),
+                'psk': ('s', password)
+            }
+        try:
+            return self._call(SETTINGS_PATH, SETTINGS_IFACE, 'AddConnection', 'a{sa{sv}}', (settings,))[0]
+        except DBusErrorResponse as e:
+            raise RuntimeError(str(e))
+
+    # ------------------------------------------------------------------
+    # Attivazione
+    # ------------------------------------------------------------------
+
+    def _active_state(self, path):
+        state = self._active_states.get(path)
+        if state is not None:
+            return state
+        try:
+            return self._get(path, ACTIVE_IFACE, 'State')
+        except DBusErrorResponse:
+            # Oggetto già rimosso: la connessione non è più attiva
+            return ACTIVE_DEACTIVATED
+
+    def activate(self, name, interface=None, timeout=20):
+        """Attiva un profilo e attende l'esito dai segnali; ritorna (ok, messaggio)"""
+        if not self.available():
+            result = _nmcli(['connection', 'up', name], timeout=timeout)
+            return result.returncode == 0, (result.stderr or result.stdout).strip()
+        conn = next((c for c in self.connections() if c['id'] == name), None)
+        if conn is None:
+            return False, f'Profilo non trovato: {name}'
+        device = '/'
+        if interface:
+            device = self._call(NM_PATH, NM_IFACE, 'GetDeviceByIpIface', 's', (interface,))[0]
+        try:
+            active = self._call(NM_PATH, NM_IFACE, 'ActivateConnection', 'ooo',
+                                (conn['path'], device, '/'))[0]
+        except DBusErrorResponse as e:
+            return False, str(e)
+        state = self._wait_for(
+            lambda: self._active_state(active) in (ACTIVE_ACTIVATED, ACTIVE_DEACTIVATED)
+            and self._active_state(active), timeout
+        )
+        if state == ACTIVE_ACTIVATED:
+            return True, 'Connessione attivata'
+        if state == ACTIVE_DEACTIVATED:
+            return False, 'Attivazione fallita'
+        return False, f'Timeout attivazione ({timeout}s)'
+
+    def active_connections(self):
+        """Connessioni attive: [{'path', 'id', 'type', 'state'}]"""
+        if not self.available():
+            return []
+        result = []
+        for path in self._get(NM_PATH, NM_IFACE, 'ActiveConnections'):
+            try:
+                props = self._get_all(path, ACTIVE_IFACE)
+            except DBusErrorResponse:
+                continue
+            result.append({'path': path, 'id': props.get('Id'), 'type': props.get('Type'),
+                           'state': props.get('State')})
+        return result
+
+    def deactivate(self, name, timeout=10):
+        """Disattiva un profilo attivo e attende che sia effettivamente giù"""
+        if not self.available():
+            result = _nmcli(['connection', 'down', name], timeout=timeout)
+            return result.returncode == 0
+        targets = [c['path'] for c in self.active_connections() if c['id'] == name]
+        for path in targets:
+            try:
+                self._call(NM_PATH, NM_IFACE, 'DeactivateConnection', 'o', (path,))
+            except DBusErrorResponse as e:
+                print(f"[NM] ⚠️  Errore disattivazione {name}: {e}")
+        if not targets:
+            return False
+        return bool(self._wait_for(
+            lambda: all(self._active_state(p) == ACTIVE_DEACTIVATED for p in targets), timeout
+        ))
+
+    # ------------------------------------------------------------------
+    # WiFi
+    # ------------------------------------------------------------------
+
+    def _wireless_device(self, interface):
+        return self._call(NM_PATH, NM_IFACE, 'GetDeviceByIpIface', 's', (interface,))[0]
+
+    def wifi_ssid(self, interface='wlan0'):
+        """SSID dell'access point a cui è associata l'interfaccia (None se non connessa)"""
+        if not self.available():
+            return None
+        try:
+            ap = self._get(self._wireless_device(interface), WIRELESS_IFACE, 'ActiveAccessPoint')
+            if ap == '/':
+                return None
+            return bytes(self._get(ap, AP_IFACE, 'Ssid')).decode(errors='replace') or None
+        except DBusErrorResponse:
+            return None
+
+    def access_points(self, interface='wlan0', rescan=True, timeout=15):
+        """Access point visibili, nello stesso formato di wifiscan.parse_scan"""
+        device = self._wireless_device(interface)
+        if rescan:
+            last_scan = self._get(device, WIRELESS_IFACE, 'LastScan')
+            try:
+                self._call(device, WIRELESS_IFACE, 'RequestScan', 'a{sv}', ({},))
+                # Attende l'aggiornamento di LastScan notificato da NetworkManager
+                self._wait_for(lambda: self._get(device, WIRELESS_IFACE, 'LastScan') != last_scan, timeout)
+            except DBusErrorResponse as e:
+                # Scansione già in corso o rifiutata: si usa la lista attuale
+                print(f"[NM] ⚠️  Scansione non avviata: {e}")
+        active = self._get(device, WIRELESS_IFACE, 'ActiveAccessPoint')
+        result = []
+        for path in self._call(device, WIRELESS_IFACE, 'GetAllAccessPoints')[0]:
+            try:
+                props = self._get_all(path, AP_IFACE)
+            except DBusErrorResponse:
+                continue
+            frequency = props.get('Frequency')
+            channel = channel_from_frequency(frequency) if frequency else None
+            result.append({
+                'ssid': bytes(props.get('Ssid', b'')).decode(errors='replace'),
+                'bssid': props.get('HwAddress', ''),
+                'signal': int(props.get('Strength', 0)),
+                'frequency': frequency,
+                'band': '5 GHz' if frequency and frequency >= 5000 else '2.4 GHz',
+                'channel': str(channel) if channel else '',
+                'security': _security_label(props.get('Flags', 0), props.get('WpaFlags', 0),
+                                            props.get('RsnFlags', 0)),
+                'in_use': path == active
+            })
+        return result
+
+    # ------------------------------------------------------------------
+    # Ripiego nmcli
+    # ------------------------------------------------------------------
+
+    def _nmcli_connections(self):
+        result = _nmcli(['-t', '-f', 'NAME,TYPE', 'connection', 'show'])
+        connections = []
+        for line in result.stdout.splitlines():
+            name, _, kind = line.rpartition(':')
+            if name:
+                connections.append((name.replace('\\:', ':'), kind))
+        return connections
+
+
+def _nmcli(args, timeout=10):
+    return backend.run(
+        ['sudo', 'nmcli'] + args,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout,
+        env=dict(os.environ, LC_ALL='C')
+    )
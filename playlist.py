@@ -0,0 +1,296 @@
+"""
+Playlist di video senza interruzioni
+Una sorgente 'playlist' riproduce più file della libreria video uno dopo l'altro
+(in ordine o mescolati). Ogni file viene letto da un FFmpeg "lettore" che scrive
+verso una destinazione persistente: l'FFmpeg che pubblica su MediaMTX (RTSP) o la
+cartella dei frame di mjpg-streamer (MJPG). Cambiare file o modificare la
+playlist non riavvia la pipeline né scollega i lettori RTSP.
+"""
+
+import json
+import os
+import random
+import signal
+import subprocess
+import threading
+import time
+
+import inputplan
+import proclogs
+
+DEFAULT_PLAYLIST = {
+    'files': [],
+    'shuffle': False,
+    'loop': True
+}
+
+# Parametri che devono coincidere perché i file possano essere copiati senza ricodifica
+# (oltre al framerate, confrontato normalizzato)
+COPY_KEYS = ('codec_name', 'profile', 'width', 'height', 'pix_fmt')
+# Campi letti da ffprobe per ogni stream del file
+PROBE_KEYS = ('codec_type',) + COPY_KEYS + ('r_frame_rate', 'avg_frame_rate', 'channels', 'sample_rate')
+
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+
+def probe_media(path):
+    """
+    Primo stream video e primo stream audio del file e durata (ffprobe, in cache per mtime).
+    None se il file non esiste. Se ffprobe non riesce a leggerlo il motivo è in 'error'
+    (video vuoto, audio sconosciuto) e il risultato non va in cache: si riprova al prossimo uso.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _probe_lock:
+        cached = _probe_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    media = {'video': {}, 'audio': None, 'duration': None}
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error',
+             '-show_entries', 'stream=' + ','.join(PROBE_KEYS) + ':format=duration',
+             '-of', 'json', path],
+            capture_output=True, text=True, timeout=15
+        )
+        if result.returncode != 0:
+            lines = (result.stderr or '').strip().splitlines()
+            raise ValueError(lines[-1] if lines else f'ffprobe terminato con codice {result.returncode}')
+        data = json.loads(result.stdout or '{}')
+        streams = data.get('streams') or []
+        media['video'] = next((s for s in streams if s.get('codec_type') == 'video'), {})
+        media['audio'] = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+        media['duration'] = float((data.get('format') or {}).get('duration') or 0) or None
+    except (OSError, subprocess.TimeoutExpired, ValueError) as e:
+        media['error'] = str(e)
+        return media
+    with _probe_lock:
+        _probe_cache[path] = (mtime, media)
+    return media
+
+
+def probe_video(path):
+    """Codec, profilo e formato del primo stream video (None se il file non esiste)"""
+    media = probe_media(path)
+    return media['video'] if media is not None else None
+
+
+def can_stream_copy(paths, codec='h264'):
+    """True se tutti i file hanno lo stesso profilo video e framerate nel codec richiesto"""
+    profiles = set()
+    for path in paths:
+        info = probe_video(path)
+        if not info or info.get('codec_name') != codec:
+            return False
+        fps = inputplan.stream_fps(info)
+        if fps is None:
+            # Framerate sconosciuto: i timestamp del flusso unico non sarebbero garantiti
+            return False
+        # avg_frame_rate e r_frame_rate possono differire nella forma ('30000/1001', '2997/100')
+        profiles.add(tuple(info.get(key) for key in COPY_KEYS) + (round(fps, 2),))
+    return len(profiles) == 1
+
+
+class Playlist:
+    """Elenco di file modificabile mentre viene riprodotto"""
+
+    def __init__(self, files, shuffle=False, loop=True):
+        self.files = list(files)
+        self.shuffle = shuffle
+        self.loop = loop
+        self.version = 0
+        self._queue = []
+        self._last = None
+        self._finished = False
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+
+    def update(self, files=None, shuffle=None, loop=None):
+        """Sostituisce la playlist: il file in corso termina, poi si prosegue con la nuova"""
+        with self._lock:
+            if files is not None:
+                self.files = list(files)
+            if shuffle is not None:
+                self.shuffle = shuffle
+            if loop is not None:
+                self.loop = loop
+            self._queue = []
+            self._finished = False
+            self.version += 1
+        self._changed.set()
+
+    def next(self):
+        """Prossimo file da riprodurre (None se la playlist è vuota o finita)"""
+        with self._lock:
+            if not self._queue:
+                if not self.files or self._finished:
+                    return None
+                self._queue = list(self.files)
+                if self.shuffle and len(self._queue) > 1:
+                    random.shuffle(self._queue)
+                    # Niente ripetizioni a cavallo di due giri
+                    if self._queue[0] == self._last:
+                        self._queue.append(self._queue.pop(0))
+            self._last = self._queue.pop(0)
+            # Senza loop la playlist finisce dopo l'ultimo file (fino alla prossima modifica)
+            self._finished = not self._queue and not self.loop
+            return self._last
+
+    def wait_change(self, timeout):
+        self._changed.wait(timeout)
+        self._changed.clear()
+
+    def wake(self):
+        self._changed.set()
+
+    def to_dict(self):
+        with self._lock:
+            return {'files': list(self.files), 'shuffle': self.shuffle, 'loop': self.loop}
+
+
+class PlaylistPlayer:
+    """
+    Riproduce la playlist un file alla volta. command(path, offset, copy) costruisce
+    il comando del lettore; sink è il file (es. stdin del publisher) su cui scrive e
+    publisher il processo che lo legge: se termina la playlist si ferma (la pipeline
+    viene riavviata dal watchdog con una playlist nuova).
+    """
+
+    def __init__(self, name, playlist, resolve, command, sink=None, copy_codec=None, log=None,
+                 publisher=None):
+        self.name = name
+        self.playlist = playlist
+        self.resolve = resolve
+        self.command = command
+        self.sink = sink
+        self.publisher = publisher
+        self.copy_codec = copy_codec
+        self.log = log or proclogs.get_ring(name)
+        self.current = None
+        self.copy = False
+        self.played = 0
+        self.failures = 0
+        self.started_at = None
+        self._copy_version = None
+        self._process = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Lettore terminato da skip(): FFmpeg intercetta SIGTERM ed esce con 255, non è un errore
+        self._skipping = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f'playlist-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.playlist.wake()
+        self._terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def skip(self):
+        """Passa subito al file successivo"""
+        if self._process is not None:
+            self._skipping.set()
+        self._terminate()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _update_copy_mode(self, paths):
+        """Stream copy se tutti i file hanno lo stesso profilo (ricalcolato a ogni modifica)"""
+        if self._copy_version == self.playlist.version:
+            return
+        self._copy_version = self.playlist.version
+        copy = bool(self.copy_codec) and bool(paths) and can_stream_copy(paths, self.copy_codec)
+        if copy != self.copy:
+            print(f"[PLAYLIST] {self.name}: {'copia senza ricodifica' if copy else 'ricodifica'} dei file")
+        self.copy = copy
+
+    def _run(self):
+        print(f"[PLAYLIST] ▶️  Playlist {self.name} avviata ({len(self.playlist.files)} file)")
+        while not self._stop.is_set():
+            name = self.playlist.next()
+            if name is None:
+                self.current = None
+                self.playlist.wait_change(1)
+                continue
+            path = self.resolve(name)
+            if not os.path.exists(path):
+                self.log.append(f'File della playlist non trovato: {name}', 'playlist', 'error')
+                self._backoff()
+                continue
+            self._update_copy_mode([self.resolve(f) for f in self.playlist.files])
+
+            offset = time.monotonic() - self.started_at
+            self.current = name
+            try:
+                self._process = subprocess.Popen(
+                    self.command(path, offset, self.copy),
+                    stdin=subprocess.DEVNULL,
+                    stdout=self.sink if self.sink is not None else subprocess.DEVNULL,
+                    stderr=subprocess.PIPE
+                )
+            except OSError as e:
+                self.log.append(f'Avvio lettore fallito: {e}', 'playlist', 'error')
+                self._backoff()
+                continue
+            proclogs.attach(self._process, self.log, 'playlist', pipes=('stderr',))
+            code = self._process.wait()
+            self._process = None
+            skipped = self._skipping.is_set()
+            self._skipping.clear()
+            if skipped or self._stop.is_set():
+                self.played += 1
+                self.failures = 0
+            elif self._sink_lost(code):
+                # Rilanciare i lettori verso una pipe chiusa sarebbe un ciclo a vuoto
+                self.log.append(f'{name}: publisher terminato, playlist fermata', 'playlist', 'error')
+                print(f"[PLAYLIST] ❌ {self.name}: publisher terminato (lettore uscito con codice {code})")
+                break
+            elif code == 0:
+                self.played += 1
+                self.failures = 0
+            else:
+                self.log.append(f'{name}: lettore terminato con codice {code}', 'playlist', 'error')
+                self._backoff()
+        self.current = None
+        print(f"[PLAYLIST] ⏹️  Playlist {self.name} fermata")
+
+    def _sink_lost(self, code):
+        """True se la destinazione non accetta più dati (publisher terminato o pipe chiusa)"""
+        if self.publisher is not None and self.publisher.poll() is not None:
+            return True
+        return self.sink is not None and (code == -signal.SIGPIPE or self.sink.closed)
+
+    def _backoff(self):
+        """Con tutti i file in errore non si rilancia FFmpeg a vuoto"""
+        self.failures += 1
+        if self.failures >= max(len(self.playlist.files), 1):
+            self._stop.wait(min(self.failures, 10))
+
+    def _terminate(self):
+        process = self._process
+        if process is None:
+            return
+        try:
+            process.terminate()
+            process.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        except Exception:
+            pass
+
+    def status(self):
+        return dict(self.playlist.to_dict(), **{
+            'running': self.is_running(),
+            'current': self.current,
+            'mode': 'copy' if self.copy else 'transcode',
+            'played': self.played
+        })
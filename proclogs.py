@@ -0,0 +1,238 @@
+"""
+Log dei processi figli
+stdout e stderr di FFmpeg, mjpg-streamer e MediaMTX vengono letti di continuo
+(una pipe non letta si riempie a 64 KB e blocca il processo) e conservati in un
+anello limitato per stream, con livello riconosciuto dal testo e limite di righe
+al secondo: un processo che inonda il log non consuma memoria né CPU.
+"""
+
+import collections
+import os
+import re
+import threading
+import time
+
+LEVELS = {'debug': 0, 'info': 1, 'warning': 2, 'error': 3}
+
+# FFmpeg, mjpg-streamer e MediaMTX (che usa i prefissi ERR/WAR/INF/DEB)
+ERROR_PATTERN = re.compile(
+    r'\b(ERR|error|fatal|failed|failure|cannot|could not|unable to|invalid|no such|denied|'
+    r'not found|broken pipe)\b', re.IGNORECASE)
+WARNING_PATTERN = re.compile(r'\b(WAR|warn|warning|deprecated|timeout|timed out|retry|retrying)\b', re.IGNORECASE)
+DEBUG_PATTERN = re.compile(r'\b(DEB|debug)\b')
+
+MAX_LINE_LENGTH = 1024
+# Righe conservate da ogni anello (ridotte in modalità a basso consumo)
+DEFAULT_RING_LINES = 500
+max_ring_lines = DEFAULT_RING_LINES
+
+
+def detect_level(line):
+    if ERROR_PATTERN.search(line):
+        return 'error'
+    if WARNING_PATTERN.search(line):
+        return 'warning'
+    if DEBUG_PATTERN.search(line):
+        return 'debug'
+    return 'info'
+
+
+class LogRing:
+    """Ultime righe di log di uno stream, con numero di sequenza per il follow"""
+
+    def __init__(self, name, maxlen=500, rate=50):
+        self.name = name
+        self.rate = rate
+        self.lines = collections.deque(maxlen=maxlen)
+        self.seq = 0
+        self.suppressed = 0
+        self.suppressed_total = 0
+        self.counts = dict.fromkeys(LEVELS, 0)
+        self._tokens = float(rate)
+        self._refill_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _allow(self):
+        """Token bucket: al massimo rate righe al secondo (raffiche fino a rate)"""
+        now = time.monotonic()
+        self._tokens = min(float(self.rate), self._tokens + (now - self._refill_at) * self.rate)
+        self._refill_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _add(self, line, source, level):
+        self.seq += 1
+        self.counts[level] += 1
+        self.lines.append({
+            'seq': self.seq,
+            'timestamp': time.time(),
+            'level': level,
+            'source': source,
+            'line': line
+        })
+
+    def append(self, line, source='', level=None):
+        line = line.rstrip()[:MAX_LINE_LENGTH]
+        if not line:
+            return
+        with self._cond:
+            if not self._allow():
+                self.suppressed += 1
+                self.suppressed_total += 1
+                return
+            if self.suppressed:
+                self._add(f'... {self.suppressed} righe soppresse (troppe righe al secondo)', 'proclogs', 'warning')
+                self.suppressed = 0
+            self._add(line, source, level or detect_level(line))
+            self._cond.notify_all()
+
+    def resize(self, maxlen):
+        """Cambia il numero di righe conservate (tiene le più recenti)"""
+        with self._cond:
+            self.lines = collections.deque(self.lines, maxlen=maxlen)
+
+    def tail(self, count=100, min_level='debug', since_seq=0):
+        """Ultime count righe con livello >= min_level e sequenza > since_seq"""
+        threshold = LEVELS.get(min_level, 0)
+        with self._cond:
+            lines = [entry for entry in self.lines
+                     if entry['seq'] > since_seq and LEVELS[entry['level']] >= threshold]
+        return lines[-count:] if count else lines
+
+    def wait(self, since_seq, timeout):
+        """Attende righe nuove dopo since_seq (per il follow)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > since_seq, timeout)
+            return self.seq
+
+    def summary(self, count=10, source=None):
+        """Testo delle ultime righe (errori se presenti) da mostrare in un messaggio di errore"""
+        lines = [entry for entry in self.tail(0) if source is None or entry['source'] == source]
+        errors = [entry for entry in lines if entry['level'] == 'error']
+        return '\n'.join(entry['line'] for entry in (errors or lines)[-count:])
+
+    def status(self):
+        with self._cond:
+            return {
+                'lines': len(self.lines),
+                'seq': self.seq,
+                'suppressed': self.suppressed_total,
+                'counts': dict(self.counts)
+            }
+
+
+_rings = {}
+_rings_lock = threading.Lock()
+
+
+def get_ring(name):
+    """Anello di log dello stream (creato al primo uso)"""
+    with _rings_lock:
+        ring = _rings.get(name)
+        if ring is None:
+            ring = _rings[name] = LogRing(name, maxlen=max_ring_lines)
+        return ring
+
+
+def set_max_lines(maxlen):
+    """Righe conservate dagli anelli, anche da quelli già creati"""
+    global max_ring_lines
+    with _rings_lock:
+        max_ring_lines = maxlen
+        for ring in _rings.values():
+            ring.resize(maxlen)
+
+
+def _drain(pipe, ring, source):
+    try:
+        for raw in iter(lambda: pipe.readline(MAX_LINE_LENGTH), b''):
+            ring.append(raw.decode(errors='replace'), source)
+    except (OSError, ValueError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except Exception:
+            pass
+
+
+def attach(process, ring, source, pipes=('stdout', 'stderr')):
+    """
+    Legge di continuo le pipe del processo (aperte con PIPE) nell'anello.
+    Ritorna i thread di lettura (terminano quando il processo chiude le pipe).
+    """
+    threads = []
+    for name in pipes:
+        pipe = getattr(process, name)
+        if pipe is None:
+            continue
+        thread = threading.Thread(target=_drain, args=(pipe, ring, source),
+                                  name=f'log-{ring.name}-{source}-{name}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def wait_drained(threads, timeout=1):
+    """Attende che le pipe di un processo terminato siano state lette fino in fondo"""
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+
+
+_followers = {}
+
+
+def follow_file(path, ring, source, interval=0.5):
+    """
+    Segue un file di log scritto da un servizio (es. MediaMTX) aggiungendo le righe
+    nuove all'anello; gestisce troncamento e rotazione. Un solo thread per file.
+    """
+    with _rings_lock:
+        if path in _followers and _followers[path].is_alive():
+            return
+        thread = threading.Thread(target=_follow, args=(path, ring, source, interval),
+                                  name=f'log-{ring.name}-{source}', daemon=True)
+        _followers[path] = thread
+        thread.start()
+
+
+def _follow(path, ring, source, interval):
+    handle = None
+    inode = None
+    partial = b''
+    first = True
+    while True:
+        try:
+            if handle is None:
+                skip_history, first = first, False
+                handle = open(path, 'rb')
+                inode = os.fstat(handle.fileno()).st_ino
+                if skip_history:
+                    # File già presente all'avvio: la sua storia è già nel journal
+                    handle.seek(0, os.SEEK_END)
+            data = handle.read(64 * 1024)
+            if data:
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()[-MAX_LINE_LENGTH:]
+                for raw in lines:
+                    ring.append(raw.decode(errors='replace'), source)
+                continue
+            stat = os.stat(path)
+            if stat.st_ino != inode or stat.st_size < handle.tell():
+                # File ruotato o troncato: si riparte dall'inizio del nuovo file
+                handle.close()
+                handle = open(path, 'rb')
+                inode = os.fstat(handle.fileno()).st_ino
+                partial = b''
+                continue
+        except FileNotFoundError:
+            first = False
+            if handle is not None:
+                handle.close()
+                handle = None
+        except OSError:
+            pass
+        time.sleep(interval)
@@ -0,0 +1,143 @@
+"""
+Riconciliazione dello stato desiderato
+Lo stato desiderato (configurazione completa di MJPG, RTSP e registrazione, con il
+flag running) viene confrontato con quello in esecuzione: per ogni componente si
+sceglie l'azione meno costosa che lo porta allo stato richiesto, invece di fermare
+e riavviare sempre tutto (MediaMTX compreso).
+"""
+
+import hashlib
+import json
+import time
+
+COMPONENTS = ('mjpg', 'rtsp', 'recording')
+
+# Azioni dalla meno alla più costosa
+ACTIONS = (
+    'none',               # niente da fare
+    'config',             # solo configurazione salvata / letta al volo (autostart, close_after)
+    'playlist',           # playlist aggiornata senza fermare la pipeline
+    'mediamtx_reload',    # MediaMTX ricarica la configurazione senza riavvio (on-demand)
+    'publisher_restart',  # riavvio del solo FFmpeg che pubblica, MediaMTX resta attivo
+    'auth_update',        # credenziali ricaricate da MediaMTX e publisher riavviato
+    'restart',            # stop e avvio completo del componente
+    'start',
+    'stop'
+)
+
+# Campi che non riguardano la pipeline in esecuzione
+PASSIVE_FIELDS = {'autostart', 'enabled', 'running'}
+AUTH_FIELDS = {'auth_enabled', 'auth_username', 'auth_password'}
+# Campi RTSP che richiedono il riavvio di MediaMTX (indirizzo, modalità del path, trasporti)
+RTSP_SERVER_FIELDS = {'port', 'on_demand', 'transports', 'multicast_ip_range', 'multicast_rtp_port'}
+
+
+def config_hash(config):
+    """Impronta della configurazione di un componente (senza il flag running)"""
+    canonical = json.dumps({k: v for k, v in config.items() if k != 'running'}, sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def changed_fields(current, desired):
+    """Chiavi con valore diverso tra le due configurazioni"""
+    return sorted(key for key in set(current) | set(desired) if current.get(key) != desired.get(key))
+
+
+def plan_component(component, current, desired, running, want_running):
+    """
+    Azione per portare un componente da current (in esecuzione se running) a desired.
+    Ritorna (azione, campi cambiati).
+    """
+    fields = changed_fields(current, desired)
+    if not want_running:
+        if running:
+            return 'stop', fields
+        # Componente fermo: la nuova configurazione viene solo salvata
+        return ('config' if fields else 'none'), fields
+    if not running:
+        return 'start', fields
+
+    active = [f for f in fields if f not in PASSIVE_FIELDS]
+    if component == 'rtsp' and not desired.get('on_demand', False):
+        # Senza on-demand il tempo di chiusura non viene usato
+        active = [f for f in active if f != 'on_demand_close_after']
+    if not active:
+        return ('config' if fields else 'none'), fields
+
+    if component == 'recording':
+        return 'restart', fields
+
+    if component == 'mjpg':
+        if active == ['on_demand_close_after']:
+            # Letto dal reaper a ogni giro
+            return 'config', fields
+        if active == ['playlist'] and desired.get('source_type') == 'playlist':
+            return 'playlist', fields
+        # mjpg-streamer gestisce porta, credenziali e cattura in un solo processo
+        return 'restart', fields
+
+    if RTSP_SERVER_FIELDS & set(active):
+        return 'restart', fields
+    if 'source_type' in active and 'playlist' in (current.get('source_type'), desired.get('source_type')):
+        # Il publisher della playlist ha un ingresso diverso (stdin) e la modalità on-demand è forzata
+        return 'restart', fields
+    if desired.get('on_demand', False):
+        # Il publisher è lanciato da MediaMTX: basta ricaricarne la configurazione
+        return 'mediamtx_reload', fields
+    if active == ['playlist'] and desired.get('source_type') == 'playlist':
+        return 'playlist', fields
+    if AUTH_FIELDS & set(active):
+        return 'auth_update', fields
+    return 'publisher_restart', fields
+
+
+class Reconciler:
+    """
+    Applica lo stato desiderato componente per componente.
+
+    state(component) -> (configurazione in esecuzione, running) e
+    apply(component, azione, configurazione) sono forniti dall'applicazione.
+    """
+
+    def __init__(self, state, apply):
+        self.state = state
+        self.apply = apply
+
+    def plan(self, desired):
+        """Azioni previste per lo stato desiderato, senza eseguirle"""
+        plan = []
+        for component in COMPONENTS:
+            if component not in desired:
+                continue
+            target = dict(desired[component])
+            current, running = self.state(component)
+            want_running = target.pop('running', running)
+            action, fields = plan_component(component, current, target, running, bool(want_running))
+            plan.append({'component': component, 'action': action, 'fields': fields, 'config': target})
+        return plan
+
+    def run(self, desired, dry_run=False, plan=None):
+        """
+        Esegue le azioni in ordine (la registrazione dopo RTSP) e ne misura la durata;
+        plan è il piano già calcolato da plan(), se lo stato salvato è cambiato nel frattempo
+        """
+        t_start = time.monotonic()
+        changes = []
+        ok = True
+        for step in plan if plan is not None else self.plan(desired):
+            change = {key: step[key] for key in ('component', 'action', 'fields')}
+            if not dry_run and step['action'] != 'none':
+                t0 = time.monotonic()
+                try:
+                    self.apply(step['component'], step['action'], step['config'])
+                except Exception as e:
+                    change['error'] = str(e)
+                    ok = False
+                change['ms'] = round((time.monotonic() - t0) * 1000)
+            changes.append(change)
+        return {
+            'success': ok,
+            'dry_run': dry_run,
+            'changes': changes,
+            'total_ms': round((time.monotonic() - t_start) * 1000)
+        }
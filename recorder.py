@@ -0,0 +1,364 @@
+"""
+Registrazione locale a segmenti dello stream RTSP
+Copia l'H.264 già codificato (-c copy) in segmenti di durata fissa, tiene un indice
+dei segmenti e cancella i più vecchi quando si supera la quota di spazio o di età
+"""
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import proclogs
+
+SEGMENT_FORMATS = {
+    'mpegts': {'muxer': 'mpegts', 'ext': 'ts', 'options': None},
+    'fmp4': {'muxer': 'mp4', 'ext': 'mp4', 'options': 'movflags=+frag_keyframe+empty_moov+default_base_moof'},
+}
+
+# Buffer di copia: un segmento viene scritto sulla SD in blocchi grandi e sequenziali
+COPY_BUFFER_SIZE = 1024 * 1024
+# Controllo periodico della quota di età anche senza segmenti nuovi (secondi)
+RETENTION_INTERVAL = 60
+
+DEFAULT_RECORDING_CONFIG = {
+    'enabled': False,
+    'path': '',
+    'staging_dir': '/dev/shm/videostreamer_rec',
+    'segment_seconds': 60,
+    'format': 'mpegts',
+    'max_size_mb': 2048,
+    'max_age_hours': 72
+}
+
+
+class SegmentRecorder:
+    """
+    Registratore a segmenti con retention ad anello.
+
+    FFmpeg legge lo stream da MediaMTX come un qualsiasi lettore (la pipeline live
+    non viene mai rallentata) e scrive i segmenti in una cartella di staging in RAM.
+    Ogni segmento completato viene poi spostato sulla SD con una sola scrittura
+    sequenziale e aggiunto all'indice.
+    """
+
+    def __init__(self, source_url, config):
+        self.source_url = source_url
+        self.config = dict(DEFAULT_RECORDING_CONFIG, **config)
+        self.path = self.config['path']
+        self.staging_dir = self._choose_staging_dir()
+        self.format = SEGMENT_FORMATS.get(self.config['format'], SEGMENT_FORMATS['mpegts'])
+        self.index_file = os.path.join(self.path, 'index.json')
+        self.segments = []
+        self.restarts = 0
+        self.last_error = None
+        # Anello di log (proclogs.LogRing) per l'output di FFmpeg, opzionale
+        self.log = None
+        self._process = None
+        self._started_at = 0
+        self._list_offset = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _choose_staging_dir(self):
+        """Staging in RAM se disponibile, altrimenti una sottocartella della destinazione"""
+        staging = self.config.get('staging_dir') or ''
+        parent = os.path.dirname(staging.rstrip('/'))
+        if staging and os.path.isdir(parent):
+            return staging
+        return os.path.join(self.path, '.staging')
+
+    # ------------------------------------------------------------------
+    # Ciclo di vita
+    # ------------------------------------------------------------------
+
+    def start(self):
+        os.makedirs(self.path, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        # Segmenti parziali di una sessione precedente: non recuperabili
+        for name in os.listdir(self.staging_dir):
+            try:
+                os.remove(os.path.join(self.staging_dir, name))
+            except OSError:
+                pass
+        self._load_index()
+        # Segmenti scaduti mentre il registratore era fermo
+        if self._apply_retention():
+            self._save_index()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self._thread.start()
+        print(f"[REC] ▶️  Registrazione avviata in {self.path} (staging: {self.staging_dir})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=15)
+        print("[REC] ⏹️  Registrazione fermata")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def command(self):
+        segment_pattern = os.path.join(self.staging_dir, f"%Y%m%d_%H%M%S.{self.format['ext']}")
+        cmd = []
+        # Priorità I/O e CPU minime: la registrazione cede sempre il passo al live
+        if shutil.which('ionice'):
+            cmd += ['ionice', '-c3']
+        cmd += ['nice', '-n', '10', 'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+                '-rtsp_transport', 'tcp',
+                '-i', self.source_url,
+                '-map', '0', '-c', 'copy',
+                '-f', 'segment',
+                '-segment_time', str(int(self.config['segment_seconds'])),
+                '-segment_format', self.format['muxer']]
+        if self.format['options']:
+            cmd += ['-segment_format_options', self.format['options']]
+        cmd += ['-reset_timestamps', '1',
+                '-strftime', '1',
+                '-segment_list', os.path.join(self.staging_dir, 'segments.csv'),
+                '-segment_list_type', 'csv',
+                segment_pattern]
+        return cmd
+
+    def _run(self):
+        retry = 1
+        retention_at = time.monotonic() + RETENTION_INTERVAL
+        while not self._stop.is_set():
+            if self._process is None or self._process.poll() is not None:
+                if self._process is not None:
+                    self.restarts += 1
+                    self.last_error = f"FFmpeg terminato (codice {self._process.returncode})"
+                    if self.log is not None and self.log.summary(1):
+                        self.last_error += f": {self.log.summary(1)}"
+                    print(f"[REC] ⚠️  {self.last_error}, riavvio tra {retry}s")
+                    self._stop.wait(retry)
+                    retry = min(retry * 2, 30)
+                    if self._stop.is_set():
+                        break
+                self._spawn()
+            elif time.time() - self._started_at > 10:
+                retry = 1
+            self._collect_segments()
+            if time.monotonic() >= retention_at:
+                # Stream fermo o FFmpeg bloccato: niente segmenti nuovi, ma la quota di età vale
+                retention_at = time.monotonic() + RETENTION_INTERVAL
+                if self._apply_retention():
+                    self._save_index()
+            self._stop.wait(2)
+
+        self._terminate()
+        self._collect_segments()
+        self._sweep_staging()
+        if self._apply_retention():
+            self._save_index()
+
+    def enforce_retention(self):
+        """Applica la quota ai segmenti dell'indice a registratore fermo; ritorna quanti ne rimuove"""
+        if not os.path.isdir(self.path):
+            return 0
+        self._load_index()
+        removed = self._apply_retention()
+        if removed:
+            self._save_index()
+        return removed
+
+    def _spawn(self):
+        # L'FFmpeg precedente può aver chiuso un ultimo segmento: va spostato prima di perdere la lista
+        self._collect_segments()
+        self._sweep_staging()
+        self._list_offset = 0
+        list_file = os.path.join(self.staging_dir, 'segments.csv')
+        if os.path.exists(list_file):
+            os.remove(list_file)
+        self._started_at = time.time()
+        output = subprocess.PIPE if self.log is not None else subprocess.DEVNULL
+        self._process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=output
+        )
+        if self.log is not None:
+            proclogs.attach(self._process, self.log, 'ffmpeg')
+
+    def _sweep_staging(self):
+        """
+        Cancella dallo staging i segmenti non elencati da FFmpeg (parziali di un processo
+        terminato): con FFmpeg fermo nessuno è il segmento in scrittura, e in RAM
+        resterebbero fuori dalla quota
+        """
+        for name in os.listdir(self.staging_dir):
+            if name == 'segments.csv':
+                continue
+            try:
+                os.remove(os.path.join(self.staging_dir, name))
+                print(f"[REC] 🗑️  Segmento parziale scartato dallo staging: {name}")
+            except OSError:
+                pass
+
+    def _terminate(self):
+        if self._process is None:
+            return
+        try:
+            # SIGTERM: FFmpeg chiude il segmento corrente e aggiorna la lista
+            self._process.terminate()
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    # ------------------------------------------------------------------
+    # Segmenti, indice e retention
+    # ------------------------------------------------------------------
+
+    def _collect_segments(self):
+        """Sposta sulla SD i segmenti completati elencati da FFmpeg e applica la quota"""
+        list_file = os.path.join(self.staging_dir, 'segments.csv')
+        if not os.path.exists(list_file):
+            return
+        with open(list_file, 'rb') as f:
+            f.seek(self._list_offset)
+            data = f.read()
+        # Solo righe complete: FFmpeg potrebbe essere a metà scrittura
+        data = data[:data.rfind(b'\n') + 1]
+        if not data:
+            return
+        self._list_offset += len(data)
+
+        changed = False
+        for row in csv.reader(data.decode(errors='replace').splitlines()):
+            if len(row) < 3:
+                continue
+            name = os.path.basename(row[0])
+            try:
+                duration = float(row[2]) - float(row[1])
+            except ValueError:
+                duration = 0.0
+            entry = self._move_segment(name, duration)
+            if entry is not None:
+                with self._lock:
+                    self.segments.append(entry)
+                changed = True
+
+        if changed:
+            self._apply_retention()
+            self._save_index()
+
+    def _move_segment(self, name, duration):
+        src = os.path.join(self.staging_dir, name)
+        dst = os.path.join(self.path, name)
+        if not os.path.exists(src):
+            return None
+        try:
+            if os.stat(src).st_dev == os.stat(self.path).st_dev:
+                os.replace(src, dst)
+            else:
+                with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+                    shutil.copyfileobj(fin, fout, COPY_BUFFER_SIZE)
+                    fout.flush()
+                    os.fsync(fout.fileno())
+                os.remove(src)
+        except OSError as e:
+            self.last_error = f"Errore spostamento {name}: {e}"
+            print(f"[REC] ❌ {self.last_error}")
+            return None
+
+        try:
+            start = time.mktime(time.strptime(os.path.splitext(name)[0], '%Y%m%d_%H%M%S'))
+        except ValueError:
+            start = os.path.getmtime(dst) - duration
+        return {
+            'file': name,
+            'start': start,
+            'duration': round(duration, 3),
+            'size': os.path.getsize(dst),
+            'format': self.config['format']
+        }
+
+    def _apply_retention(self):
+        """Cancella i segmenti più vecchi oltre la quota di spazio o di età; ritorna quanti"""
+        removed = 0
+        max_bytes = int(self.config['max_size_mb']) * 1024 * 1024
+        max_age = float(self.config['max_age_hours']) * 3600
+        now = time.time()
+        with self._lock:
+            self.segments.sort(key=lambda s: s['start'])
+            total = sum(s['size'] for s in self.segments)
+            while self.segments and (
+                    (max_bytes > 0 and total > max_bytes)
+                    or (max_age > 0 and now - self.segments[0]['start'] > max_age)):
+                oldest = self.segments.pop(0)
+                total -= oldest['size']
+                removed += 1
+                try:
+                    os.remove(os.path.join(self.path, oldest['file']))
+                except OSError:
+                    pass
+                print(f"[REC] 🗑️  Segmento rimosso per quota: {oldest['file']}")
+        return removed
+
+    def _load_index(self):
+        segments = []
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    segments = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[REC] ⚠️  Indice non leggibile, ricostruito: {e}")
+        with self._lock:
+            self.segments = [
+                s for s in segments
+                if os.path.exists(os.path.join(self.path, s.get('file', '')))
+            ]
+
+    def _save_index(self):
+        tmp = self.index_file + '.tmp'
+        with self._lock:
+            data = list(self.segments)
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.index_file)
+
+    # ------------------------------------------------------------------
+    # Stato
+    # ------------------------------------------------------------------
+
+    def list_segments(self):
+        with self._lock:
+            return list(self.segments)
+
+    def status(self):
+        with self._lock:
+            total = sum(s['size'] for s in self.segments)
+            oldest = self.segments[0]['start'] if self.segments else None
+            newest = self.segments[-1]['start'] if self.segments else None
+            count = len(self.segments)
+        return {
+            'running': self.is_running(),
+            'recording': self._process is not None and self._process.poll() is None,
+            'segments': count,
+            'total_mb': round(total / (1024 * 1024), 1),
+            'oldest': oldest,
+            'newest': newest,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'config': self.config
+        }
+
+
+def load_segment_index(path):
+    """Legge l'indice dei segmenti senza un registratore attivo"""
+    index_file = os.path.join(path, 'index.json')
+    if not os.path.exists(index_file):
+        return []
+    try:
+        with open(index_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
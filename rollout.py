@@ -0,0 +1,190 @@
+"""
+Rollout di configurazione sulla flotta
+Invia lo stesso stato desiderato (formato di /api/state) a molti dispositivi in
+parallelo, con un limite di richieste contemporanee. Prima un dispositivo canary,
+poi gruppi successivi: i dispositivi già allineati (stessa impronta della
+configurazione) vengono saltati e, se in un gruppo gli stream non tornano pronti,
+il rollout si ferma prima di toccare i dispositivi restanti.
+"""
+
+import asyncio
+import time
+
+import reconcile
+from fleetclient import HttpError
+
+DEFAULT_ROLLOUT_OPTIONS = {
+    'canary': 1,            # dispositivi del primo gruppo
+    'batch_size': 10,       # dispositivi per gruppo dopo il canary
+    'parallel': 10,         # richieste contemporanee al massimo
+    'max_failures': 0,      # errori tollerati in un gruppo prima di fermarsi
+    'apply_timeout': 60,    # secondi per applicare lo stato su un dispositivo
+    'ready_timeout': 30     # secondi perché gli stream tornino a consegnare frame
+}
+
+STREAMS = ('mjpg', 'rtsp')
+
+
+def pending_changes(device_state, desired):
+    """
+    Componenti di desired che differiscono dallo stato riportato dal dispositivo
+    (GET /api/state), confrontando le impronte della configurazione e il flag running
+    """
+    state = device_state.get('state') or {}
+    hashes = device_state.get('hashes') or {}
+    changes = {}
+    for component, spec in desired.items():
+        current = dict(state.get(component) or {})
+        running = current.pop('running', False)
+        target = dict(current, **{k: v for k, v in spec.items() if k != 'running'})
+        current_hash = hashes.get(component) or reconcile.config_hash(current)
+        if reconcile.config_hash(target) != current_hash or spec.get('running', running) != running:
+            changes[component] = spec
+    return changes
+
+
+class DeviceResult:
+    """Esito del rollout su un dispositivo"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = 'pending'
+        self.components = []
+        self.actions = []
+        self.error = None
+        self.ms = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'components': self.components,
+            'actions': self.actions,
+            'error': self.error,
+            'ms': self.ms
+        }
+
+
+class FleetRollout:
+    """
+    Rollout a gruppi. session_factory(device) -> HostSession del dispositivo.
+    Stati finali: unchanged, planned (dry run), applied, failed, halted.
+    """
+
+    def __init__(self, devices, desired, session_factory, options=None, dry_run=False):
+        self.devices = devices
+        self.desired = desired
+        self.session_factory = session_factory
+        self.options = dict(DEFAULT_ROLLOUT_OPTIONS, **(options or {}))
+        self.dry_run = dry_run
+        self.results = [DeviceResult(d.get('name') or d['url']) for d in devices]
+        self.halted = False
+        self.total_ms = None
+
+    def batches(self):
+        """Indici dei dispositivi per gruppo: canary, poi gruppi di batch_size"""
+        indexes = list(range(len(self.devices)))
+        canary = max(0, int(self.options['canary']))
+        size = max(1, int(self.options['batch_size']))
+        groups = [indexes[:canary]] if canary else []
+        rest = indexes[canary:]
+        groups += [rest[i:i + size] for i in range(0, len(rest), size)]
+        return [group for group in groups if group]
+
+    async def run(self, on_result=None):
+        t_start = time.monotonic()
+        semaphore = asyncio.Semaphore(max(1, int(self.options['parallel'])))
+        for number, group in enumerate(self.batches()):
+            label = 'canary' if number == 0 and self.options['canary'] else f'gruppo {number}'
+            print(f"[ROLLOUT] ▶️  {label}: {len(group)} dispositivi")
+            await asyncio.gather(*(self._device(i, semaphore, on_result) for i in group))
+            failed = [self.results[i].name for i in group if self.results[i].status == 'failed']
+            remaining = [result for result in self.results if result.status == 'pending']
+            if len(failed) > int(self.options['max_failures']) and remaining:
+                print(f"[ROLLOUT] 🛑 {label}: {len(failed)} dispositivi non pronti ({', '.join(failed)}), rollout fermato")
+                self.halted = True
+                for result in remaining:
+                    result.status = 'halted'
+                break
+        self.total_ms = round((time.monotonic() - t_start) * 1000)
+        return self.report()
+
+    async def _device(self, index, semaphore, on_result):
+        result = self.results[index]
+        async with semaphore:
+            t0 = time.monotonic()
+            session = self.session_factory(self.devices[index])
+            try:
+                await self._apply(session, result)
+            except HttpError as e:
+                result.status = 'failed'
+                result.error = str(e)
+            finally:
+                await session.close()
+                result.ms = round((time.monotonic() - t0) * 1000)
+        if on_result is not None:
+            on_result(result)
+
+    async def _apply(self, session, result):
+        changes = pending_changes(await session.get_json('/api/state'), self.desired)
+        result.components = sorted(changes)
+        if not changes:
+            result.status = 'unchanged'
+            return
+        if self.dry_run:
+            plan = await session.post_json('/api/state?dry_run=1', changes)
+            result.actions = plan.get('changes', [])
+            result.status = 'planned'
+            return
+
+        response = await session.post_json('/api/state', changes, timeout=self.options['apply_timeout'])
+        result.actions = response.get('changes', [])
+        if not response.get('success'):
+            errors = [c['error'] for c in result.actions if c.get('error')]
+            result.status = 'failed'
+            result.error = errors[0] if errors else response.get('error', 'Stato non applicato')
+            return
+
+        ready, reason = await self._wait_ready(session, changes)
+        result.status = 'applied' if ready else 'failed'
+        result.error = reason
+
+    async def _wait_ready(self, session, changes):
+        """Attende che i componenti siano nello stato voluto e che gli stream consegnino frame"""
+        deadline = time.monotonic() + self.options['ready_timeout']
+        while True:
+            reason = await self._check_ready(session, changes)
+            if reason is None:
+                return True, None
+            if time.monotonic() >= deadline:
+                return False, f"Non pronto dopo {self.options['ready_timeout']}s: {reason}"
+            await asyncio.sleep(1)
+
+    async def _check_ready(self, session, changes):
+        """None se pronto, altrimenti il motivo"""
+        state = (await session.get_json('/api/state')).get('state') or {}
+        for component, spec in changes.items():
+            running = (state.get(component) or {}).get('running', False)
+            if 'running' in spec and spec['running'] != running:
+                return f"{component} {'fermo' if spec['running'] else 'ancora attivo'}"
+            if component in STREAMS and running:
+                try:
+                    response = await session.request('GET', f'/api/streams/{component}/snapshot.jpg')
+                except HttpError as e:
+                    return f'{component}: {e}'
+                if response.status != 200 or not response.headers.get('content-type', '').startswith('image/'):
+                    return f'{component} senza frame'
+        return None
+
+    def report(self):
+        counts = {}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return {
+            'success': not self.halted and not counts.get('failed'),
+            'halted': self.halted,
+            'dry_run': self.dry_run,
+            'total_ms': self.total_ms,
+            'counts': counts,
+            'devices': [result.to_dict() for result in self.results]
+        }
@@ -0,0 +1,1260 @@
+// Gestione visibilità campi autenticazione MJPG
+document.getElementById('mjpg-auth-enabled').addEventListener('change', function() {
+    const fields = document.getElementById('mjpg-auth-fields');
+    fields.style.display = this.checked ? 'block' : 'none';
+});
+
+// Gestione visibilità campi autenticazione RTSP
+document.getElementById('rtsp-auth-enabled').addEventListener('change', function() {
+    const fields = document.getElementById('rtsp-auth-fields');
+    fields.style.display = this.checked ? 'block' : 'none';
+});
+
+// Gestione sorgente video MJPG
+document.querySelectorAll('input[name="mjpg-source"]').forEach(radio => {
+    radio.addEventListener('change', function() {
+        const deviceGroup = document.getElementById('mjpg-device-group');
+        const videoGroup = document.getElementById('mjpg-video-group');
+        const uploadSection = document.getElementById('mjpg-upload-section');
+        const sourceTypeInput = document.getElementById('mjpg-source-type');
+
+        if (this.value === 'device') {
+            deviceGroup.style.display = 'block';
+            videoGroup.style.display = 'none';
+            uploadSection.style.display = 'none';
+            sourceTypeInput.value = 'device';
+        } else {
+            deviceGroup.style.display = 'none';
+            videoGroup.style.display = 'block';
+            uploadSection.style.display = 'block';
+            sourceTypeInput.value = 'video';
+            loadVideoList('mjpg');
+        }
+    });
+});
+
+// Gestione sorgente video RTSP
+document.querySelectorAll('input[name="rtsp-source"]').forEach(radio => {
+    radio.addEventListener('change', function() {
+        const deviceGroup = document.getElementById('rtsp-device-group');
+        const videoGroup = document.getElementById('rtsp-video-group');
+        const uploadSection = document.getElementById('rtsp-upload-section');
+        const sourceTypeInput = document.getElementById('rtsp-source-type');
+
+        if (this.value === 'device') {
+            deviceGroup.style.display = 'block';
+            videoGroup.style.display = 'none';
+            uploadSection.style.display = 'none';
+            sourceTypeInput.value = 'device';
+        } else {
+            deviceGroup.style.display = 'none';
+            videoGroup.style.display = 'block';
+            uploadSection.style.display = 'block';
+            sourceTypeInput.value = 'video';
+            loadVideoList('rtsp');
+        }
+    });
+});
+
+// Verifica del profilo RTSP con la calibrazione della scheda
+['device', 'resolution', 'framerate', 'video_file'].forEach(name => {
+    document.getElementById('rtsp-form').elements[name].addEventListener('change', checkRTSPProfile);
+});
+document.querySelectorAll('input[name="rtsp-source"]').forEach(radio => {
+    radio.addEventListener('change', checkRTSPProfile);
+});
+
+// Gestione modalità IP (DHCP/Statico)
+document.querySelectorAll('input[name="ip-mode"]').forEach(radio => {
+    radio.addEventListener('change', function() {
+        const staticSection = document.getElementById('static-ip-section');
+        const dhcpSection = document.getElementById('dhcp-section');
+
+        if (this.value === 'static') {
+            staticSection.style.display = 'block';
+            dhcpSection.style.display = 'none';
+        } else {
+            staticSection.style.display = 'none';
+            dhcpSection.style.display = 'block';
+        }
+    });
+});
+
+// Funzioni di gestione rete
+function changeHostname() {
+    const hostnameInput = document.getElementById('hostname-input');
+    const newHostname = hostnameInput.value.trim();
+
+    if (!newHostname) {
+        showNotification('Inserisci un hostname valido', 'error');
+        return;
+    }
+
+    if (!/^[a-z0-9-]{1,63}$/i.test(newHostname)) {
+        showNotification('Hostname non valido. Usa solo lettere, numeri e trattini', 'error');
+        return;
+    }
+
+    showNotification('Cambio hostname in corso...', 'warning');
+
+    const formData = new FormData();
+    formData.append('hostname', newHostname);
+
+    fetch('/api/network/hostname', {
+        method: 'POST',
+        body: formData
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ Hostname cambiato con successo!', 'success');
+            hostnameInput.value = '';
+            setTimeout(() => {
+                showNotification('⚠️ Collegati di nuovo al dispositivo con il nuovo nome', 'warning');
+            }, 1500);
+        } else {
+            showNotification('Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    });
+}
+
+// Attende la fine di un'operazione in background avviata dal server
+function waitForJob(data, onProgress) {
+    if (!data.success || !data.job_id || !data.job) {
+        return Promise.resolve(data);
+    }
+    return new Promise((resolve, reject) => {
+        let lastMessage = null;
+        const poll = () => {
+            fetch('/api/jobs/' + data.job_id)
+                .then(r => r.json())
+                .then(res => {
+                    if (!res.success) {
+                        resolve(res);
+                        return;
+                    }
+                    const job = res.job;
+                    if (job.status === 'done') {
+                        resolve(Object.assign({ success: true }, job.result || {}));
+                    } else if (job.status === 'error') {
+                        resolve({ success: false, error: job.error });
+                    } else {
+                        if (onProgress && job.message !== lastMessage) {
+                            lastMessage = job.message;
+                            onProgress(job);
+                        }
+                        setTimeout(poll, 1000);
+                    }
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
+
+function showJobProgress(job) {
+    showNotification('⏳ ' + job.message + ' (' + job.progress + '%)', 'info');
+}
+
+function applyStaticIP() {
+    const interface = document.getElementById('network-interface').value;
+    const ip = document.getElementById('static-ip').value.trim();
+    const netmask = document.getElementById('netmask').value;
+    const gateway = document.getElementById('gateway-ip').value.trim();
+    const dns = document.getElementById('dns-servers').value.trim();
+
+    if (!ip || !gateway) {
+        showNotification('Compila i campi obbligatori', 'error');
+        return;
+    }
+
+    if (!confirm('ATTENZIONE!\n\nStai per cambiare l\'IP in: ' + ip + '\n\n1. La configurazione verrà applicata\n2. La pagina cercherà di riconnettersi al nuovo IP\n3. Se non si connette, accedi manualmente a: http://' + ip + '\n\nContinuare?')) {
+        return;
+    }
+
+    showNotification('⏳ Applicazione IP statico in corso... (non chiudere questa pagina)', 'warning');
+
+    const formData = new FormData();
+    formData.append('interface', interface);
+    formData.append('ip_address', ip);
+    formData.append('netmask', netmask);
+    formData.append('gateway', gateway);
+    formData.append('dns', dns);
+
+    fetch('/api/network/ip/static', {
+        method: 'POST',
+        body: formData,
+        timeout: 30000
+    })
+    .then(r => r.json())
+    .then(data => waitForJob(data, showJobProgress))
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ Configurazione applicata! Attendo il riavvio della rete... (10 secondi)', 'success');
+            closeNetworkModal();
+
+            // Aspetta 10 secondi prima di provare a riconnettersi
+            setTimeout(() => {
+                showNotification('🔄 Tentativo di riconnessione a: ' + ip, 'warning');
+                window.location.href = 'http://' + ip;
+            }, 10000);
+        } else {
+            showNotification('❌ Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => {
+        // Se c'è timeout o errore di rete, prova comunque a riconnettersi
+        showNotification('⚠️ Timeout connessione (normale). Riconessione in corso...', 'warning');
+        setTimeout(() => {
+            window.location.href = 'http://' + ip;
+        }, 8000);
+    });
+}
+
+function applyDHCP() {
+    const interface = document.getElementById('dhcp-interface').value;
+
+    if (!confirm('Attivare DHCP su ' + interface + '?\n\nIl dispositivo riceverà un IP automaticamente dal router.\nLa pagina si ricaricherà dopo 10 secondi.')) {
+        return;
+    }
+
+    showNotification('⏳ Attivazione DHCP in corso... (non chiudere questa pagina)', 'warning');
+
+    const formData = new FormData();
+    formData.append('interface', interface);
+
+    fetch('/api/network/ip/dhcp', {
+        method: 'POST',
+        body: formData,
+        timeout: 30000
+    })
+    .then(r => r.json())
+    .then(data => waitForJob(data, showJobProgress))
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ DHCP attivato! Attendo il riavvio della rete... (10 secondi)', 'success');
+            closeNetworkModal();
+
+            // Aspetta 10 secondi prima di ricaricare la pagina
+            setTimeout(() => {
+                showNotification('🔄 Ricaricamento pagina...', 'warning');
+                window.location.reload();
+            }, 10000);
+        } else {
+            showNotification('❌ Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => {
+        // Se c'è timeout, riprova comunque a ricaricare
+        showNotification('⚠️ Timeout connessione (normale). Ricaricamento in corso...', 'warning');
+        setTimeout(() => {
+            window.location.reload();
+        }, 8000);
+    });
+}
+
+// Carica lista video
+function loadVideoList(type, selectedPath = null) {
+    console.log('[DEBUG] loadVideoList called for type:', type);
+    fetch('/api/videos/list')
+        .then(r => {
+            console.log('[DEBUG] Response status:', r.status);
+            if (!r.ok) {
+                throw new Error('HTTP ' + r.status);
+            }
+            return r.json();
+        })
+        .then(data => {
+            console.log('[DEBUG] Videos loaded:', data);
+            const select = document.getElementById(`${type}-video-file`);
+            const list = document.getElementById(`${type}-video-list`);
+
+            if (!select || !list) {
+                console.error('[ERROR] Elements not found:', { select, list });
+                return;
+            }
+
+            // Aggiorna select
+            select.innerHTML = '<option value="">Seleziona un video...</option>';
+            data.videos.forEach(video => {
+                const option = document.createElement('option');
+                option.value = video.path;
+                option.textContent = video.name;
+                select.appendChild(option);
+            });
+
+            // Se ho un path salvato, selezionalo
+            if (selectedPath) {
+                select.value = selectedPath;
+            }
+
+            // Aggiorna lista
+            list.innerHTML = '';
+            data.videos.forEach(video => {
+                const item = document.createElement('div');
+                item.className = 'video-item';
+                item.innerHTML = `
+                    <span>🎬 ${video.name} (${video.size})</span>
+                    <button onclick="deleteVideo('${video.name}')" style="background:#ef4444;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;">🗑️</button>
+                `;
+                list.appendChild(item);
+            });
+        })
+        .catch(err => {
+            console.error('[ERROR] loadVideoList failed:', err);
+            showNotification('Errore caricamento video: ' + err, 'error');
+        });
+}
+
+// Upload video
+function uploadVideo(type) {
+    const fileInput = document.getElementById(`${type}-video-upload`);
+    const file = fileInput.files[0];
+
+    if (!file) {
+        showNotification('Seleziona un file video', 'error');
+        return;
+    }
+
+    const formData = new FormData();
+    formData.append('video', file);
+
+    showNotification('Caricamento in corso... (' + file.name + ')', 'success');
+    console.log('[DEBUG] Caricamento video:', file.name, 'Size:', file.size);
+
+    fetch('/api/videos/upload', {
+        method: 'POST',
+        body: formData
+    })
+    .then(r => {
+        console.log('[DEBUG] Response status:', r.status);
+        return r.json();
+    })
+    .then(data => {
+        console.log('[DEBUG] Upload response:', data);
+        if (data.success) {
+            showNotification('Video caricato con successo!', 'success');
+            fileInput.value = '';
+            loadVideoList(type);
+        } else {
+            showNotification('Errore: ' + data.error, 'error');
+        }
+    })
+    .catch(err => {
+        console.error('[ERROR] Upload failed:', err);
+        showNotification('Errore caricamento: ' + err.message, 'error');
+    });
+}
+
+// Elimina video
+function deleteVideo(filename) {
+    if (!confirm(`Eliminare il video "${filename}"?`)) return;
+
+    fetch('/api/videos/delete', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: filename})
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('Video eliminato', 'success');
+            loadVideoList('mjpg');
+            loadVideoList('rtsp');
+        } else {
+            showNotification('Errore: ' + data.error, 'error');
+        }
+    });
+}
+
+// Riavvia il servizio stream-manager
+function restartService() {
+    if (!confirm('Riavviare il servizio stream-manager? Questo fermerà temporaneamente tutti gli stream.')) return;
+
+    showNotification('Riavvio servizio in corso...', 'warning');
+
+    fetch('/api/service/restart', {
+        method: 'POST'
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('Servizio riavviato con successo! Ricarica la pagina tra 5 secondi...', 'success');
+            setTimeout(() => {
+                window.location.reload();
+            }, 5000);
+        } else {
+            showNotification('Errore nel riavvio: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('Errore: ' + err.message, 'error'));
+}
+
+function rebootSystem() {
+    if (!confirm('⚠️ ATTENZIONE!\n\nStai per riavviare il dispositivo.\n\nTutti i servizi verranno interrotti.\n\nContinuare?')) {
+        return;
+    }
+
+    showNotification('🔌 Riavvio del dispositivo in corso... La connessione sarà persa.', 'warning');
+
+    fetch('/api/system/reboot', {
+        method: 'POST'
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ ' + data.message, 'success');
+            // Dopo 5 secondi, prova a ricaricare
+            setTimeout(() => {
+                window.location.reload();
+            }, 10000);
+        } else {
+            showNotification('❌ Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('⚠️ Riavvio in corso... La pagina si ricaricherà automaticamente.', 'warning'));
+}
+
+
+// Riavvia solo MJPG
+function restartMJPG() {
+    stopMJPG();
+    setTimeout(() => {
+        startMJPG();
+    }, 1000);
+}
+
+// Riavvia solo RTSP
+function restartRTSP() {
+    stopRTSP();
+    setTimeout(() => {
+        startRTSP();
+    }, 1000);
+}
+
+// Aggiorna lo stato ogni 2 secondi
+setInterval(updateStatus, 2000);
+updateStatus();
+
+function updateStatus() {
+    fetch('/api/status')
+        .then(r => r.json())
+        .then(data => {
+            // Aggiorna badge status
+            updateBadge('mjpg-status', data.mjpg_running);
+            updateBadge('rtsp-status', data.rtsp_running);
+
+            // Aggiorna info di sistema
+            document.getElementById('cpu').textContent = data.system.cpu.toFixed(1) + '%';
+            document.getElementById('memory').textContent = data.system.memory.toFixed(1) + '%';
+            document.getElementById('temp').textContent = data.system.temperature.toFixed(1) + '°C';
+
+            // Aggiorna URL
+            const hostname = window.location.hostname;
+            const mjpgUrl = data.on_demand && data.on_demand.mjpg
+                ? `${window.location.origin}/api/streams/mjpg/stream.mjpg`
+                : `http://${hostname}:${data.config.mjpg.port}/?action=stream`;
+            const rtspUrl = `rtsp://${hostname}:${data.config.rtsp.port}/video`;
+
+            // Aggiorna link MJPG
+            const mjpgLink = document.getElementById('mjpg-url-link');
+            mjpgLink.href = mjpgUrl;
+            mjpgLink.textContent = mjpgUrl;
+
+            // Aggiorna link RTSP (copiar sul click)
+            const rtspLink = document.getElementById('rtsp-url-link');
+            rtspLink.textContent = rtspUrl;
+
+            if (data.rtsp_running) {
+                updateRTSPReaders();
+            } else {
+                document.getElementById('rtsp-readers').style.display = 'none';
+            }
+        });
+}
+
+function updateRTSPReaders() {
+    fetch('/api/rtsp/readers')
+        .then(r => r.json())
+        .then(data => {
+            const el = document.getElementById('rtsp-readers');
+            if (!data.success) {
+                el.style.display = 'none';
+                return;
+            }
+            const t = data.transports;
+            let text = `👥 Lettori: ${data.readers.length} (UDP ${t.udp} · multicast ${t.multicast} · TCP ${t.tcp})`
+                + ` • flussi in uscita: ${data.copies}`;
+            if (data.uplink_kbps !== null) {
+                text += ` • traffico in uscita${data.uplink_interface ? ' (' + data.uplink_interface + ')' : ''}: ${data.uplink_kbps} kbps`;
+            }
+            el.textContent = text;
+            el.style.display = 'block';
+        })
+        .catch(() => {});
+}
+
+function updateBadge(id, running) {
+    const badge = document.getElementById(id);
+    if (running) {
+        badge.textContent = 'In Esecuzione';
+        badge.className = 'status-badge status-running';
+    } else {
+        badge.textContent = 'Fermo';
+        badge.className = 'status-badge status-stopped';
+    }
+}
+
+function showNotification(message, type) {
+    const notif = document.getElementById('notification');
+    notif.textContent = message;
+    notif.className = `notification ${type}`;
+    notif.style.display = 'block';
+    setTimeout(() => notif.style.display = 'none', 3000);
+}
+
+function startMJPG() {
+    const form = document.getElementById('mjpg-form');
+    const data = new FormData(form);
+
+    // Aggiungi tipo sorgente (usa set per evitare duplicati)
+    const sourceType = document.querySelector('input[name="mjpg-source"]:checked').value;
+    data.set('source_type', sourceType);
+
+    // Se la sorgente è video, assicura che video_file sia presente
+    if (sourceType === 'video') {
+        const videoFile = document.getElementById('mjpg-video-file').value;
+        if (!videoFile) {
+            showNotification('Seleziona un video prima di avviare!', 'error');
+            return;
+        }
+        data.set('video_file', videoFile);
+    }
+
+    fetch('/api/mjpg/start', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(result => {
+        if (result.success) {
+            showNotification('✅ MJPG Streamer avviato!', 'success');
+            updateStatus();
+        } else {
+            showNotification('❌ Errore: ' + (result.error || 'Sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('❌ Errore di connessione: ' + err, 'error'));
+}
+
+function stopMJPG() {
+    fetch('/api/mjpg/stop', { method: 'POST' })
+        .then(r => r.json())
+        .then(data => {
+            showNotification('MJPG Streamer fermato', 'success');
+            updateStatus();
+        });
+}
+
+function saveMJPGConfig() {
+    const form = document.getElementById('mjpg-form');
+    const data = new FormData(form);
+
+    // Aggiungi tipo sorgente
+    const sourceType = document.querySelector('input[name="mjpg-source"]:checked').value;
+    data.set('source_type', sourceType);
+
+    // Se la sorgente è video, assicura che video_file sia presente
+    if (sourceType === 'video') {
+        const videoFile = document.getElementById('mjpg-video-file').value;
+        if (!videoFile) {
+            showNotification('Seleziona un video prima di salvare!', 'error');
+            return;
+        }
+        data.set('video_file', videoFile);
+    }
+
+    fetch('/api/mjpg/save', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(result => {
+        if (result.success) {
+            showNotification('Configurazione MJPG salvata!', 'success');
+        } else {
+            showNotification('Errore: ' + (result.error || 'Sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('Errore di connessione: ' + err, 'error'));
+}
+
+function checkRTSPProfile() {
+    const form = document.getElementById('rtsp-form');
+    const hint = document.getElementById('rtsp-profile-check');
+    const sourceType = document.querySelector('input[name="rtsp-source"]:checked').value;
+    if (sourceType === 'video') {
+        checkRTSPInputPlan();
+        return;
+    }
+    const params = new URLSearchParams({
+        device: form.elements['device'].value,
+        resolution: form.elements['resolution'].value,
+        framerate: form.elements['framerate'].value,
+        source_type: sourceType
+    });
+    fetch('/api/calibration/check?' + params)
+        .then(r => r.json())
+        .then(result => {
+            if (!result.success || !result.calibrated) {
+                hint.style.display = 'none';
+                return;
+            }
+            const best = result.suggestion ? ` (massimo consigliato ${result.suggestion.resolution} a ${result.suggestion.framerate} fps)` : '';
+            if (result.sustainable === false) {
+                hint.style.color = '#c0392b';
+                hint.textContent = '⚠️ Profilo non sostenibile su questa scheda: ' + result.reason + best;
+            } else if (result.sustainable === true) {
+                hint.style.color = '#27ae60';
+                hint.textContent = '✅ Profilo sostenibile secondo la calibrazione' + best;
+            } else {
+                hint.style.color = '#666';
+                hint.textContent = 'ℹ️ Profilo non provato dalla calibrazione' + best;
+            }
+            hint.style.display = 'block';
+        })
+        .catch(() => hint.style.display = 'none');
+}
+
+function checkRTSPInputPlan() {
+    const form = document.getElementById('rtsp-form');
+    const hint = document.getElementById('rtsp-profile-check');
+    const params = new URLSearchParams({
+        resolution: form.elements['resolution'].value,
+        framerate: form.elements['framerate'].value
+    });
+    const videoFile = document.getElementById('rtsp-video-file').value;
+    if (videoFile) params.set('video_file', videoFile);
+    fetch('/api/rtsp/plan?' + params)
+        .then(r => r.json())
+        .then(result => {
+            if (!result.success) {
+                hint.style.display = 'none';
+                return;
+            }
+            const labels = { copy: 'copia', transcode: 'ricodifica', drop: 'nessuno' };
+            const step = s => labels[s.action] + (s.reason ? ` (${s.reason})` : '');
+            const plan = result.plan;
+            hint.style.color = plan.cost.level === 'alto' ? '#b7791f' : '#27ae60';
+            hint.textContent = `📋 ${result.video}: video ${step(plan.video)}, audio ${step(plan.audio)} • costo CPU ${plan.cost.level}`;
+            hint.style.display = 'block';
+        })
+        .catch(() => hint.style.display = 'none');
+}
+
+function calibrateRTSP() {
+    if (!confirm('La calibrazione prova i profili per qualche minuto e richiede lo stream fermo. Continuare?')) return;
+    const data = new FormData();
+    data.set('device', document.getElementById('rtsp-form').elements['device'].value);
+    fetch('/api/calibration/start', { method: 'POST', body: data })
+        .then(r => r.json())
+        .then(result => waitForJob(result, showJobProgress))
+        .then(result => {
+            if (!result.success) {
+                showNotification('❌ Calibrazione: ' + (result.error || 'Sconosciuto'), 'error');
+                return;
+            }
+            const best = result.calibration.best;
+            showNotification(best ? `✅ Calibrazione completata: massimo ${best.resolution} a ${best.framerate} fps`
+                                  : '⚠️ Nessun profilo sostenibile trovato', best ? 'success' : 'error');
+            checkRTSPProfile();
+        })
+        .catch(err => showNotification('❌ Errore di connessione: ' + err, 'error'));
+}
+
+function startRTSP(force = false) {
+    const form = document.getElementById('rtsp-form');
+    const data = new FormData(form);
+
+    // Aggiungi tipo sorgente (usa set per evitare duplicati)
+    const sourceType = document.querySelector('input[name="rtsp-source"]:checked').value;
+    data.set('source_type', sourceType);
+
+    // Se la sorgente è video, assicura che video_file sia presente
+    if (sourceType === 'video') {
+        const videoFile = document.getElementById('rtsp-video-file').value;
+        if (!videoFile) {
+            showNotification('Seleziona un video prima di avviare!', 'error');
+            return;
+        }
+        data.set('video_file', videoFile);
+    }
+    if (force) data.set('force', 'on');
+
+    fetch('/api/rtsp/start', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(result => {
+        if (result.success) {
+            showNotification('✅ Stream RTSP avviato!', 'success');
+            updateStatus();
+        } else if (result.profile && !force) {
+            // Profilo oltre le capacità misurate: si avvia solo su conferma
+            if (confirm(result.error + '\n\nAvviare comunque?')) startRTSP(true);
+        } else {
+            showNotification('❌ Errore: ' + (result.error || 'Sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('❌ Errore di connessione: ' + err, 'error'));
+}
+
+function stopRTSP() {
+    fetch('/api/rtsp/stop', { method: 'POST' })
+        .then(r => r.json())
+        .then(data => {
+            showNotification('Stream RTSP fermato', 'success');
+            updateStatus();
+        });
+}
+
+function saveRTSPConfig() {
+    const form = document.getElementById('rtsp-form');
+    const data = new FormData(form);
+
+    // Aggiungi tipo sorgente
+    const sourceType = document.querySelector('input[name="rtsp-source"]:checked').value;
+    data.set('source_type', sourceType);
+
+    // Se la sorgente è video, assicura che video_file sia presente
+    if (sourceType === 'video') {
+        const videoFile = document.getElementById('rtsp-video-file').value;
+        if (!videoFile) {
+            showNotification('Seleziona un video prima di salvare!', 'error');
+            return;
+        }
+        data.set('video_file', videoFile);
+    }
+
+    fetch('/api/rtsp/save', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(result => {
+        if (result.success && result.warning) {
+            showNotification('⚠️ Salvata, ma: ' + result.warning, 'error');
+        } else if (result.success) {
+            showNotification('Configurazione RTSP salvata!', 'success');
+        } else {
+            showNotification('Errore: ' + (result.error || 'Sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('Errore di connessione: ' + err, 'error'));
+}
+
+function updateRecordingStatus() {
+    fetch('/api/recording/status')
+        .then(r => r.json())
+        .then(data => {
+            if (!data.success) return;
+            updateBadge('recording-status', data.recording);
+            let summary = `${data.segments} segmenti • ${data.total_mb} MB`;
+            if (data.last_error) {
+                summary += ` • ⚠️ ${data.last_error}`;
+            }
+            document.getElementById('recording-summary').textContent = summary;
+        });
+}
+
+function loadRecordingConfig() {
+    fetch('/api/recording/status')
+        .then(r => r.json())
+        .then(data => {
+            if (!data.success) return;
+            const config = data.config;
+            document.getElementById('recording-format').value = config.format || 'mpegts';
+            document.getElementById('recording-segment-seconds').value = config.segment_seconds || 60;
+            document.getElementById('recording-max-size').value = config.max_size_mb;
+            document.getElementById('recording-max-age').value = config.max_age_hours;
+            document.getElementById('recording-enabled').checked = config.enabled || false;
+        });
+}
+
+function startRecording() {
+    fetch('/api/recording/start', { method: 'POST' })
+        .then(r => r.json())
+        .then(result => {
+            if (result.success) {
+                showNotification('✅ Registrazione avviata!', 'success');
+                setTimeout(updateRecordingStatus, 2000);
+            } else {
+                showNotification('❌ Errore: ' + (result.error || 'Sconosciuto'), 'error');
+            }
+        })
+        .catch(err => showNotification('❌ Errore di connessione: ' + err, 'error'));
+}
+
+function stopRecording() {
+    fetch('/api/recording/stop', { method: 'POST' })
+        .then(r => r.json())
+        .then(data => {
+            showNotification('Registrazione fermata', 'success');
+            updateRecordingStatus();
+        });
+}
+
+function saveRecordingConfig() {
+    const data = new FormData(document.getElementById('recording-form'));
+    fetch('/api/recording/save', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(result => {
+        if (result.success) {
+            showNotification('Configurazione registrazione salvata!', 'success');
+        } else {
+            showNotification('Errore: ' + (result.error || 'Sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('Errore di connessione: ' + err, 'error'));
+}
+
+setInterval(updateRecordingStatus, 10000);
+updateRecordingStatus();
+loadRecordingConfig();
+
+function scanWiFiNetworks() {
+    showNotification('🔍 Scansione reti WiFi in corso...', 'info');
+
+    fetch('/api/wifi/scan')
+        .then(r => r.json())
+        .then(data => waitForJob(data, showJobProgress))
+        .then(data => {
+            if (data.success && data.networks.length > 0) {
+                const container = document.getElementById('wifi-networks-container');
+                const list = document.getElementById('wifi-list');
+
+                let html = '';
+                data.networks.forEach(net => {
+                    html += `
+                        <div style="padding: 10px; border-bottom: 1px solid #e0e7ff; cursor: pointer; border-radius: 4px; margin-bottom: 5px; background: #f8fafc; transition: background 0.2s;" 
+                             onmouseover="this.style.background='#e0f2fe'" 
+                             onmouseout="this.style.background='#f8fafc'"
+                             onclick="selectWiFiNetwork('${net.ssid.replace(/'/g, "\\'")}')">
+                            <div style="display: flex; justify-content: space-between; align-items: center;">
+                                <strong style="color: #0c4a6e;">${net.ssid}</strong>
+                                <span style="color: #64748b; font-size: 0.85em;">${net.security ? '🔒 ' : ''}${net.signal}% · ${net.band}</span>
+                            </div>
+                        </div>
+                    `;
+                });
+
+                list.innerHTML = html;
+                container.style.display = 'block';
+                showNotification('✅ Trovate ' + data.networks.length + ' reti WiFi', 'success');
+            } else {
+                showNotification('⚠️ Nessuna rete WiFi trovata', 'warning');
+            }
+        })
+        .catch(err => showNotification('❌ Errore scansione: ' + err, 'error'));
+}
+
+function selectWiFiNetwork(ssid) {
+    document.getElementById('wifi-ssid').value = ssid;
+    document.getElementById('wifi-password').focus();
+    showNotification('✅ SSID selezionato: ' + ssid, 'success');
+}
+
+function connectToWiFi() {
+    const ssid = document.getElementById('wifi-ssid').value.trim();
+    const password = document.getElementById('wifi-password').value.trim();
+
+    if (!ssid) {
+        showNotification('❌ SSID non specificato', 'error');
+        return;
+    }
+
+    if (!confirm('Connettere a "' + ssid + '"?\nLa connessione potrebbe interrompersi.')) {
+        return;
+    }
+
+    showNotification('⏳ Connessione a "' + ssid + '" in corso...', 'warning');
+
+    const formData = new FormData();
+    formData.append('ssid', ssid);
+    formData.append('password', password);
+    formData.append('interface', 'wlan0');
+
+    fetch('/api/wifi/connect', {
+        method: 'POST',
+        body: formData
+    })
+    .then(r => r.json())
+    .then(data => waitForJob(data, showJobProgress))
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ ' + data.message + '\nRiconnessione in corso...', 'success');
+
+            // Tenta riconnessione dopo alcuni secondi
+            setTimeout(() => {
+                window.location.reload();
+            }, 8000);
+        } else {
+            showNotification('❌ Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('⚠️ Timeout (normale). Verifica la connessione...', 'warning'));
+}
+
+function forgetAllWiFiNetworks() {
+    if (!confirm('⚠️ ATTENZIONE!\n\nStai per cancellare TUTTE le reti WiFi salvate.\n\nSe non sei connesso via Ethernet, perderai la connessione.\n\nContinuare?')) {
+        return;
+    }
+
+    showNotification('🗑️ Cancellazione reti WiFi...', 'warning');
+
+    fetch('/api/wifi/forget-all', {
+        method: 'POST'
+    })
+    .then(r => r.json())
+    .then(data => {
+        if (data.success) {
+            showNotification('✅ ' + data.message, 'success');
+        } else {
+            showNotification('❌ Errore: ' + (data.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => showNotification('❌ Errore: ' + err.message, 'error'));
+}
+
+function openNetworkModal() {
+    document.getElementById('networkModal').style.display = 'block';
+    console.log('✅ Network Modal aperto');
+
+    // Carica la configurazione attuale della rete
+    fetch('/api/network/info')
+        .then(r => r.json())
+        .then(data => {
+            console.log('[DEBUG] Network info:', data);
+
+            if (data.success && data.network) {
+                const net = data.network;
+                const mode = net.mode || 'DHCP';
+                const currentIp = net.current_ip || 'N/A';
+                const staticIp = net.static_ip || '';
+                const gateway = net.gateway || '192.168.1.1';
+                const dns = net.dns || '8.8.8.8';
+                const iface = net.interface || 'wlan0';
+                const networkName = net.network_name || '--';
+
+                // Aggiorna i display informativi
+                document.getElementById('current-network-display').textContent = networkName;
+                document.getElementById('current-ip-display').textContent = currentIp;
+                document.getElementById('current-mode-display').textContent = mode === 'STATIC' ? 'IP Statico' : 'DHCP (Automatico)';
+                document.getElementById('current-gateway-display').textContent = gateway || '--';
+
+                // Aggiorna i radio button
+                if (mode === 'STATIC') {
+                    document.getElementById('ip-static').checked = true;
+                    document.getElementById('ip-dhcp').checked = false;
+                    document.getElementById('static-ip-section').style.display = 'block';
+                    document.getElementById('dhcp-section').style.display = 'none';
+                } else {
+                    document.getElementById('ip-dhcp').checked = true;
+                    document.getElementById('ip-static').checked = false;
+                    document.getElementById('dhcp-section').style.display = 'block';
+                    document.getElementById('static-ip-section').style.display = 'none';
+                }
+
+                // Popola i campi
+                document.getElementById('network-interface').value = iface;
+                document.getElementById('dhcp-interface').value = iface;
+                document.getElementById('static-ip').value = staticIp;
+                document.getElementById('gateway-ip').value = gateway;
+                document.getElementById('dns-servers').value = dns;
+
+                // Mostra log
+                console.log(`📱 IP Corrente: ${currentIp} | Modalità: ${mode}`);
+            } else {
+                console.error('[ERROR] Risposta non valida:', data);
+                document.getElementById('current-ip-display').textContent = 'Errore';
+                document.getElementById('current-mode-display').textContent = 'Errore';
+            }
+        })
+        .catch(err => {
+            console.error('[ERROR] Errore caricamento network info:', err);
+            document.getElementById('current-ip-display').textContent = 'Errore';
+            document.getElementById('current-mode-display').textContent = 'Errore';
+        });
+}
+
+function closeNetworkModal() {
+    document.getElementById('networkModal').style.display = 'none';
+}
+
+function openSecurityModal() {
+    document.getElementById('securityModal').style.display = 'block';
+    console.log('✅ Security Modal aperto');
+}
+
+function closeSecurityModal() {
+    document.getElementById('securityModal').style.display = 'none';
+}
+
+function saveSettings() {
+    const newUsername = document.getElementById('new-username').value.trim();
+    const newPassword = document.getElementById('new-password').value.trim();
+    const confirmPassword = document.getElementById('confirm-password').value.trim();
+    const disableAuth = document.getElementById('disable-auth').checked;
+
+    if (newPassword && newPassword !== confirmPassword) {
+        showNotification('Le password non corrispondono!', 'error');
+        return;
+    }
+
+    if (!newUsername && !newPassword && !disableAuth) {
+        showNotification('Inserisci almeno un campo da cambiare', 'info');
+        return;
+    }
+
+    const data = new FormData();
+    if (newUsername) data.append('new_username', newUsername);
+    if (newPassword) data.append('new_password', newPassword);
+    data.append('disable_auth', disableAuth ? 'true' : 'false');
+
+    fetch('/api/settings/save', {
+        method: 'POST',
+        body: data
+    })
+    .then(r => r.json())
+    .then(response => {
+        if (response.success) {
+            showNotification('Impostazioni salvate! Effettua nuovamente il login.', 'success');
+            setTimeout(() => {
+                window.location.href = '/logout';
+            }, 2000);
+        } else {
+            showNotification('Errore: ' + (response.error || 'Errore sconosciuto'), 'error');
+        }
+    })
+    .catch(err => {
+        showNotification('Errore di connessione: ' + err, 'error');
+    });
+}
+
+// Setup radio buttons per IP mode
+document.addEventListener('DOMContentLoaded', function() {
+    const ipDhcpRadio = document.getElementById('ip-dhcp');
+    const ipStaticRadio = document.getElementById('ip-static');
+    const dhcpSection = document.getElementById('dhcp-section');
+    const staticIpSection = document.getElementById('static-ip-section');
+
+    if (ipDhcpRadio && ipStaticRadio) {
+        ipDhcpRadio.addEventListener('change', function() {
+            if (this.checked) {
+                dhcpSection.style.display = 'block';
+                staticIpSection.style.display = 'none';
+            }
+        });
+
+        ipStaticRadio.addEventListener('change', function() {
+            if (this.checked) {
+                dhcpSection.style.display = 'none';
+                staticIpSection.style.display = 'block';
+            }
+        });
+    }
+
+    // Chiudi modal quando clicchi fuori
+    window.onclick = function(event) {
+        const networkModal = document.getElementById('networkModal');
+        const securityModal = document.getElementById('securityModal');
+        if (event.target == networkModal) {
+            networkModal.style.display = 'none';
+        }
+        if (event.target == securityModal) {
+            securityModal.style.display = 'none';
+        }
+    }
+});
+
+// Carica configurazione al caricamento pagina
+window.onload = function() {
+    // Carica hostname e aggiorna il titolo della pagina
+    fetch('/api/network/info')
+        .then(r => r.json())
+        .then(data => {
+            if (data.success && data.hostname) {
+                document.getElementById('page-title').textContent = `${data.hostname} - Video Stream Manager`;
+            }
+        })
+        .catch(err => console.log('Errore caricamento hostname:', err));
+
+    // Carica configurazione stream
+    fetch('/api/config')
+        .then(r => r.json())
+        .then(config => {
+            // Popola form MJPG
+            const mjpgForm = document.getElementById('mjpg-form');
+            mjpgForm.elements['device'].value = config.mjpg.device || '/dev/video0';
+            mjpgForm.elements['resolution'].value = config.mjpg.resolution || '640x480';
+            mjpgForm.elements['framerate'].value = config.mjpg.framerate || 15;
+            mjpgForm.elements['quality'].value = config.mjpg.quality || 85;
+            mjpgForm.elements['target_kbps'].value = config.mjpg.target_kbps || 0;
+            mjpgForm.elements['port'].value = config.mjpg.port || 8080;
+            document.getElementById('mjpg-autostart').checked = config.mjpg.autostart || false;
+            document.getElementById('mjpg-on-demand').checked = config.mjpg.on_demand || false;
+            document.getElementById('mjpg-on-demand-close-after').value = config.mjpg.on_demand_close_after || 10;
+
+            // Carica impostazioni autenticazione MJPG
+            const mjpgAuthEnabled = config.mjpg.auth_enabled !== false; // Default true
+            document.getElementById('mjpg-auth-enabled').checked = mjpgAuthEnabled;
+            document.getElementById('mjpg-auth-fields').style.display = mjpgAuthEnabled ? 'block' : 'none';
+            document.getElementById('mjpg-auth-username').value = config.mjpg.auth_username || 'stream';
+            document.getElementById('mjpg-auth-password').value = config.mjpg.auth_password || 'stream';
+
+            // Gestione sorgente MJPG
+            const mjpgSource = config.mjpg.source_type || 'device';
+            if (mjpgSource === 'video') {
+                document.getElementById('mjpg-source-video').checked = true;
+                document.getElementById('mjpg-device-group').style.display = 'none';
+                document.getElementById('mjpg-video-group').style.display = 'block';
+                document.getElementById('mjpg-upload-section').style.display = 'block';
+
+                const videoPath = config.mjpg.video_path || '';
+                loadVideoList('mjpg', videoPath);
+            } else {
+                document.getElementById('mjpg-source-device').checked = true;
+            }
+
+            // Popola form RTSP
+            const rtspForm = document.getElementById('rtsp-form');
+            rtspForm.elements['device'].value = config.rtsp.device || '/dev/video0';
+            rtspForm.elements['resolution'].value = config.rtsp.resolution || '640x480';
+            rtspForm.elements['framerate'].value = config.rtsp.framerate || 25;
+            rtspForm.elements['bitrate'].value = config.rtsp.bitrate || '1000k';
+            rtspForm.elements['port'].value = config.rtsp.port || 8554;
+            document.getElementById('rtsp-autostart').checked = config.rtsp.autostart || false;
+            document.getElementById('rtsp-on-demand').checked = config.rtsp.on_demand || false;
+            document.getElementById('rtsp-on-demand-close-after').value = config.rtsp.on_demand_close_after || 10;
+            const rtspTransports = config.rtsp.transports || ['udp', 'multicast', 'tcp'];
+            document.getElementById('rtsp-transport-udp').checked = rtspTransports.includes('udp');
+            document.getElementById('rtsp-transport-multicast').checked = rtspTransports.includes('multicast');
+            document.getElementById('rtsp-multicast-range').value = config.rtsp.multicast_ip_range || '224.1.0.0/16';
+            document.getElementById('rtsp-multicast-port').value = config.rtsp.multicast_rtp_port || 8002;
+
+            // Carica impostazioni autenticazione RTSP
+            const rtspAuthEnabled = config.rtsp.auth_enabled !== false; // Default true
+            document.getElementById('rtsp-auth-enabled').checked = rtspAuthEnabled;
+            document.getElementById('rtsp-auth-fields').style.display = rtspAuthEnabled ? 'block' : 'none';
+            document.getElementById('rtsp-auth-username').value = config.rtsp.auth_username || 'stream';
+            document.getElementById('rtsp-auth-password').value = config.rtsp.auth_password || 'stream';
+
+            // Gestione sorgente RTSP
+            const rtspSource = config.rtsp.source_type || 'device';
+            if (rtspSource === 'video') {
+                document.getElementById('rtsp-source-video').checked = true;
+                document.getElementById('rtsp-device-group').style.display = 'none';
+                document.getElementById('rtsp-video-group').style.display = 'block';
+                document.getElementById('rtsp-upload-section').style.display = 'block';
+
+                const videoPath = config.rtsp.video_path || '';
+                loadVideoList('rtsp', videoPath);
+            } else {
+                document.getElementById('rtsp-source-device').checked = true;
+            }
+            checkRTSPProfile();
+        })
+        .catch(err => {
+            console.error('Errore caricamento configurazione:', err);
+            showNotification('Errore nel caricamento della configurazione', 'error');
+        });
+
+    // Carica informazioni di rete
+    fetch('/api/network/info')
+        .then(r => r.json())
+        .then(data => {
+            if (data.success && data.hostname) {
+                document.getElementById('hostname-input').placeholder = `Attuale: ${data.hostname}`;
+                // Carica info IP se disponibili
+                if (data.network.current_ip) {
+                    console.log('IP attuale:', data.network.current_ip);
+                }
+            }
+        })
+        .catch(err => console.error('Errore caricamento info rete:', err));
+};
+
+function copyToClipboard(text) {
+    if (navigator.clipboard && navigator.clipboard.writeText) {
+        navigator.clipboard.writeText(text).then(() => {
+            showNotification('✅ URL copiato negli appunti!', 'success');
+        }).catch(err => {
+            console.error('Errore nella copia:', err);
+            fallbackCopy(text);
+        });
+    } else {
+        fallbackCopy(text);
+    }
+}
+
+function fallbackCopy(text) {
+    const textarea = document.createElement('textarea');
+    textarea.value = text;
+    document.body.appendChild(textarea);
+    textarea.select();
+    document.execCommand('copy');
+    document.body.removeChild(textarea);
+    showNotification('✅ URL copiato negli appunti!', 'success');
+}
+
+function copyMjpgUrl() {
+    const mjpgLink = document.getElementById('mjpg-url-link');
+    const text = mjpgLink.textContent;
+
+    if (navigator.clipboard && navigator.clipboard.writeText) {
+        navigator.clipboard.writeText(text).then(() => {
+            showNotification('✅ URL MJPG copiato negli appunti!', 'success');
+        }).catch(err => {
+            console.error('Errore nella copia:', err);
+            fallbackCopy(text);
+        });
+    } else {
+        fallbackCopy(text);
+    }
+    return false;
+}
+
+function copyRtspUrl() {
+    const rtspLink = document.getElementById('rtsp-url-link');
+    const text = rtspLink.textContent;
+
+    if (navigator.clipboard && navigator.clipboard.writeText) {
+        navigator.clipboard.writeText(text).then(() => {
+            showNotification('✅ URL RTSP copiato negli appunti!', 'success');
+        }).catch(err => {
+            console.error('Errore nella copia:', err);
+            fallbackCopy(text);
+        });
+    } else {
+        fallbackCopy(text);
+    }
+    return false;
+}
+
+// Event listener per copiare MJPG URL al click
+document.addEventListener('DOMContentLoaded', function() {
+    const mjpgUrlDiv = document.getElementById('mjpg-url');
+    if (mjpgUrlDiv) {
+        mjpgUrlDiv.addEventListener('click', function(e) {
+            if (e.target.tagName !== 'A') {
+                e.preventDefault();
+                const link = document.getElementById('mjpg-url-link');
+                copyToClipboard(link.textContent);
+            }
+        });
+    }
+});
@@ -0,0 +1,305 @@
+"""
+Watchdog degli stream bloccati
+Un processo può risultare "in esecuzione" mentre la telecamera non consegna nulla
+(calo di alimentazione USB, timeout v4l2) o ripete sempre lo stesso frame.
+Il watchdog campiona l'arrivo dei frame e un'impronta del loro contenuto dal
+buffer live di ogni pipeline e, se lo stream è fermo o congelato, esegue un
+recupero a livelli: riavvio della pipeline, reset della periferica USB, allarme.
+"""
+
+import json
+import threading
+import time
+import urllib.request
+import zlib
+
+DEFAULT_WATCHDOG_CONFIG = {
+    'enabled': True,
+    'interval': 5,             # secondi tra due controlli
+    'stall_frames': 30,        # stream fermo dopo N intervalli di frame senza frame nuovi...
+    'stall_keyframes': 3,      # ...o N intervalli tra keyframe (sonde che decodificano solo i keyframe)...
+    'min_stall_seconds': 5,    # ...e comunque non prima di questi secondi
+    'frozen_seconds': 30,      # frame identici byte per byte per questo tempo = congelato
+    'grace_seconds': 20,       # attesa dopo avvio o recupero prima di giudicare lo stream
+    'alert_retry_seconds': 300,  # dopo un allarme si riprova il recupero dopo questo tempo
+    'alert_url': ''            # webhook opzionale (POST JSON) per gli allarmi
+}
+
+# Livelli di recupero, in ordine
+RECOVERY_TIERS = ['restart', 'usb_reset', 'alert']
+
+
+def fingerprint(jpeg):
+    """Impronta economica del contenuto di un frame (CRC32 e dimensione)"""
+    return zlib.crc32(jpeg), len(jpeg)
+
+
+class StreamHealth:
+    """Stato e contatori del watchdog per uno stream"""
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.state = 'starting'
+        self.tier = 0
+        self.hold_until = 0
+        self.retry_at = 0
+        self.watch_started = time.time()
+        self.last_seq = None
+        self.last_fingerprint = None
+        self.fingerprint_since = None
+        self.content_changes = 0
+        self.frame_age = None
+        self.last_event = None
+        self.counters = {
+            'checks': 0,
+            'stalls': 0,
+            'frozen': 0,
+            'restarts': 0,
+            'usb_resets': 0,
+            'alerts': 0,
+            'recoveries': 0
+        }
+
+    def hold(self, seconds):
+        """Sospende il giudizio (pipeline appena avviata o recuperata)"""
+        self.hold_until = time.time() + seconds
+        self.watch_started = time.time()
+        self.last_seq = None
+        self.last_fingerprint = None
+        self.fingerprint_since = None
+        self.content_changes = 0
+
+    def event(self, kind, message):
+        self.last_event = {'type': kind, 'message': message, 'timestamp': time.time()}
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'tier': RECOVERY_TIERS[self.tier - 1] if self.tier else None,
+            'frame_age': round(self.frame_age, 1) if self.frame_age is not None else None,
+            'last_event': self.last_event,
+            'counters': dict(self.counters)
+        }
+
+
+class StreamWatchdog:
+    """
+    Thread che controlla periodicamente gli stream attivi.
+
+    targets() -> {stream_id: (frame_source, passive, config)} degli stream da controllare;
+    con passive=True il watchdog osserva il buffer senza tenere viva la lettura
+    (pipeline on-demand: non deve impedirne lo spegnimento per inattività).
+    Le sorgenti attive devono essere economiche (es. frames.KeyframeProbeSource):
+    il watchdog le tiene accese per tutto il tempo.
+    restart(stream_id) e reset_usb(stream_id) -> bool eseguono i recuperi.
+    """
+
+    def __init__(self, targets, restart, reset_usb, config=None):
+        self.targets = targets
+        self.restart = restart
+        self.reset_usb = reset_usb
+        self.config = dict(DEFAULT_WATCHDOG_CONFIG, **(config or {}))
+        self.health = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        self.config = dict(DEFAULT_WATCHDOG_CONFIG, **(config or {}))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='stream-watchdog', daemon=True)
+        self._thread.start()
+        print(f"[WATCHDOG] 👁️  Watchdog avviato (controllo ogni {self.config['interval']}s)")
+
+    def stop(self):
+        self._stop.set()
+
+    def grace(self, stream_id):
+        """Pipeline (ri)avviata: nuovo periodo di grazia prima del prossimo giudizio"""
+        with self._lock:
+            health = self.health.get(stream_id)
+            if health is not None:
+                health.hold(self.config['grace_seconds'])
+
+    def status(self):
+        with self._lock:
+            return {
+                'enabled': bool(self.config.get('enabled', True)),
+                'streams': {sid: health.to_dict() for sid, health in self.health.items()}
+            }
+
+    # ------------------------------------------------------------------
+    # Controllo
+    # ------------------------------------------------------------------
+
+    def _loop(self):
+        while not self._stop.wait(self.config['interval']):
+            if not self.config.get('enabled', True):
+                continue
+            try:
+                targets = self.targets()
+            except Exception as e:
+                print(f"[WATCHDOG] ⚠️  Elenco stream non disponibile: {e}")
+                continue
+            with self._lock:
+                for stream_id, health in self.health.items():
+                    if stream_id not in targets:
+                        # Stream fermato: i contatori restano consultabili
+                        health.state = 'stopped'
+                        health.tier = 0
+                        health.frame_age = None
+                        health.hold(self.config['grace_seconds'])
+            for stream_id, (source, passive, config) in targets.items():
+                try:
+                    self.check(stream_id, source, passive, config)
+                except Exception as e:
+                    print(f"[WATCHDOG] ⚠️  Errore controllo {stream_id}: {e}")
+
+    def _health(self, stream_id):
+        with self._lock:
+            health = self.health.get(stream_id)
+            if health is None:
+                health = StreamHealth(stream_id)
+                health.hold(self.config['grace_seconds'])
+                self.health[stream_id] = health
+            return health
+
+    def check(self, stream_id, source, passive, config):
+        """Un controllo: aggiorna lo stato e avvia il recupero se serve"""
+        health = self._health(stream_id)
+        now = time.time()
+        if passive:
+            if not source.is_running():
+                # Pipeline on-demand senza lettori: niente da giudicare
+                health.state = 'idle'
+                health.frame_age = None
+                health.hold(self.config['grace_seconds'])
+                return
+        else:
+            source.ensure_running()
+
+        health.counters['checks'] += 1
+        data, seq, timestamp = source.buffer.latest()
+        health.frame_age = now - timestamp if data is not None else None
+
+        if now < health.hold_until:
+            self._track(health, data, seq, now)
+            return
+
+        problem = self._diagnose(health, source, data, seq, timestamp, now)
+        if problem is None:
+            if health.tier and not health.content_changes:
+                # Dopo un recupero serve almeno un cambio di contenuto per dirlo riuscito
+                return
+            if health.tier:
+                health.counters['recoveries'] += 1
+                health.event('recovered', 'Stream ripristinato')
+                print(f"[WATCHDOG] ✅ {stream_id}: stream ripristinato")
+            health.tier = 0
+            health.state = 'ok'
+            return
+
+        kind, message = problem
+        if health.state == 'alert' and now < health.retry_at:
+            # Allarme già inviato: si attende prima di ricominciare i recuperi
+            return
+        if health.tier == 0:
+            # Nuovo incidente (i controlli dopo un recupero fallito non si contano di nuovo)
+            health.counters['stalls' if kind == 'stalled' else 'frozen'] += 1
+        print(f"[WATCHDOG] ⚠️  {stream_id}: {message}")
+        health.state = kind
+        self._recover(health, config, message)
+
+    def _track(self, health, data, seq, now):
+        """Aggiorna l'impronta dell'ultimo frame; ritorna True se è arrivato un frame nuovo"""
+        if data is None or seq == health.last_seq:
+            return False
+        health.last_seq = seq
+        fp = fingerprint(data)
+        if fp != health.last_fingerprint:
+            if health.last_fingerprint is not None:
+                health.content_changes += 1
+            health.last_fingerprint = fp
+            health.fingerprint_since = now
+        return True
+
+    def _diagnose(self, health, source, data, seq, timestamp, now):
+        """None se lo stream è sano, altrimenti (tipo, messaggio)"""
+        intervals = self.config['stall_keyframes'] if source.keyframes_only else self.config['stall_frames']
+        stall_limit = max(intervals * source.frame_interval, self.config['min_stall_seconds'])
+        self._track(health, data, seq, now)
+        if data is None:
+            if now - health.watch_started > stall_limit:
+                return 'stalled', f'nessun frame ricevuto in {now - health.watch_started:.0f}s'
+            return None
+        if now - timestamp > stall_limit:
+            return 'stalled', f'nessun frame nuovo da {now - timestamp:.0f}s'
+        if health.fingerprint_since is not None and now - health.fingerprint_since > self.config['frozen_seconds']:
+            return 'frozen', f'frame identici da {now - health.fingerprint_since:.0f}s'
+        return None
+
+    # ------------------------------------------------------------------
+    # Recupero a livelli
+    # ------------------------------------------------------------------
+
+    def _recover(self, health, config, reason):
+        stream_id = health.stream_id
+        if health.tier >= len(RECOVERY_TIERS):
+            # Allarme già inviato: si riprova da capo dopo un po'
+            health.tier = 0
+        health.tier += 1
+        tier = RECOVERY_TIERS[health.tier - 1]
+
+        if tier == 'usb_reset' and config.get('source_type', 'device') != 'device':
+            # Sorgente da file: nessuna periferica da resettare
+            health.tier += 1
+            tier = 'alert'
+
+        if tier == 'restart':
+            print(f"[WATCHDOG] 🔄 {stream_id}: riavvio pipeline ({reason})")
+            health.counters['restarts'] += 1
+            health.event('restart', reason)
+            health.state = 'recovering'
+            ok = self._attempt(self.restart, stream_id)
+            health.hold(self.config['grace_seconds'] if ok else self.config['interval'])
+        elif tier == 'usb_reset':
+            print(f"[WATCHDOG] 🔌 {stream_id}: reset periferica USB ({reason})")
+            health.counters['usb_resets'] += 1
+            health.event('usb_reset', reason)
+            health.state = 'recovering'
+            ok = self._attempt(self.reset_usb, stream_id)
+            health.hold(self.config['grace_seconds'] if ok else self.config['interval'])
+        else:
+            print(f"[WATCHDOG] 🚨 {stream_id}: recupero automatico fallito ({reason})")
+            health.counters['alerts'] += 1
+            health.state = 'alert'
+            health.event('alert', reason)
+            self._send_alert(stream_id, reason, health)
+            health.retry_at = time.time() + self.config['alert_retry_seconds']
+
+    def _attempt(self, action, stream_id):
+        try:
+            return action(stream_id) is not False
+        except Exception as e:
+            print(f"[WATCHDOG] ❌ {stream_id}: recupero fallito: {e}")
+            return False
+
+    def _send_alert(self, stream_id, reason, health):
+        url = self.config.get('alert_url')
+        if not url:
+            return
+        body = json.dumps({
+            'stream': stream_id,
+            'reason': reason,
+            'counters': health.counters,
+            'timestamp': time.time()
+        }).encode()
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(req, timeout=10).close()
+        except Exception as e:
+            print(f"[WATCHDOG] ⚠️  Invio allarme fallito: {e}")
@@ -0,0 +1,222 @@
+"""
+Scansione reti WiFi con cache
+Legge gli access point da NetworkManager via D-Bus (o dall'output terse di nmcli,
+indipendente da lingua e spazi negli SSID), conserva
+segnale, sicurezza e frequenza di ogni BSSID e tiene per ogni SSID l'access point
+più forte. I risultati restano in cache: l'hotspot viene spento per una nuova
+scansione solo quando la cache è scaduta.
+"""
+
+import os
+import threading
+import time
+
+import backend
+
+HOTSPOT_MARKER = '/tmp/hotspot_active'
+HOTSPOT_CONNECTION = 'Hotspot-Fallback'
+HOTSPOT_SSID = 'videoStreamer'
+
+# Validità dei risultati prima di una nuova scansione completa (secondi)
+CACHE_TTL = 120
+# Aggiornamento in background dalla lista di NetworkManager (senza hotspot attivo)
+REFRESH_INTERVAL = 30
+# Il thread di aggiornamento si ferma dopo questo tempo senza richieste
+IDLE_TIMEOUT = 600
+
+SCAN_FIELDS = ['IN-USE', 'BSSID', 'SSID', 'MODE', 'CHAN', 'FREQ', 'SIGNAL', 'SECURITY']
+
+
+def split_terse(line):
+    """Divide una riga 'nmcli -t' sui ':' non preceduti da backslash"""
+    fields = []
+    current = []
+    escaped = False
+    for ch in line:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    fields.append(''.join(current))
+    return fields
+
+
+def parse_scan(output):
+    """Un dizionario per BSSID dall'output di 'nmcli -t -f SCAN_FIELDS dev wifi list'"""
+    access_points = []
+    for line in output.splitlines():
+        fields = split_terse(line)
+        if len(fields) != len(SCAN_FIELDS):
+            continue
+        row = dict(zip(SCAN_FIELDS, fields))
+        try:
+            signal = int(row['SIGNAL'])
+        except ValueError:
+            signal = 0
+        try:
+            frequency = int(row['FREQ'].split()[0])
+        except (ValueError, IndexError):
+            frequency = None
+        security = row['SECURITY'].strip()
+        access_points.append({
+            'ssid': row['SSID'],
+            'bssid': row['BSSID'],
+            'signal': signal,
+            'frequency': frequency,
+            'band': '5 GHz' if frequency and frequency >= 5000 else '2.4 GHz',
+            'channel': row['CHAN'],
+            'security': '' if security in ('', '--') else security,
+            'in_use': row['IN-USE'].strip() == '*'
+        })
+    return access_points
+
+
+def dedupe_strongest(access_points, exclude=(HOTSPOT_SSID,)):
+    """Un elemento per SSID: l'access point con segnale più forte, ordinati per segnale"""
+    networks = {}
+    for ap in access_points:
+        ssid = ap['ssid']
+        if not ssid or ssid in exclude:
+            continue
+        best = networks.get(ssid)
+        if best is None:
+            networks[ssid] = dict(ap, access_points=1)
+            continue
+        in_use = best['in_use'] or ap['in_use']
+        if ap['signal'] > best['signal']:
+            best = dict(ap, access_points=best['access_points'])
+        best['access_points'] += 1
+        best['in_use'] = in_use
+        networks[ssid] = best
+    return sorted(networks.values(), key=lambda n: n['signal'], reverse=True)
+
+
+def hotspot_active():
+    return os.path.exists(HOTSPOT_MARKER)
+
+
+class WifiScanner:
+    """Risultati di scansione in cache con aggiornamento in background"""
+
+    def __init__(self, nm, interface='wlan0', ttl=CACHE_TTL):
+        self.nm = nm
+        self.interface = interface
+        self.ttl = ttl
+        self.networks = []
+        self.scanned_at = 0
+        self.last_request = 0
+        self.idle_timeout = IDLE_TIMEOUT
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._thread = None
+
+    def age(self):
+        return time.time() - self.scanned_at if self.scanned_at else None
+
+    def is_fresh(self):
+        age = self.age()
+        return age is not None and age < self.ttl
+
+    def cached(self):
+        """Risultato in cache nel formato di /api/wifi/scan"""
+        self.last_request = time.time()
+        self._ensure_refresher()
+        with self._lock:
+            return {
+                'networks': list(self.networks),
+                'is_hotspot': hotspot_active(),
+                'cached': True,
+                'age': round(self.age() or 0, 1),
+                'message': None
+            }
+
+    def _list(self, rescan):
+        if self.nm.available():
+            return dedupe_strongest(self.nm.access_points(self.interface, rescan=rescan))
+        result = backend.run(
+            ['nmcli', '-t', '-e', 'yes', '-f', ','.join(SCAN_FIELDS),
+             'dev', 'wifi', 'list', 'ifname', self.interface, '--rescan', 'yes' if rescan else 'auto'],
+            capture_output=True, text=True, timeout=20,
+            env=dict(os.environ, LC_ALL='C')
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f'nmcli codice {result.returncode}')
+        return dedupe_strongest(parse_scan(result.stdout))
+
+    def _store(self, networks):
+        with self._lock:
+            self.networks = networks
+            self.scanned_at = time.time()
+
+    def scan(self, job=None):
+        """
+        Scansione completa. Se l'hotspot è attivo la radio è in modalità AP:
+        l'hotspot viene spento per la durata della scansione e poi riattivato.
+        """
+        def progress(value, message):
+            if job is not None:
+                job.update(value, message)
+
+        self.last_request = time.time()
+        with self._scan_lock:
+            hotspot_was_active = hotspot_active()
+            try:
+                if hotspot_was_active:
+                    print(f"[WIFI] 📡 Hotspot attivo - disattivazione temporanea per scansione...")
+                    progress(10, 'Disattivazione temporanea hotspot')
+                    self.nm.deactivate(HOTSPOT_CONNECTION)
+                    if not self.nm.available():
+                        time.sleep(2)
+                    print(f"[WIFI] ✓ Hotspot disattivato temporaneamente")
+
+                print(f"[WIFI] 🔍 Avvio scansione reti WiFi...")
+                progress(30, 'Scansione reti WiFi')
+                networks = self._list(rescan=True)
+                self._store(networks)
+                print(f"[WIFI] ✅ Trovate {len(networks)} reti WiFi")
+            finally:
+                if hotspot_was_active:
+                    progress(90, 'Riattivazione hotspot')
+                    print(f"[WIFI] 🔄 Riattivazione hotspot (in attesa di connessione)...")
+                    self.nm.activate(HOTSPOT_CONNECTION)
+
+        message = None
+        if hotspot_was_active:
+            if networks:
+                message = "ℹ️  Seleziona una rete per connetterti. L'hotspot verrà disattivato."
+            else:
+                message = "⚠️  Nessuna rete trovata. Hotspot riattivato."
+        result = self.cached()
+        result.update(cached=False, is_hotspot=hotspot_was_active, message=message)
+        return result
+
+    # ------------------------------------------------------------------
+    # Aggiornamento in background
+    # ------------------------------------------------------------------
+
+    def _ensure_refresher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name='wifi-scan', daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        """
+        Rilegge la lista di NetworkManager (che scansiona da solo in modalità client)
+        finché qualcuno consulta i risultati. Con l'hotspot attivo non fa nulla:
+        la scansione richiederebbe di spegnerlo.
+        """
+        while time.time() - self.last_request < self.idle_timeout:
+            time.sleep(REFRESH_INTERVAL)
+            if hotspot_active() or self._scan_lock.locked():
+                continue
+            try:
+                self._store(self._list(rescan=False))
+            except Exception as e:
+                print(f"[WIFI] ⚠️  Aggiornamento scansione fallito: {e}")